@@ -0,0 +1,247 @@
+import json
+from decimal import Decimal
+from operator import itemgetter
+from typing import Callable, Iterable, Mapping
+
+
+_decode_string = itemgetter('S')
+
+
+def _decode_money(attribute: dict) -> Decimal:
+    try:
+        return Decimal(attribute['N'])
+    except KeyError:
+        # Legacy items store amounts as strings.
+        return Decimal(attribute['S'])
+
+
+def _decode_integer(attribute: dict) -> int:
+    value = attribute['N'] if 'N' in attribute else attribute['S']
+    try:
+        return int(value)
+    except ValueError:
+        # Legacy items may store it as a float string ('0.0').
+        return int(Decimal(value))
+
+
+def _decode_json(attribute: dict):
+    return json.loads(attribute['S'])
+
+
+_MISSING = object()
+
+
+class Attribute:
+    """
+    One attribute of a record schema: how it is read from a DynamoDB item.
+
+    Args:
+        name (str): The attribute name, also the record field name.
+        decode (Callable): Converts the DynamoDB attribute value to the field value.
+        lazy (bool, optional): When the whole item is decoded, decode on first access instead.
+        default (Callable, optional): Builds the value of an attribute missing from the item.
+    """
+
+    __slots__ = ('name', 'decode', 'lazy', 'default')
+
+    def __init__(self, name: str, decode: Callable, lazy: bool = False, default: Callable = None):
+        self.name = name
+        self.decode = decode
+        self.lazy = lazy
+        self.default = default
+
+
+def String(name: str) -> Attribute:
+    return Attribute(name, _decode_string)
+
+
+def Money(name: str) -> Attribute:
+    return Attribute(name, _decode_money)
+
+
+def Integer(name: str) -> Attribute:
+    return Attribute(name, _decode_integer)
+
+
+def JsonBlob(name: str, default: Callable = None) -> Attribute:
+    return Attribute(name, _decode_json, lazy=True, default=default)
+
+
+class _Raw:
+    """
+    An attribute value kept as read from DynamoDB until first accessed.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: dict):
+        self.value = value
+
+
+def _lazy_property(slot: str, decode: Callable) -> property:
+    def getter(record):
+        value = getattr(record, slot)
+        if value.__class__ is _Raw:
+            value = decode(value.value)
+            setattr(record, slot, value)
+        return value
+
+    def setter(record, value):
+        setattr(record, slot, value)
+
+    return property(getter, setter)
+
+
+class Record:
+    """
+    Base of the `__slots__` records decoded from DynamoDB items.
+
+    Subclasses declare their `schema` (a tuple of Attribute) and one slot per
+    attribute; a lazy attribute is stored in a '_'-prefixed slot and read through
+    a property that decodes it on first access. Records read like the dicts they
+    replace (`client['Limit']`, `client.get('Spend', 0)`, `'Email' in client`,
+    `dict(client)`); attributes missing from a projected item are simply absent.
+    """
+
+    __slots__ = ()
+    schema: tuple = ()
+    _decoders: dict = {}
+    _storage: dict = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._storage = {attribute.name: f'_{attribute.name}' if attribute.lazy else attribute.name for attribute in cls.schema}
+        for attribute in cls.schema:
+            if attribute.lazy:
+                setattr(cls, attribute.name, _lazy_property(f'_{attribute.name}', attribute.decode))
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def _decoder(cls, fields: Iterable[str] = None) -> Callable[[dict], 'Record']:
+        """
+        Returns the decoder of an item projection, building it on first use.
+
+        The (name, slot, decode, default) steps of the projection are resolved once
+        per (class, fields), so a scan page decodes without looking up the schema.
+        Lazy attributes are only kept raw when the whole item is decoded (e.g. a
+        cached client): a projection names them to read them, so they are decoded
+        right away.
+        """
+
+        key = (cls, None if fields is None else tuple(fields))
+        decoder = cls._decoders.get(key)
+        if decoder is not None:
+            return decoder
+
+        steps = tuple(
+            (attribute.name, cls._storage[attribute.name], _Raw if attribute.lazy and fields is None else attribute.decode, attribute.default)
+            for attribute in cls.schema
+            if fields is None or attribute.name in key[1]
+        )
+        new = cls.__new__
+
+        def decode(item: dict) -> 'Record':
+            record = new(cls)
+            get = item.get
+            for name, slot, decode_value, default in steps:
+                value = get(name)
+                if value is not None:
+                    setattr(record, slot, decode_value(value))
+                elif default is not None:
+                    setattr(record, slot, default())
+            return record
+
+        decoder = cls._decoders[key] = decode
+        return decoder
+
+    @classmethod
+    def from_item(cls, item: dict, fields: Iterable[str] = None) -> 'Record':
+        """
+        Decodes a DynamoDB item.
+
+        Args:
+            item (dict): The DynamoDB item.
+            fields (Iterable[str], optional): Only decode these attributes (e.g. the
+                projection of a scan); default is every attribute of the schema.
+
+        Returns:
+            Record: The record.
+        """
+
+        return cls._decoder(fields)(item)
+
+    def _is_set(self, name: str) -> bool:
+        slot = self._storage.get(name)
+        return slot is not None and hasattr(self, slot)
+
+    def __getitem__(self, name: str):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name: str, value) -> None:
+        setattr(self, name, value)
+
+    def __contains__(self, name: str) -> bool:
+        return self._is_set(name)
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default)
+
+    def keys(self) -> list[str]:
+        return [name for name, slot in self._storage.items() if hasattr(self, slot)]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __copy__(self) -> 'Record':
+        record = self.__class__.__new__(self.__class__)
+        for slot in self._storage.values():
+            value = getattr(self, slot, _MISSING)
+            if value is not _MISSING:
+                setattr(record, slot, value)
+        return record
+
+    copy = __copy__
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (Record, Mapping)):
+            return NotImplemented
+        return dict(self) == dict(other)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({', '.join(f'{name}={self[name]!r}' for name in self.keys())})"
+
+
+class ClientDetails(Record):
+    """
+    A client, as stored in the client table.
+
+    Money is exact (Decimal). LastReloadedAt is the ReloadedAt of the latest reload
+    (sort key of the country index). DigestShard is set while reloads await the
+    weekly digest (sparse digest index) and DigestedAt is the digest watermark.
+    ReloadingHistory is the legacy JSON blob of
+    reloads, empty once migrated to the history table. It is decoded on first access,
+    unless a projection naming it is decoded.
+    """
+
+    __slots__ = ('ClientID', 'FirstName', 'LastName', 'Country', 'Email', 'Phone', 'Spend', 'Limit', 'CardLimitReached', 'LastReloadedAt', 'DigestShard', 'DigestedAt', '_ReloadingHistory')
+    schema = (
+        String('ClientID'),
+        String('FirstName'),
+        String('LastName'),
+        String('Country'),
+        String('Email'),
+        String('Phone'),
+        Money('Spend'),
+        Money('Limit'),
+        Integer('CardLimitReached'),
+        String('LastReloadedAt'),
+        String('DigestShard'),
+        String('DigestedAt'),
+        JsonBlob('ReloadingHistory', default=list),
+    )
@@ -1,24 +1,186 @@
 import json
 import os
-import boto3
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
+from typing import Mapping
 
-load_dotenv()
 
-# Environment variables
-ENV_DEV = os.getenv('ENV_DEV')  # Development environment flag
-TAUX_EAZYCARD = os.getenv('TAUX_EAZYCARD')  # Taux eazycard
-AWS_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY')  # AWS access key
-AWS_SECRET_KEY = os.getenv('AWS_SECRET_KEY')  # AWS secret key
-AWS_REGION = os.getenv('AWS_REGION')  # AWS region
-VERIFIED_EMAIL = os.getenv('VERIFIED_EMAIL')  # Verified email address
-ADMIN_EMAILS = eval(os.getenv('ADMIN_EMAILS'))  # List of admin email addresses
-COMMERCIAL_EMAILS = eval(os.getenv('COMMERCIAL_EMAILS'))  # List of commercial email addresses
+def _load_dotenv() -> None:
+    """
+    Loads a local .env file outside Lambda; python-dotenv is a development dependency.
+    """
 
+    if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+        return
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
 
-# Secret configuration
-SECRET_CLIENT_NAME = os.getenv('SECRET_CLIENT_NAME')  # Name of DynamoDB table client
 
-# DynamoDB configuration
-DYNAMODB_TABLE_CLIENT_NAME = os.getenv('DYNAMODB_TABLE_CLIENT_NAME')  # Name of DynamoDB table client
+def _list(value: str) -> list[str]:
+    """
+    Parses a list setting given as a JSON array or as comma-separated values.
 
+    Args:
+        value (str): The raw value, e.g. '["a@x.com", "b@x.com"]' or 'a@x.com,b@x.com'.
+
+    Returns:
+        list[str]: The values, empty if the setting is unset.
+    """
+
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        # Accept the legacy Python-literal form "['a@x.com', 'b@x.com']" without eval.
+        parsed = [item.strip().strip('\'"') for item in value.strip().strip('[]').split(',')]
+    if isinstance(parsed, str):
+        parsed = [parsed]
+    return [item for item in parsed if item]
+
+
+def _bool(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Typed application settings, parsed once from the environment.
+    """
+
+    # Environment variables
+    ENV_DEV: str = None  # Development environment flag
+    TAUX_EAZYCARD: str = None  # Taux eazycard
+    AWS_ACCESS_KEY: str = None  # AWS access key
+    AWS_SECRET_KEY: str = None  # AWS secret key
+    AWS_REGION: str = None  # AWS region
+    VERIFIED_EMAIL: str = None  # Verified email address
+    ADMIN_EMAILS: list[str] = field(default_factory=list)  # List of admin email addresses
+    COMMERCIAL_EMAILS: list[str] = field(default_factory=list)  # List of commercial email addresses
+
+    # AWS clients configuration
+    AWS_MAX_POOL_CONNECTIONS: int = 10  # Max HTTP connections kept per boto3 client
+    AWS_TCP_KEEPALIVE: bool = True  # Keep idle connections alive between invocations
+    AWS_CONNECT_TIMEOUT: float = 2  # Seconds to open a connection to an AWS service
+    AWS_READ_TIMEOUT: float = 5  # Seconds to wait for an AWS response, per attempt
+    AWS_RETRY_MODE: str = 'adaptive'  # botocore retry mode; 'adaptive' also rate-limits the client while throttled
+    AWS_MAX_ATTEMPTS: int = 3  # Attempts per AWS call, the first one included
+
+    # Resilience configuration
+    RESILIENCE_DEADLINE_MARGIN_MS: int = 1000  # Time kept from the Lambda timeout to answer once the last call is cut at the deadline
+    RESILIENCE_MIN_ATTEMPT_MS: int = 200  # Least time left for an attempt after a retry backoff; a retry that does not fit raises the last error
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures opening the circuit of a dependency
+    CIRCUIT_RESET_TIMEOUT: float = 30  # Seconds an open circuit fails fast before letting a trial call through
+
+    # Exchange rate configuration
+    EXCHANGE_RATE_API_URL: str = 'https://api.exchangerate-api.com/v4/latest/'  # Exchange rate API base URL
+    EXCHANGE_RATE_TTL: float = 3600  # Seconds fetched rates are reused
+    EXCHANGE_RATE_TIMEOUT: float = 3  # Exchange rate API timeout in seconds
+    EXCHANGE_RATE_RETRY_AFTER: float = 60  # Seconds the fallback rates are served after a failed fetch before the API is tried again
+    EXCHANGE_RATE_SNAPSHOT_PATH: str = '/tmp/exchange_rates.json'  # Fallback snapshot file
+
+    # Notification configuration
+    NOTIFICATION_MODE: str = 'sync'  # 'sync' sends mails in the request, 'outbox' hands them to the worker
+    NOTIFICATION_LOCALE: str = 'fr'  # Default locale of the emails ('fr' or 'en')
+    NOTIFICATION_CLAIM_TIMEOUT: int = 300  # Seconds after which a notification left SENDING by a crashed worker can be sent again
+
+    # Idempotency configuration
+    IDEMPOTENCY_TTL: int = 86400  # Seconds a completed request is remembered
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 900  # Seconds after which an unfinished request can be taken over, when the invocation's remaining time is unknown
+    IDEMPOTENCY_CACHE_SIZE: int = 1024  # Completed requests kept in memory
+
+    # Bulk operations configuration
+    BULK_IMPORT_BUCKET: str = None  # S3 bucket holding bulk import files
+    BULK_MAX_ROWS: int = 5000  # Max rows accepted by a bulk action
+    BULK_CONCURRENCY: int = 10  # Concurrent client updates in a bulk recharge
+
+    # SES configuration
+    SES_SEND_RATE: float = None  # Recipients (To and Bcc) per second, read from SES when unset
+    SES_MAX_WORKERS: int = 8  # Concurrent SES sending threads
+    SES_MAX_RETRIES: int = 5  # Retries of a throttled SES call
+
+    # Weekly history digest configuration
+    HISTORY_PAGE_SIZE: int = 100  # Clients read per scan page
+    HISTORY_EMAIL_BATCH_SIZE: int = 50  # Messages sent per batch
+    HISTORY_TIME_MARGIN_MS: int = 60000  # Remaining time below which the job checkpoints and resumes
+    HISTORY_SES_TEMPLATE: str = None  # SES stored template prefix for the digest; rendered locally when unset
+    HISTORY_DIGEST_SHARDS: int = 8  # Partitions of the digest index listing the clients with new reloads
+    HISTORY_DIGEST_FIRST_DAYS: int = 7  # Days of reloads included in a client's first digest
+    HISTORY_FEED_SHARDS: int = 4  # Partitions of the feed index the reloads are spread over; never lower it once reloads are written
+
+    # Client cache configuration
+    CLIENT_CACHE_SIZE: int = 2048  # Decoded clients kept in memory per container
+    CLIENT_CACHE_TTL: float = 60  # Seconds a cached client is served before being read again
+    DAX_ENDPOINT: str = None  # DAX cluster endpoint used as shared client cache tier (optional)
+
+    # Telemetry configuration
+    TELEMETRY_ENABLED: bool = True  # Emit one CloudWatch EMF metrics line per invocation
+    TELEMETRY_NAMESPACE: str = 'EazyCard'  # CloudWatch metrics namespace
+    TELEMETRY_SERVICE: str = 'eazycard-api'  # 'Service' dimension of the metrics
+    TELEMETRY_DEBUG_SAMPLE_RATE: float = 0.01  # Share of invocations writing debug logs
+
+    # Async I/O configuration
+    AIO_ENABLED: bool = False  # Run the DynamoDB fan-out of the weekly digest and the history feed on the asyncio path (needs aioboto3)
+    AIO_DYNAMODB_CONCURRENCY: int = 32  # Concurrent DynamoDB calls on the asyncio path
+
+    # Report configuration
+    REPORT_SHARDS: int = 16  # Items each report counter is spread over, to limit write contention
+
+    # Secret configuration
+    SECRET_CLIENT_NAME: str = None  # Name of DynamoDB table client
+    SECRET_CACHE_TTL: float = 300  # Seconds a cached secret stays valid
+    SECRET_CACHE_REFRESH_MARGIN: float = 30  # Seconds before expiry a background refresh starts
+    SECRET_ROTATION_CHECK_INTERVAL: float = 30  # Min seconds between rotation checks
+
+    # DynamoDB configuration
+    DYNAMODB_TABLE_CLIENT_NAME: str = None  # Name of DynamoDB table client
+    DYNAMODB_TABLE_HISTORY_NAME: str = None  # Name of DynamoDB table holding reload events (ClientID, ReloadedAt)
+    DYNAMODB_TABLE_OUTBOX_NAME: str = None  # Name of DynamoDB table holding pending notifications
+    DYNAMODB_TABLE_REQUEST_NAME: str = None  # Name of DynamoDB table holding idempotency records (RequestID)
+    DYNAMODB_SCAN_SEGMENTS: int = 1  # Parallel scan segments used for full-table reads
+    DYNAMODB_TABLE_RATES_NAME: str = None  # Name of DynamoDB table holding exchange rate snapshots (optional)
+    DYNAMODB_TABLE_AGGREGATE_NAME: str = None  # Name of DynamoDB table holding report counters (Metric, Bucket); reports are off when unset; the client totals need the client table stream (NEW_AND_OLD_IMAGES) mapped to the function
+    DYNAMODB_INDEX_EMAIL_NAME: str = 'Email-index'  # Client table GSI on Email (keys only)
+    DYNAMODB_INDEX_COUNTRY_NAME: str = 'Country-LastReloadedAt-index'  # Client table GSI on Country and LastReloadedAt
+    DYNAMODB_INDEX_PAYMENT_METHOD_NAME: str = 'PaymentMethod-ReloadedAt-index'  # History table GSI on PaymentMethod and ReloadedAt
+    DYNAMODB_INDEX_FEED_NAME: str = 'FeedShard-ReloadedAt-index'  # History table GSI on FeedShard and ReloadedAt (every client's reloads, by time)
+    DYNAMODB_INDEX_DIGEST_NAME: str = 'DigestShard-index'  # Sparse client table GSI on DigestShard, projecting the digest fields
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> 'Settings':
+        """
+        Builds the settings from environment variables of the same name.
+
+        Unset (or empty) variables keep their default. Values are converted with the
+        field's type: lists accept JSON arrays or comma-separated values.
+
+        Args:
+            environ (Mapping[str, str], optional): The environment (default is os.environ).
+
+        Returns:
+            Settings: The parsed settings.
+        """
+
+        parsers = {int: int, float: float, bool: _bool, list[str]: _list, str: str}
+        values = {}
+        for name, setting in cls.__dataclass_fields__.items():
+            raw = environ.get(name)
+            if raw is None or raw == '':
+                continue
+            values[name] = parsers[setting.type](raw)
+        return cls(**values)
+
+
+_load_dotenv()
+settings = Settings.from_env()
+
+
+def __getattr__(name: str):
+    # Module-level constants (e.g. `from env_loader import ADMIN_EMAILS`) are read from `settings`.
+    try:
+        return getattr(settings, name)
+    except AttributeError:
+        raise AttributeError(f"module 'env_loader' has no attribute '{name}'") from None
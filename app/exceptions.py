@@ -85,3 +85,84 @@ class TransactionAlreadyExecute(Exception):
             message = f"Transaction {transaction_id} already executed."
         super().__init__(message)
         self.transaction_id = transaction_id
+
+
+class TransactionFailed(Exception):
+    """
+    Exception raised when a request with the same ID failed after applying some of its writes.
+
+    Such a request is not executed again: retrying it could apply its writes twice.
+
+    Args:
+        transaction_id (str, optional): The ID of the request that failed.
+        message (str, optional): Custom error message (default is generated based on request ID).
+
+    Attributes:
+        transaction_id (str): The ID of the transaction.
+    """
+
+    def __init__(self, transaction_id=None, message=None):
+        if message is None:
+            message = f"Transaction {transaction_id} failed after applying some of its writes, it will not be executed again."
+        super().__init__(message)
+        self.transaction_id = transaction_id
+
+
+class IdempotencyKeyReused(Exception):
+    """
+    Exception raised when an idempotency key is reused with a different request payload.
+
+    Args:
+        request_id (str, optional): The reused idempotency key.
+        message (str, optional): Custom error message (default is generated based on request ID).
+
+    Attributes:
+        request_id (str): The idempotency key.
+    """
+
+    def __init__(self, request_id=None, message=None):
+        if message is None:
+            message = f"Request {request_id} was already used with a different payload."
+        super().__init__(message)
+        self.request_id = request_id
+
+
+class CircuitOpen(Exception):
+    """
+    Exception raised when a call is refused because the circuit of its dependency is open.
+
+    Args:
+        dependency (str, optional): The dependency (e.g. 'ses', 'rates').
+        retry_after (float, optional): Seconds before the circuit lets a trial call through.
+        message (str, optional): Custom error message (default is generated from the dependency).
+
+    Attributes:
+        dependency (str): The dependency.
+        retry_after (float): Seconds before the next trial call.
+    """
+
+    def __init__(self, dependency=None, retry_after=None, message=None):
+        if message is None:
+            message = f"Circuit of {dependency} is open, failing fast."
+        super().__init__(message)
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """
+    Exception raised when a call does not fit in the time left to the invocation.
+
+    Args:
+        dependency (str, optional): The dependency the call was for.
+        message (str, optional): Custom error message (default is generated from the dependency).
+
+    Attributes:
+        dependency (str): The dependency.
+    """
+
+    def __init__(self, dependency=None, message=None):
+        if message is None:
+            message = f"No time left in the invocation for a call to {dependency}."
+        super().__init__(message)
+        self.dependency = dependency
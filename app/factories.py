@@ -1,9 +1,11 @@
-from exceptions import GenerateTemplateFailed
+import base64
 from datetime import datetime
+from itertools import islice
 import json
-import requests
-from typing import TypedDict
+from typing import Iterable, Iterator, TypedDict
 from urllib.parse import urlencode
+from services.rates import get_rate_provider
+from services.telemetry import span
 
 
 class MetaDataTransaction(TypedDict):
@@ -13,19 +15,6 @@ class MetaDataTransaction(TypedDict):
     created_at: str
 
 
-class ClientDetails(TypedDict):
-    ClientID: str
-    FirstName: str 
-    LastName: str
-    Country: str
-    Email: str
-    Phone: str
-    Spend: float
-    Limit: float
-    CardLimitReached: float
-    ReloadingHistory: list
-
-
 def _build_url(base_url: str, params: dict = None) -> str:
     """
     Builds the final URL with the given parameters.
@@ -42,100 +31,43 @@ def _build_url(base_url: str, params: dict = None) -> str:
     return base_url
 
 
-def _cast_dynamodb_reload_history_to_reload_histories(dynamodb_reload_history):
-    reload_history = []
-    for dynamodb_reload in dynamodb_reload_history:
-        reload = {
-            'amount': float(dynamodb_reload['M']['amount']['N']),
-            'payment_method': dynamodb_reload['M']['payment_method']['S'],
-            'date': dynamodb_reload['M']['date']['S']
-        }
-        reload_history.append(reload)
-    return reload_history
-
-
-def _cast_item_dynamodb_to_client_details(client: dict) -> ClientDetails:
-    """
-    Converts a DynamoDB item (client) to a structured ClientDetails object.
-
-    Args:
-        client (dict): A dictionary representing the DynamoDB item with the following keys:
-            - 'ClientID': The client's unique identifier (numeric).
-            - 'FirstName': The client's first name (string).
-            - 'LastName': The client's last name (string).
-            - 'Country': The client's country (string).
-            - 'Email': The client's email address (string).
-            - 'Phone': The client's phone number (string).
-
-    Returns:
-        ClientDetails: A structured object containing client details.
-    """
-
-
-    return  {
-        'ClientID': client['ClientID']['S'],
-        'FirstName': client['FirstName']['S'],
-        'LastName': client['LastName']['S'],
-        'Country': client['Country']['S'],
-        'Email': client['Email']['S'],
-        'Phone': client['Phone']['S'],
-        'Spend': float(client['Spend']['S']),
-        'Limit': float(client['Limit']['S']),
-        'CardLimitReached': float(client['CardLimitReached']['S']),
-        'ReloadingHistory': json.loads(client['ReloadingHistory']['S']) if 'ReloadingHistory' in client else []
-    }
-
-
-def _cast_reload_history_to_dynamodb_reload_history(reload_history):
-    dynamodb_reload_history = []
-    for reload in reload_history:
-        dynamodb_reload = {
-            'M': {
-                'amount': {'N': str(reload['amount'])},
-                'payment_method': {'S': reload['payment_method']},
-                'date': {'S': reload['date']}
-            }
-        }
-        dynamodb_reload_history.append(dynamodb_reload)
-    return dynamodb_reload_history
-
-
-def _cast_client_details_to_item_dynamodb(client: ClientDetails) -> dict:
+def _cast_client_details_to_item_dynamodb(client: dict) -> dict:
     """
-    Converts client details to a DynamoDB item format.
+    Converts the details of a new client to a DynamoDB item format.
 
     Args:
-        client (ClientDetails): A dictionary containing client details.
+        client (dict): A dictionary containing client details.
             - 'ClientID': The unique client identifier.
             - 'FirstName': The first name of the client.
             - 'LastName': The last name of the client.
             - 'Country': The country of the client.
             - 'Email': The email address of the client.
             - 'Phone': The phone number of the client.
-            - 'Spend': The spending amount of the client (float).
-            - 'Limit': The spending limit for the client (float).
+            - 'Spend': The spending amount of the client.
+            - 'Limit': The spending limit for the client.
+            - 'CardLimitReached': 1 once the limit is reached, else 0.
+            - 'LastReloadedAt': The ReloadedAt of the latest reload.
+            - 'DigestShard': The digest shard listing the client.
 
     Returns:
         dict: A dictionary representing the DynamoDB item.
     """
 
-
     return {
         'ClientID': {'S': str(client['ClientID'])},
-        'FirstName': {'S': client['FirstName']},
-        'LastName': {'S': client['LastName']},
-        'Country': {'S': client['Country']},
-        'Email': {'S': client['Email']},
-        'Phone': {'S': client['Phone']},
-        'Spend': {'S': str(client['Spend'])},
-        'Limit': {'S': str(client['Limit'])},
-        'CardLimitReached': {'S': str(client['CardLimitReached'])},
-        'ReloadingHistory': {'S': json.dumps(client['ReloadingHistory'])},
+        'FirstName': {'S': str(client['FirstName'])},
+        'LastName': {'S': str(client['LastName'])},
+        'Country': {'S': str(client['Country'])},
+        'Email': {'S': str(client['Email'])},
+        'Phone': {'S': str(client['Phone'])},
+        'Spend': {'N': str(client['Spend'])},
+        'Limit': {'N': str(client['Limit'])},
+        'CardLimitReached': {'N': str(client['CardLimitReached'])},
+        'LastReloadedAt': {'S': str(client['LastReloadedAt'])},
+        'DigestShard': {'S': str(client['DigestShard'])},
     }
 
 
-
-
 def _extract_meta_data_from_transaction_completed(transaction: dict) -> MetaDataTransaction:
     """
     Extracts the meta data from a completed transaction.
@@ -161,38 +93,62 @@ def _extract_meta_data_from_transaction_completed(transaction: dict) -> MetaData
     return meta_data
 
 
-def _generate_transactions_table(transactions: list[dict], table_title: str) -> str:
+def _encode_cursor(position: dict) -> str:
     """
-    Generates a formatted string table from a list of transactions.
+    Encodes a pagination position as an opaque URL-safe cursor.
 
     Args:
-        transactions (List[MetaDataTransactions]): The list of transactions.
+        position (dict): The position (e.g. a LastEvaluatedKey).
 
     Returns:
-        str: The formatted transactions table.
+        str: The cursor.
     """
 
-    if not transactions:
-        return "Aucune transaction à afficher."
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
 
-    table_header = "| Date | Montant | Devise | Méthode paiement |"
-    table_separator = "-" * len(table_header)
-    rows = [table_title, table_header, table_separator]
 
+def _decode_cursor(cursor: str) -> dict:
+    """
+    Decodes a cursor produced by `_encode_cursor`.
+
+    Args:
+        cursor (str): The cursor, or None.
+
+    Returns:
+        dict: The position, or None when no cursor is given.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+
+    if not cursor:
+        return None
     try:
-        for transaction in transactions:
-            row = f"| {transaction['Date']} | {transaction['Amount']} | EUR | {transaction['PaymentMethod']} |"
-            rows.append(row)
-    except Exception as e:
-        raise GenerateTemplateFailed(str(e))
-    
-    table = "\n".join(rows)
-    return table
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """
+    Groups an iterable into lists of at most `size` elements.
+
+    Args:
+        iterable (Iterable): The elements to group.
+        size (int): The batch size.
+
+    Returns:
+        Iterator[list]: The batches.
+    """
+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
 
 def _convert_currency(amount: float, from_currency: str = "XAF", to_currency: str = "EUR") -> float:
     """
-    Converts an amount from one currency to another using real-time exchange rates.
+    Converts an amount from one currency to another using cached exchange rates.
 
     Args:
         amount (float): The amount to convert.
@@ -206,27 +162,7 @@ def _convert_currency(amount: float, from_currency: str = "XAF", to_currency: st
         ValueError: If the provided currencies are invalid or exchange rates cannot be fetched.
     """
     
-    base_url = "https://api.exchangerate-api.com/v4/latest/"
-    response = requests.get(base_url + from_currency)
-    data = response.json()
-
-    if 'rates' in data:
-        rates = data['rates']
-        if from_currency == to_currency:
-            return amount
-        if from_currency in rates and to_currency in rates:
-            conversion_rate = rates[to_currency] / rates[from_currency]
-            converted_amount = amount * conversion_rate
-            return converted_amount
-        else:
-            raise ValueError("Invalid currency!")
-    else:
-        raise ValueError("Unable to fetch exchange rates!")
-    
-    
-def _today() -> str:
-    import datetime
-
-    today = datetime.date.today()
-
-    return f"{today.day}/{today.month}/{today.year}"
+    if from_currency == to_currency:
+        return amount
+    with span('rates.convert'):
+        return amount * get_rate_provider().rate(from_currency, to_currency)
@@ -1,26 +1,102 @@
+import importlib
 import json
-from functools import wraps
+import math
+from functools import cache, wraps
+from env_loader import DYNAMODB_TABLE_CLIENT_NAME
 from exceptions import (
     ActionDoesNotExist,
-    ClientNotFound
+    CircuitOpen,
+    ClientNotFound,
+    DeadlineExceeded,
+    IdempotencyKeyReused,
+    TransactionAlreadyExecute,
+    TransactionFailed
 )
+from services.resilience import with_deadline
+from services.telemetry import debug, instrumented, tag
+
+
+# Actions tagged on the metrics of an invocation: any other value is tagged
+# 'UNKNOWN', so a client cannot create metric dimensions.
+ACTIONS = frozenset({
+    'BACKFILL_FEED_SHARD',
+    'BACKFILL_LAST_RELOAD',
+    'BULK_CARD_RECHARGE',
+    'BULK_CREATE_CLIENTS',
+    'CARD_RECHARGE',
+    'CLIENTS_BY_COUNTRY',
+    'CLIENT_BY_EMAIL',
+    'CREATE_CLIENT',
+    'HISTORY_RELOAD',
+    'HISTORY_TRANSACTION',
+    'MIGRATE_RELOAD_HISTORY',
+    'REBUILD_REPORT',
+    'REBUILD_REPORT_RELOADS',
+    'RELOADS_BY_PAYMENT_METHOD',
+    'REPORT_SUMMARY',
+})
+
+# Handlers and services are imported on first use, so an invocation only pays for
+# the modules it needs (e.g. the outbox worker never loads the business layer).
+LAZY_IMPORTS = {
+    'backfill_feed_shards': 'services.business',
+    'backfill_last_reloads': 'services.business',
+    'bulk_card_recharge': 'services.bulk',
+    'bulk_create_clients': 'services.bulk',
+    'card_recharge': 'services.business',
+    'compare_secret': 'services.secret_cache',
+    'create_client': 'services.business',
+    'find_clients_by_country': 'services.lookups',
+    'find_clients_by_email': 'services.lookups',
+    'find_reloads_by_payment_method': 'services.lookups',
+    'fingerprint': 'services.idempotency',
+    'idempotency_store': 'services.idempotency',
+    'migrate_reload_histories': 'services.business',
+    'process_client_records': 'services.reports',
+    'process_notification_records': 'services.notifications',
+    'rebuild_report': 'services.business',
+    'rebuild_report_reloads': 'services.business',
+    'report_summary': 'services.reports',
+    'retrieve_a_reload': 'services.business',
+    'retrieve_all_reload': 'services.business',
+    'secret_cache': 'services.secret_cache',
+    'send_transaction_history_to_customers': 'services.business',
+    'write_count': 'services.aws',
+}
+
+
+def _tag_action(action) -> None:
+    tag(Action=action if isinstance(action, str) and action in ACTIONS else 'UNKNOWN')
+
+
+@cache
+def _lazy(name: str):
+    """
+    Imports the module providing `name` on first use and returns the attribute.
+
+    Args:
+        name (str): A key of LAZY_IMPORTS.
+
+    Returns:
+        The handler function or service object.
+    """
+
+    return getattr(importlib.import_module(LAZY_IMPORTS[name]), name)
+
 
-from services.aws import retrieve_secret
-from services.business import card_recharge, create_client, retrieve_a_reload, retrieve_all_reload, send_transaction_history_to_customers
-    
 def auth(func):
     @wraps(func)
     def wrapper(event, context):
-        print('CONTEXT:')
-        print(context)
-
-        print('EVENT:')
-        print(event)
         body = json.loads(event['body'])
+        # Request bodies carry personal data: only their shape is logged, and only when sampled.
+        debug('request', action=body.get('action'), path=event.get('path'), body_bytes=len(event['body']))
         if 'action' in body: 
+            compare_secret, secret_cache = _lazy('compare_secret'), _lazy('secret_cache')
             api_key = event.get('headers', {}).get('x-api-key')
-            secrets = retrieve_secret()
-            if api_key and api_key == secrets['EAZYCARD_API_KEY']:
+            if api_key and (
+                compare_secret(api_key, secret_cache.get()['EAZYCARD_API_KEY'])
+                or (secret_cache.reload_if_rotated() and compare_secret(api_key, secret_cache.get()['EAZYCARD_API_KEY']))
+            ):
                 return func(event, context)
             else:
                 return {
@@ -30,31 +106,187 @@ def auth(func):
         return func(event, context)
     return wrapper
 
-    
+
+IDEMPOTENT_ACTIONS = {'CREATE_CLIENT', 'CARD_RECHARGE', 'BULK_CREATE_CLIENTS', 'BULK_CARD_RECHARGE'}
+IDEMPOTENCY_HEADERS = ('idempotency-key', 'x-request-id')
+
+
+def _request_id(event) -> str:
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    return next((headers[name] for name in IDEMPOTENCY_HEADERS if headers.get(name)), None)
+
+
+def _lock_timeout(context) -> int:
+    # Seconds an idempotency key stays claimed: until the invocation times out.
+    if context is None:
+        return None
+    return math.ceil(context.get_remaining_time_in_millis() / 1000) + 1
+
+
+def idempotent(func):
+    """
+    Answers retried write requests with the stored response instead of executing them again.
+
+    Applies to IDEMPOTENT_ACTIONS when the request carries an Idempotency-Key (or
+    X-Request-Id) header. Successful responses are stored. A failed request that
+    wrote nothing releases its key so it can be retried; one that wrote keeps it:
+    an error response is stored as its outcome, and an exception marks it FAILED,
+    answered with 409 from then on. The key stays claimed until the invocation
+    times out, and a response that cannot be stored also marks it FAILED, so a
+    request that wrote is never taken over and executed again.
+    """
+
+    @wraps(func)
+    def wrapper(event, context):
+        request_id = _request_id(event)
+        body = json.loads(event['body'])
+        if request_id is None or body.get('action') not in IDEMPOTENT_ACTIONS:
+            return func(event, context)
+
+        idempotency_store = _lazy('idempotency_store')
+        payload_hash = _lazy('fingerprint')(event['body'])
+        try:
+            stored_response = idempotency_store.begin(request_id, payload_hash, _lock_timeout(context))
+        except (TransactionAlreadyExecute, TransactionFailed) as e:
+            return {'statusCode': 409, 'body': json.dumps({'error': str(e)})}
+        except IdempotencyKeyReused as e:
+            return {'statusCode': 422, 'body': json.dumps({'error': str(e)})}
+        if stored_response is not None:
+            print(f"Info: request {request_id} already executed, returning the stored response.")
+            return stored_response
+
+        write_count = _lazy('write_count')
+        writes = write_count()
+        try:
+            response = func(event, context)
+        except Exception as e:
+            if write_count() == writes:
+                idempotency_store.release(request_id)
+            else:
+                print(f"Error: request {request_id} failed after writing, it will not be executed again.")
+                idempotency_store.fail(request_id, str(e))
+            raise
+        if 200 <= response.get('statusCode', 500) < 300 or write_count() != writes:
+            try:
+                idempotency_store.complete(request_id, payload_hash, response)
+            except Exception as e:
+                print(f"Error: the response of request {request_id} was not stored, it will not be executed again: {e}")
+                try:
+                    idempotency_store.fail(request_id, f'Response not stored: {e}')
+                except Exception as e:
+                    print(f"Error: request {request_id} could not be marked as failed, it can be taken over when its lock expires: {e}")
+        else:
+            idempotency_store.release(request_id)
+        return response
+    return wrapper
+
+
+@instrumented
+@with_deadline
 def lambda_handler(event, context):
 
+    if 'Records' in event:
+        if event['Records'] and _is_client_stream(event['Records'][0]):
+            return client_stream_handler(event, context)
+        return notification_handler(event, context)
     try: 
         body = json.loads(event['body'])
     except KeyError:
+        _tag_action(event['action'])
         if event['action'] == 'HISTORY_TRANSACTION':
-            return send_transaction_history_to_customers()
-    return compute(event, context)
+            return _lazy('send_transaction_history_to_customers')(event.get('ExclusiveStartKey'), context)
+        if event['action'] == 'MIGRATE_RELOAD_HISTORY':
+            return _lazy('migrate_reload_histories')(event.get('ExclusiveStartKey'), context)
+        if event['action'] == 'REBUILD_REPORT':
+            return _lazy('rebuild_report')(event.get('ExclusiveStartKey'), context)
+        if event['action'] == 'REBUILD_REPORT_RELOADS':
+            return _lazy('rebuild_report_reloads')(event.get('ExclusiveStartKey'), context)
+        if event['action'] == 'BACKFILL_LAST_RELOAD':
+            return _lazy('backfill_last_reloads')(event.get('ExclusiveStartKey'), context)
+        if event['action'] == 'BACKFILL_FEED_SHARD':
+            return _lazy('backfill_feed_shards')(event.get('ExclusiveStartKey'), context)
+    try:
+        return compute(event, context)
+    except (CircuitOpen, DeadlineExceeded) as e:
+        # A dependency is down or the invocation ran out of time: answer before the
+        # Lambda timeout. A request that wrote nothing released its idempotency key and
+        # can be retried; one that wrote something is recorded as failed (409 on retry).
+        print(f"Error: {e}")
+        return {
+            'statusCode': 503,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def _is_client_stream(record: dict) -> bool:
+    # An event source mapping delivers the records of a single source per invocation.
+    return f":table/{DYNAMODB_TABLE_CLIENT_NAME}/stream/" in record.get('eventSourceARN', '')
+
+
+def client_stream_handler(event, context):
+    """
+    Report worker: maintains the client totals from the client table stream.
+
+    Args:
+        event (dict): The stream event.
+        context (LambdaContext): The Lambda context.
+
+    Returns:
+        dict: The partial batch response, listing the records to retry.
+    """
+
+    tag(Action='CLIENT_CHANGES', Records=len(event['Records']))
+    return {'batchItemFailures': _lazy('process_client_records')(event['Records'])}
+
+
+def notification_handler(event, context):
+    """
+    Outbox worker: sends the notifications carried by DynamoDB Streams or SQS records.
+
+    Args:
+        event (dict): The stream or queue event.
+        context (LambdaContext): The Lambda context.
+
+    Returns:
+        dict: The partial batch response, listing the records to retry.
+    """
+
+    tag(Action='NOTIFICATIONS', Records=len(event['Records']))
+    return {'batchItemFailures': _lazy('process_notification_records')(event['Records'])}
 
 
 @auth
+@idempotent
 def compute(event, context):
     body = json.loads(event['body'])
     # body = event
     try:
         action = body['action']
+        _tag_action(action)
         if action == 'CREATE_CLIENT':
-            return create_client(body['data'])
+            return _lazy('create_client')(body['data'])
         elif action == 'CARD_RECHARGE':
-            return card_recharge(body['data']['ClientID'], body['data']['Limit'], body['data']['Rate'], body['data']['Currency'] if body['data']['Currency'] else 'XAF', body['data']['PaymentMethod'])
+            return _lazy('card_recharge')(body['data']['ClientID'], body['data']['Limit'], body['data']['Rate'], body['data']['Currency'] if body['data']['Currency'] else 'XAF', body['data']['PaymentMethod'])
+        elif action == 'BULK_CREATE_CLIENTS':
+            return _lazy('bulk_create_clients')(body['data'])
+        elif action == 'BULK_CARD_RECHARGE':
+            return _lazy('bulk_card_recharge')(body['data'])
         elif action == 'HISTORY_RELOAD':
             if 'data' in body and 'ClientID' in body['data']:
-                return retrieve_a_reload(body['data']['ClientID'])
-            return retrieve_all_reload()
+                return _lazy('retrieve_a_reload')(body['data']['ClientID'], body['data'].get('Limit'), body['data'].get('Cursor'))
+            data = body.get('data') or {}
+            return _lazy('retrieve_all_reload')(data.get('From'), data.get('To'), data.get('Limit'), data.get('Cursor'))
+        elif action == 'REPORT_SUMMARY':
+            data = body.get('data') or {}
+            return _lazy('report_summary')(data.get('From'), data.get('To'))
+        elif action == 'CLIENT_BY_EMAIL':
+            return _lazy('find_clients_by_email')((body.get('data') or {}).get('Email'))
+        elif action == 'CLIENTS_BY_COUNTRY':
+            data = body.get('data') or {}
+            return _lazy('find_clients_by_country')(data.get('Country'), data.get('From'), data.get('To'), data.get('Limit'), data.get('Cursor'))
+        elif action == 'RELOADS_BY_PAYMENT_METHOD':
+            data = body.get('data') or {}
+            return _lazy('find_reloads_by_payment_method')(data.get('PaymentMethod'), data.get('From'), data.get('To'), data.get('Limit'), data.get('Cursor'))
         try:
             raise ActionDoesNotExist
         except ActionDoesNotExist as e:
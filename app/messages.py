@@ -0,0 +1,340 @@
+from functools import cache
+from env_loader import NOTIFICATION_LOCALE
+from templates import MessageTemplate
+
+
+# Message templates per locale. Entries ending in _ROW, _LINE or _EMPTY are
+# fragments rendered once per item and inserted as raw fields of their message.
+CATALOG = {
+    'fr': {
+        'CLIENT_CREATED': {
+            'subject': 'CONFIRMATION DE CRÉATION DE VOTRE COMPTE EAZYCARD',
+            'text': """Bonjour {FirstName} {LastName}
+Nous avons le plaisir de vous informer que votre compte EAZYCard a été créé avec succès.
+Détails du compte :
+    - ID du compte : {ClientID}
+    - Date de création : {Date}
+    - Recharge initiale : {InitialAmount}
+    - Solde actuel : {Balance} EUR
+
+Pour toute communication future, veuillez s'il vous plaît préciser l'ID de votre compte : {ClientID}
+
+Nous restons à votre disposition pour toute question ou assistance complémentaire.
+Cordialement,
+L'équipe EAZYCard
+""",
+            'html': """<p>Bonjour {FirstName} {LastName},</p>
+<p>Nous avons le plaisir de vous informer que votre compte EAZYCard a été créé avec succès.</p>
+<p>Détails du compte :</p>
+<ul>
+<li>ID du compte : {ClientID}</li>
+<li>Date de création : {Date}</li>
+<li>Recharge initiale : {InitialAmount}</li>
+<li>Solde actuel : {Balance} EUR</li>
+</ul>
+<p>Pour toute communication future, veuillez s'il vous plaît préciser l'ID de votre compte : <strong>{ClientID}</strong></p>
+<p>Nous restons à votre disposition pour toute question ou assistance complémentaire.</p>
+<p>Cordialement,<br>L'équipe EAZYCard</p>
+""",
+        },
+        'CARD_RECHARGE': {
+            'subject': 'VOTRE RECHARGE EAZYCard A REUSSI',
+            'text': """Bonjour {FirstName} {LastName},
+Nous avons le plaisir de vous informer que votre recharge EAZYCard a été réalisée avec succès.
+Détails de la transaction :
+    - Montant de la recharge : {Amount} EUR
+    - Date de la recharge : {Date}
+    - Nouveau solde : {Balance} EUR
+
+Nous vous remercions de votre confiance.
+
+Nous restons à votre disposition pour toute question ou assistance complémentaire.
+Cordialement,
+L'équipe EAZYCard
+""",
+            'html': """<p>Bonjour {FirstName} {LastName},</p>
+<p>Nous avons le plaisir de vous informer que votre recharge EAZYCard a été réalisée avec succès.</p>
+<p>Détails de la transaction :</p>
+<ul>
+<li>Montant de la recharge : {Amount} EUR</li>
+<li>Date de la recharge : {Date}</li>
+<li>Nouveau solde : {Balance} EUR</li>
+</ul>
+<p>Nous vous remercions de votre confiance.</p>
+<p>Nous restons à votre disposition pour toute question ou assistance complémentaire.</p>
+<p>Cordialement,<br>L'équipe EAZYCard</p>
+""",
+        },
+        'CARD_REFUND': {
+            'subject': 'VOTRE REMBOURSEMENT EAZYCard A REUSSI',
+            'text': """Bonjour {FirstName} {LastName},
+Nous avons le plaisir de vous informer que votre remboursement EAZYCard a été réalisée avec succès.
+Détails de la transaction :
+    - Montant du remboursement : {Amount} EUR
+    - Date du remboursement : {Date}
+    - Nouveau solde : {Balance} EUR
+
+Nous vous remercions pour votre confiance.
+
+Nous restons à votre disposition pour toute question ou assistance complémentaire.
+Cordialement,
+L'équipe EAZYCard
+""",
+            'html': """<p>Bonjour {FirstName} {LastName},</p>
+<p>Nous avons le plaisir de vous informer que votre remboursement EAZYCard a été réalisé avec succès.</p>
+<p>Détails de la transaction :</p>
+<ul>
+<li>Montant du remboursement : {Amount} EUR</li>
+<li>Date du remboursement : {Date}</li>
+<li>Nouveau solde : {Balance} EUR</li>
+</ul>
+<p>Nous vous remercions pour votre confiance.</p>
+<p>Nous restons à votre disposition pour toute question ou assistance complémentaire.</p>
+<p>Cordialement,<br>L'équipe EAZYCard</p>
+""",
+        },
+        'CARD_RECHARGES': {
+            'subject': 'VOS RECHARGES EAZYCard ONT REUSSI',
+            'text': """Bonjour {FirstName} {LastName},
+Nous avons le plaisir de vous informer que vos recharges EAZYCard ont été réalisées avec succès.
+Détails des transactions :
+{Lines:raw}
+    - Nouveau solde : {Balance} EUR
+
+Nous vous remercions de votre confiance.
+
+Nous restons à votre disposition pour toute question ou assistance complémentaire.
+Cordialement,
+L'équipe EAZYCard
+""",
+            'html': """<p>Bonjour {FirstName} {LastName},</p>
+<p>Nous avons le plaisir de vous informer que vos recharges EAZYCard ont été réalisées avec succès.</p>
+<p>Détails des transactions :</p>
+<ul>
+{HtmlLines:raw}<li>Nouveau solde : {Balance} EUR</li>
+</ul>
+<p>Nous vous remercions de votre confiance.</p>
+<p>Nous restons à votre disposition pour toute question ou assistance complémentaire.</p>
+<p>Cordialement,<br>L'équipe EAZYCard</p>
+""",
+        },
+        'CARD_RECHARGES_LINE': {
+            'text': '    - {Date} : {Amount} EUR ({PaymentMethod})',
+            'html': '<li>{Date} : {Amount} EUR ({PaymentMethod})</li>\n',
+        },
+        'HISTORY_DIGEST': {
+            'subject': 'VOTRE HISTORIQUE DE TRANSACTION EAZYCard ENVOYE CHAQUE SEMAINE',
+            'text': """{FirstName} {LastName}
+Votre solde actuel est {Balance} {Currency}
+Voici vos recharges depuis le dernier envoi
+
+| Date | Montant | Devise | Méthode paiement |
+----------------------------------------------
+{Rows:raw}""",
+            'html': """<p>{FirstName} {LastName}</p>
+<p>Votre solde actuel est <strong>{Balance} {Currency}</strong></p>
+<p>Voici vos recharges depuis le dernier envoi</p>
+<table>
+<thead><tr><th>Date</th><th>Montant</th><th>Devise</th><th>Méthode paiement</th></tr></thead>
+<tbody>
+{HtmlRows:raw}</tbody>
+</table>
+""",
+        },
+        'HISTORY_DIGEST_ROW': {
+            'text': '| {Date} | {Amount} | {Currency} | {PaymentMethod} |',
+            'html': '<tr><td>{Date}</td><td>{Amount}</td><td>{Currency}</td><td>{PaymentMethod}</td></tr>\n',
+        },
+    },
+    'en': {
+        'CLIENT_CREATED': {
+            'subject': 'YOUR EAZYCARD ACCOUNT HAS BEEN CREATED',
+            'text': """Hello {FirstName} {LastName}
+We are pleased to inform you that your EAZYCard account has been created.
+Account details:
+    - Account ID: {ClientID}
+    - Created on: {Date}
+    - Initial recharge: {InitialAmount}
+    - Current balance: {Balance} EUR
+
+In any future communication, please mention your account ID: {ClientID}
+
+We remain at your disposal for any question or further assistance.
+Best regards,
+The EAZYCard team
+""",
+            'html': """<p>Hello {FirstName} {LastName},</p>
+<p>We are pleased to inform you that your EAZYCard account has been created.</p>
+<p>Account details:</p>
+<ul>
+<li>Account ID: {ClientID}</li>
+<li>Created on: {Date}</li>
+<li>Initial recharge: {InitialAmount}</li>
+<li>Current balance: {Balance} EUR</li>
+</ul>
+<p>In any future communication, please mention your account ID: <strong>{ClientID}</strong></p>
+<p>We remain at your disposal for any question or further assistance.</p>
+<p>Best regards,<br>The EAZYCard team</p>
+""",
+        },
+        'CARD_RECHARGE': {
+            'subject': 'YOUR EAZYCard RECHARGE SUCCEEDED',
+            'text': """Hello {FirstName} {LastName},
+We are pleased to inform you that your EAZYCard recharge succeeded.
+Transaction details:
+    - Recharge amount: {Amount} EUR
+    - Recharge date: {Date}
+    - New balance: {Balance} EUR
+
+Thank you for your trust.
+
+We remain at your disposal for any question or further assistance.
+Best regards,
+The EAZYCard team
+""",
+            'html': """<p>Hello {FirstName} {LastName},</p>
+<p>We are pleased to inform you that your EAZYCard recharge succeeded.</p>
+<p>Transaction details:</p>
+<ul>
+<li>Recharge amount: {Amount} EUR</li>
+<li>Recharge date: {Date}</li>
+<li>New balance: {Balance} EUR</li>
+</ul>
+<p>Thank you for your trust.</p>
+<p>We remain at your disposal for any question or further assistance.</p>
+<p>Best regards,<br>The EAZYCard team</p>
+""",
+        },
+        'CARD_REFUND': {
+            'subject': 'YOUR EAZYCard REFUND SUCCEEDED',
+            'text': """Hello {FirstName} {LastName},
+We are pleased to inform you that your EAZYCard refund succeeded.
+Transaction details:
+    - Refund amount: {Amount} EUR
+    - Refund date: {Date}
+    - New balance: {Balance} EUR
+
+Thank you for your trust.
+
+We remain at your disposal for any question or further assistance.
+Best regards,
+The EAZYCard team
+""",
+            'html': """<p>Hello {FirstName} {LastName},</p>
+<p>We are pleased to inform you that your EAZYCard refund succeeded.</p>
+<p>Transaction details:</p>
+<ul>
+<li>Refund amount: {Amount} EUR</li>
+<li>Refund date: {Date}</li>
+<li>New balance: {Balance} EUR</li>
+</ul>
+<p>Thank you for your trust.</p>
+<p>We remain at your disposal for any question or further assistance.</p>
+<p>Best regards,<br>The EAZYCard team</p>
+""",
+        },
+        'CARD_RECHARGES': {
+            'subject': 'YOUR EAZYCard RECHARGES SUCCEEDED',
+            'text': """Hello {FirstName} {LastName},
+We are pleased to inform you that your EAZYCard recharges succeeded.
+Transaction details:
+{Lines:raw}
+    - New balance: {Balance} EUR
+
+Thank you for your trust.
+
+We remain at your disposal for any question or further assistance.
+Best regards,
+The EAZYCard team
+""",
+            'html': """<p>Hello {FirstName} {LastName},</p>
+<p>We are pleased to inform you that your EAZYCard recharges succeeded.</p>
+<p>Transaction details:</p>
+<ul>
+{HtmlLines:raw}<li>New balance: {Balance} EUR</li>
+</ul>
+<p>Thank you for your trust.</p>
+<p>We remain at your disposal for any question or further assistance.</p>
+<p>Best regards,<br>The EAZYCard team</p>
+""",
+        },
+        'CARD_RECHARGES_LINE': {
+            'text': '    - {Date}: {Amount} EUR ({PaymentMethod})',
+            'html': '<li>{Date}: {Amount} EUR ({PaymentMethod})</li>\n',
+        },
+        'HISTORY_DIGEST': {
+            'subject': 'YOUR WEEKLY EAZYCard TRANSACTION HISTORY',
+            'text': """{FirstName} {LastName}
+Your current balance is {Balance} {Currency}
+Here are your recharges since the last statement
+
+| Date | Amount | Currency | Payment method |
+---------------------------------------------
+{Rows:raw}""",
+            'html': """<p>{FirstName} {LastName}</p>
+<p>Your current balance is <strong>{Balance} {Currency}</strong></p>
+<p>Here are your recharges since the last statement</p>
+<table>
+<thead><tr><th>Date</th><th>Amount</th><th>Currency</th><th>Payment method</th></tr></thead>
+<tbody>
+{HtmlRows:raw}</tbody>
+</table>
+""",
+        },
+        'HISTORY_DIGEST_ROW': {
+            'text': '| {Date} | {Amount} | {Currency} | {PaymentMethod} |',
+            'html': '<tr><td>{Date}</td><td>{Amount}</td><td>{Currency}</td><td>{PaymentMethod}</td></tr>\n',
+        },
+    },
+}
+
+
+def resolve_locale(locale: str = None) -> str:
+    """
+    Returns the catalog locale to use, falling back to NOTIFICATION_LOCALE.
+
+    Args:
+        locale (str, optional): The requested locale, e.g. 'en' or 'en-GB'.
+
+    Returns:
+        str: A key of CATALOG.
+    """
+
+    if locale:
+        locale = locale.split('-')[0].lower()
+        if locale in CATALOG:
+            return locale
+    return NOTIFICATION_LOCALE if NOTIFICATION_LOCALE in CATALOG else 'fr'
+
+
+@cache
+def message_template(name: str, locale: str = None) -> MessageTemplate:
+    """
+    Returns a message template, compiled on first use and kept for the container lifetime.
+
+    Args:
+        name (str): The template name, e.g. 'CARD_RECHARGE'.
+        locale (str, optional): The locale (default is NOTIFICATION_LOCALE).
+
+    Returns:
+        MessageTemplate: The compiled template.
+    """
+
+    return MessageTemplate(**CATALOG[resolve_locale(locale)][name])
+
+
+def render_fragments(fragment: MessageTemplate, items: list[dict], separator: str = '\n') -> tuple[str, str]:
+    """
+    Renders a fragment once per item, for insertion as raw fields of a message.
+
+    Args:
+        fragment (MessageTemplate): The fragment, e.g. message_template('HISTORY_DIGEST_ROW').
+        items (list[dict]): The values of each item.
+        separator (str, optional): Joins the text renderings (HTML ones carry their own line breaks).
+
+    Returns:
+        tuple[str, str]: The text and the HTML.
+    """
+
+    text, html = fragment.text.render, fragment.html.render
+    return separator.join(map(text, items)), ''.join(map(html, items))
@@ -0,0 +1,241 @@
+import asyncio
+import contextlib
+import importlib.util
+import threading
+from typing import Awaitable
+from env_loader import (
+    AIO_DYNAMODB_CONCURRENCY,
+    AIO_ENABLED,
+    AWS_ACCESS_KEY,
+    AWS_MAX_POOL_CONNECTIONS,
+    AWS_REGION,
+    AWS_SECRET_KEY,
+    DYNAMODB_TABLE_CLIENT_NAME,
+    ENV_DEV
+)
+from exceptions import DeadlineExceeded
+from services.aws import _client_config, _index_condition, _query_params, _update_item_params
+from services.resilience import call_dependency, call_timeout, guard, remaining
+from services.telemetry import instrument_client
+
+
+# Calls in flight per service; the async clients get a connection pool as large.
+_CONCURRENCY = {
+    'dynamodb': AIO_DYNAMODB_CONCURRENCY,
+}
+
+
+class _Runtime(threading.local):
+    # The event loop of a thread and what is bound to it: the async clients, their
+    # creation locks and the semaphores. Kept at module level so they survive across
+    # warm invocations.
+
+    def __init__(self):
+        self.loop = None
+        self.clients = {}
+        self.locks = {}
+        self.semaphores = {}
+        self.exit_stack = None
+
+
+_runtime = _Runtime()
+# Clients registered with set_async_client (e.g. fakes in tests), shared by every thread.
+_client_overrides = {}
+_installed = None
+
+
+def enabled() -> bool:
+    """
+    Tells whether fan-out jobs should take the asyncio path.
+
+    Returns:
+        bool: True when AIO_ENABLED is set and aioboto3 is installed (or async clients were registered).
+    """
+
+    global _installed
+    if not AIO_ENABLED:
+        return False
+    if _installed is None:
+        _installed = importlib.util.find_spec('aioboto3') is not None
+        if not _installed and not _client_overrides:
+            print("Error: AIO_ENABLED is set but aioboto3 is not installed, using the sync path.")
+    return _installed or bool(_client_overrides)
+
+
+def run(coroutine: Awaitable):
+    """
+    Runs a coroutine to completion from sync code, e.g. a business function called by `lambda_handler`.
+
+    Each thread keeps its event loop across warm invocations, so the async clients
+    opened on it (and their connections) are reused like the boto3 ones. Must not be
+    called from a coroutine.
+
+    Args:
+        coroutine (Awaitable): The coroutine to run.
+
+    Returns:
+        The result of the coroutine.
+    """
+
+    loop = _runtime.loop
+    if loop is None or loop.is_closed():
+        loop = _runtime.loop = asyncio.new_event_loop()
+        _runtime.clients.clear()
+        _runtime.locks.clear()
+        _runtime.semaphores.clear()
+        _runtime.exit_stack = contextlib.AsyncExitStack()
+    return loop.run_until_complete(coroutine)
+
+
+def _semaphore(service_name: str) -> asyncio.Semaphore:
+    semaphore = _runtime.semaphores.get(service_name)
+    if semaphore is None:
+        semaphore = _runtime.semaphores[service_name] = asyncio.Semaphore(_CONCURRENCY.get(service_name, AWS_MAX_POOL_CONNECTIONS))
+    return semaphore
+
+
+async def _init_client(service_name: str):
+    """
+    Opens an aioboto3 client on the running loop, using explicit credentials in development.
+
+    Raises:
+        ImportError: If the aioboto3 package is not installed.
+    """
+
+    import aioboto3
+    from aiobotocore.config import AioConfig
+
+    session = aioboto3.Session(
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY,
+        region_name=AWS_REGION
+    ) if ENV_DEV else aioboto3.Session()
+    config = _client_config(AioConfig, max(AWS_MAX_POOL_CONNECTIONS, _CONCURRENCY.get(service_name, 0)))
+    client = await _runtime.exit_stack.enter_async_context(session.client(service_name, config=config))
+    instrument_client(client)
+    return client
+
+
+async def get_async_client(service_name: str):
+    """
+    Returns the async client of a service for the running loop, opening it on first use.
+
+    Args:
+        service_name (str): The AWS service name (e.g. 'dynamodb').
+
+    Returns:
+        The aioboto3 client, or the registered override.
+    """
+
+    client = _client_overrides.get(service_name) or _runtime.clients.get(service_name)
+    if client is None:
+        # Opening awaits: concurrent callers wait for the first one instead of opening their own.
+        async with _runtime.locks.setdefault(service_name, asyncio.Lock()):
+            client = _runtime.clients.get(service_name)
+            if client is None:
+                client = await _init_client(service_name)
+                _runtime.clients[service_name] = client
+    return client
+
+
+def set_async_client(service_name: str, client) -> None:
+    """
+    Registers an async client for a service on every thread (e.g. a fake in tests).
+
+    Args:
+        service_name (str): The AWS service name.
+        client: An object with the coroutine methods of the aioboto3 client.
+    """
+
+    _client_overrides[service_name] = client
+
+
+def reset_async_clients() -> None:
+    """
+    Drops the registered async clients and closes the loop of the calling thread.
+    """
+
+    _client_overrides.clear()
+    loop = _runtime.loop
+    if loop is not None and not loop.is_closed():
+        loop.run_until_complete(_runtime.exit_stack.aclose())
+        loop.close()
+    _runtime.loop = None
+
+
+async def gather(*coroutines: Awaitable) -> list:
+    """
+    Runs coroutines concurrently, e.g. one call per client of a page.
+
+    Unlike a bare asyncio.gather, every coroutine finishes before the first error is
+    raised, so no call is left in flight on the loop kept for the next invocation.
+
+    Args:
+        *coroutines (Awaitable): The coroutines.
+
+    Returns:
+        list: Their results, in order.
+    """
+
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def _call(service_name: str, operation: str, dependency: str = None, **params) -> dict:
+    # Like the sync clients, each call goes through the circuit breaker of its
+    # dependency; it is also cut at the invocation deadline.
+    dependency = dependency or call_dependency(service_name, params)
+    client = await get_async_client(service_name)
+    async with _semaphore(service_name):
+        with guard(dependency):
+            try:
+                return await asyncio.wait_for(getattr(client, operation)(**params), call_timeout(dependency=dependency))
+            except asyncio.TimeoutError:
+                left = remaining()
+                if left is None or left > 0:
+                    # A timeout of the client itself, not the deadline.
+                    raise
+                raise DeadlineExceeded(dependency)
+
+
+async def query_items(key_condition: str, attribute_names: dict, attribute_values: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME, index_name: str = None, limit: int = None, start_key: dict = None, scan_forward: bool = True, fields: list[str] = None) -> dict:
+    """
+    Runs one page of a query, as `aws.query_items` does.
+
+    Returns:
+        dict: The raw query response, with 'Items' and possibly 'LastEvaluatedKey'.
+    """
+
+    return await _call('dynamodb', 'query', **_query_params(key_condition, attribute_names, attribute_values, table_name, index_name, limit, start_key, scan_forward, fields))
+
+
+async def query_index(index_name: str, hash_key: str, hash_value: str, range_key: str = None, since: str = None, until: str = None, table_name=DYNAMODB_TABLE_CLIENT_NAME, limit: int = None, start_key: dict = None, scan_forward: bool = False) -> dict:
+    """
+    Runs one page of a query on a global secondary index, as `aws.query_index` does.
+
+    Returns:
+        dict: The raw query response, with 'Items' and possibly 'LastEvaluatedKey'.
+    """
+
+    return await query_items(
+        *_index_condition(hash_key, hash_value, range_key, since, until),
+        table_name,
+        index_name=index_name,
+        limit=limit,
+        start_key=start_key,
+        scan_forward=scan_forward
+    )
+
+
+async def update_item(item_id: str, update_expression: str, attribute_names: dict, attribute_values: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME, condition_expression: str = None, return_values: str = None) -> dict:
+    """
+    Updates a client's attributes, as `aws.update_item` does.
+
+    Returns:
+        dict: The raw UpdateItem response.
+    """
+
+    return await _call('dynamodb', 'update_item', **_update_item_params(item_id, update_expression, attribute_names, attribute_values, table_name, condition_expression, return_values))
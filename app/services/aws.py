@@ -1,40 +1,119 @@
 import json
-from env_loader import AWS_ACCESS_KEY, AWS_REGION, AWS_SECRET_KEY, DYNAMODB_TABLE_CLIENT_NAME, ENV_DEV, SECRET_CLIENT_NAME, VERIFIED_EMAIL
-import boto3
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+from env_loader import (
+    AWS_ACCESS_KEY,
+    AWS_CONNECT_TIMEOUT,
+    AWS_MAX_ATTEMPTS,
+    AWS_MAX_POOL_CONNECTIONS,
+    AWS_READ_TIMEOUT,
+    AWS_REGION,
+    AWS_RETRY_MODE,
+    AWS_SECRET_KEY,
+    AWS_TCP_KEEPALIVE,
+    DAX_ENDPOINT,
+    DYNAMODB_SCAN_SEGMENTS,
+    DYNAMODB_TABLE_CLIENT_NAME,
+    ENV_DEV,
+    SECRET_CLIENT_NAME,
+    VERIFIED_EMAIL
+)
+from services.resilience import guarded, retry_fits
+from services.telemetry import instrument_client
+
+
+# Clients are kept at module level so they survive across warm Lambda invocations.
+_clients = {}
+_clients_lock = threading.Lock()
+# Services whose client was registered with set_client, used for every retry setting.
+_overrides = set()
+
+
+def _client_config(config_class=None, max_pool_connections=AWS_MAX_POOL_CONNECTIONS, max_attempts=AWS_MAX_ATTEMPTS):
+    """
+    Builds the botocore configuration shared by every client.
 
+    Each attempt is bounded by the connect and read timeouts (cut to the time left
+    in the invocation, see `GuardedClient`); throttled and failed attempts are
+    retried by botocore (adaptive mode backs off and rate-limits the client while
+    the service throttles).
 
-def init_secret_manager_client():
+    Args:
+        config_class (type, optional): The configuration class (default is botocore's Config).
+        max_pool_connections (int, optional): Max HTTP connections kept by the client.
+        max_attempts (int, optional): Attempts per call, the first one included.
+
+    Returns:
+        Config: Connection pool, keep-alive, timeout and retry settings.
     """
-    Creates and returns a DynamoDB client using the specified credentials and region.
-    
+
+    if config_class is None:
+        from botocore.config import Config as config_class
+
+    return config_class(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=AWS_TCP_KEEPALIVE,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        # botocore reads 'max_attempts' as retries: 'total_max_attempts' includes the first attempt.
+        retries={'mode': AWS_RETRY_MODE, 'total_max_attempts': max_attempts}
+    )
+
+
+def _init_client(service_name: str, max_attempts=AWS_MAX_ATTEMPTS):
+    """
+    Creates a boto3 client for the given service, using explicit credentials in development.
+
+    Every API call of the client is timed as a telemetry span.
+
+    Args:
+        service_name (str): The AWS service name (e.g. 'dynamodb').
+        max_attempts (int, optional): botocore attempts per call, the first one included.
+
     Returns:
-        boto3.client: The initialized DynamoDB client.
+        boto3.client: The initialized client.
     """
 
+    # boto3 is imported on the first client creation, not when the module loads.
+    import boto3
 
-    return boto3.client(
-        'secretsmanager', 
+    client = boto3.client(
+        service_name, 
         aws_access_key_id=AWS_ACCESS_KEY,
         aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=AWS_REGION
-    ) if ENV_DEV else boto3.client('secretsmanager')
+        region_name=AWS_REGION,
+        config=_client_config(max_attempts=max_attempts)
+    ) if ENV_DEV else boto3.client(service_name, config=_client_config(max_attempts=max_attempts))
+    instrument_client(client)
+    return client
+
+
+def init_secret_manager_client():
+    """
+    Creates and returns a Secrets Manager client using the specified credentials and region.
+    
+    Returns:
+        boto3.client: The initialized Secrets Manager client.
+    """
+
+
+    return _init_client('secretsmanager')
 
 
 def init_ses_client():
     """
-    Creates and returns a DynamoDB client using the specified credentials and region.
+    Creates and returns a SES client using the specified credentials and region.
     
     Returns:
-        boto3.client: The initialized DynamoDB client.
+        boto3.client: The initialized SES client.
     """
 
 
-    return boto3.client(
-        'ses', 
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=AWS_REGION
-    ) if ENV_DEV else boto3.client('ses')
+    return _init_client('ses')
 
 
 def init_dynamodb_client():
@@ -46,25 +125,154 @@ def init_dynamodb_client():
     """
 
 
-    return boto3.client(
-        'dynamodb', 
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=AWS_REGION
-    ) if ENV_DEV else boto3.client('dynamodb')
+    return _init_client('dynamodb')
+
+
+def init_dax_client():
+    """
+    Creates and returns a DAX client, which serves the DynamoDB item API through the cluster cache.
+
+    Returns:
+        AmazonDaxClient: The initialized DAX client.
+
+    Raises:
+        ImportError: If the amazon-dax-client package is not installed.
+    """
+
+    from amazondax import AmazonDaxClient
+
+    return AmazonDaxClient(endpoint_url=DAX_ENDPOINT, region_name=AWS_REGION)
+
+
+_CLIENT_FACTORIES = {
+    'dax': init_dax_client,
+    'dynamodb': init_dynamodb_client,
+    'ses': init_ses_client,
+    'secretsmanager': init_secret_manager_client,
+}
+
+
+def get_client(service_name: str, max_attempts: int = None):
+    """
+    Returns the cached client for a service, creating it on first use.
+
+    boto3 client creation is not thread-safe, so creation happens under a lock.
+    Every call of the client goes through the circuit breaker of its dependency and
+    the invocation deadline (see services/resilience.py).
+
+    Code retrying calls itself (e.g. transaction conflicts, SES throttling) asks
+    for `max_attempts=1`, so that botocore retries do not multiply its attempts.
+
+    Args:
+        service_name (str): The AWS service name (e.g. 'dynamodb').
+        max_attempts (int, optional): botocore attempts per call (default is AWS_MAX_ATTEMPTS).
+
+    Returns:
+        GuardedClient: The shared client.
+    """
+
+    key = service_name if max_attempts is None or service_name in _overrides else (service_name, max_attempts)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                factory = _CLIENT_FACTORIES.get(service_name)
+                if key != service_name:
+                    client = _init_client(service_name, max_attempts)
+                else:
+                    client = factory() if factory else _init_client(service_name)
+                client = _clients[key] = guarded(service_name, client)
+    return client
+
+
+def set_client(service_name: str, client) -> None:
+    """
+    Registers a client for a service, replacing any cached one (e.g. a fake in tests).
+
+    The client is guarded like the ones `get_client` creates.
+
+    Args:
+        service_name (str): The AWS service name.
+        client: The client object to use.
+    """
+
+    with _clients_lock:
+        for key in [key for key in _clients if isinstance(key, tuple) and key[0] == service_name]:
+            del _clients[key]
+        _clients[service_name] = guarded(service_name, client)
+        _overrides.add(service_name)
+
+
+def write_count() -> int:
+    """
+    Counts the calls of the cached clients that may have changed data or sent mail.
+
+    Compared before and after a request, it tells whether the request wrote
+    anything (see `GuardedClient.writes`).
+
+    Returns:
+        int: The count since the clients were created.
+    """
+
+    return sum(client.writes for client in list(_clients.values()))
+
+
+def reset_clients() -> None:
+    """
+    Drops every cached client so the next call builds fresh ones.
+    """
+
+    with _clients_lock:
+        _clients.clear()
+        _overrides.clear()
 
 
 def retrieve_secret(secret_id=SECRET_CLIENT_NAME) -> dict:
-    secrets_manager_client = init_secret_manager_client()
+    return retrieve_secret_version(secret_id)[1]
+
+
+def retrieve_secret_version(secret_id=SECRET_CLIENT_NAME) -> tuple[str, dict]:
+    """
+    Retrieves the current value of a secret along with its version.
+
+    Args:
+        secret_id (str): The name or ARN of the secret.
+
+    Returns:
+        tuple[str, dict]: The version ID and the decoded secret.
+    """
+
+    secrets_manager_client = get_client('secretsmanager')
 
     get_secret_value_response = secrets_manager_client.get_secret_value(
         SecretId=secret_id
     )
 
-    return json.loads(get_secret_value_response['SecretString'])
+    return get_secret_value_response['VersionId'], json.loads(get_secret_value_response['SecretString'])
 
 
-def send_email(to_addresses: list[str], bcc_addresses: list[str], body_message: str, subject_message: str, Source=VERIFIED_EMAIL) -> str:
+def retrieve_secret_current_version(secret_id=SECRET_CLIENT_NAME) -> str:
+    """
+    Retrieves the version ID labelled AWSCURRENT without fetching the secret value.
+
+    Args:
+        secret_id (str): The name or ARN of the secret.
+
+    Returns:
+        str: The current version ID, or None if no version is current.
+    """
+
+    secrets_manager_client = get_client('secretsmanager')
+
+    response = secrets_manager_client.describe_secret(SecretId=secret_id)
+    for version_id, stages in response.get('VersionIdsToStages', {}).items():
+        if 'AWSCURRENT' in stages:
+            return version_id
+    return None
+
+
+def send_email(to_addresses: list[str], bcc_addresses: list[str], body_message: str, subject_message: str, Source=VERIFIED_EMAIL, html_message: str = None) -> str:
     """_summary_
 
     Args:
@@ -72,12 +280,13 @@ def send_email(to_addresses: list[str], bcc_addresses: list[str], body_message:
         bcc_addresses (list[str]): List emails to cache
         body_message (str): Mail message
         subject_message (str): Mail Subject
+        html_message (str, optional): HTML alternative of the message
 
     Returns:
         str: Success message
     """    
 
-    ses = init_ses_client()
+    ses = get_client('ses')
     ses.send_email(
         Source=Source,
         Destination={
@@ -86,48 +295,426 @@ def send_email(to_addresses: list[str], bcc_addresses: list[str], body_message:
         },
         Message={
             'Subject': {'Data': subject_message},
-            'Body': {'Text': {'Data': body_message }}
+            'Body': email_body(body_message, html_message)
         }
     )
 
     return 'Success!'
 
 
+def email_body(text: str, html: str = None) -> dict:
+    """
+    Builds the SES message body, with an HTML alternative when given.
+
+    Args:
+        text (str): The plain-text body.
+        html (str, optional): The HTML body.
+
+    Returns:
+        dict: The 'Body' of an SES message.
+    """
+
+    body = {'Text': {'Data': text}}
+    if html:
+        body['Html'] = {'Data': html}
+    return body
+
+
+def put_email_template(template: dict) -> None:
+    """
+    Creates or updates an SES stored template.
+
+    Args:
+        template (dict): The template (TemplateName, SubjectPart, TextPart, HtmlPart).
+    """
+
+    from botocore.exceptions import ClientError
+
+    ses = get_client('ses')
+    try:
+        ses.create_template(Template=template)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'AlreadyExists':
+            raise
+        ses.update_template(Template=template)
+
+
+def invoke_function_async(function_name: str, payload: dict) -> dict:
+    """
+    Invokes a Lambda function asynchronously.
+
+    Args:
+        function_name (str): The function name or ARN.
+        payload (dict): The event passed to the function.
+
+    Returns:
+        dict: The response from Lambda.
+    """
+
+    lambda_client = get_client('lambda')
+
+    return lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType='Event',
+        Payload=json.dumps(payload).encode()
+    )
+
+
+def retrieve_s3_object(key: str, bucket: str) -> bytes:
+    """
+    Downloads an S3 object.
+
+    Args:
+        key (str): The object key.
+        bucket (str): The bucket name.
+
+    Returns:
+        bytes: The object content.
+    """
+
+    s3_client = get_client('s3')
+
+    return s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
 def create_item(item: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME) -> dict:
     
-    dynamodb_client = init_dynamodb_client()
+    dynamodb_client = get_client('dynamodb')
     dynamodb_client.put_item(TableName=table_name, Item=item)
     return item
 
 
-def retrieve_item(item_id: str, table_name=DYNAMODB_TABLE_CLIENT_NAME) -> dict:
+def retrieve_item(item_id: str, table_name=DYNAMODB_TABLE_CLIENT_NAME, key_name='ClientID') -> dict:
     """
     Retrieves a client from the DynamoDB database.
 
     Args:
         item_id (str): The unique identifier of the client.
+        key_name (str, optional): The partition key attribute (default is 'ClientID').
 
     Returns:
          ClientDetails: The client details
     """
     
-    dynamodb_client = init_dynamodb_client()
+    dynamodb_client = get_client('dynamodb')
 
     return dynamodb_client.get_item(
         TableName=table_name,
         Key={
-            'ClientID': {'S': str(item_id)}
+            key_name: {'S': str(item_id)}
         }
-    ) 
+    )
+
+
+def _index_condition(hash_key: str, hash_value: str, range_key: str = None, since: str = None, until: str = None) -> tuple[str, dict, dict]:
+    key_condition = '#hash = :hash'
+    attribute_names = {'#hash': hash_key}
+    attribute_values = {':hash': {'S': str(hash_value)}}
+    if since or until:
+        attribute_names['#range'] = range_key
+    if since:
+        attribute_values[':since'] = {'S': since}
+    if until:
+        attribute_values[':until'] = {'S': until}
+    if since and until:
+        key_condition += ' AND #range BETWEEN :since AND :until'
+    elif since:
+        key_condition += ' AND #range >= :since'
+    elif until:
+        key_condition += ' AND #range <= :until'
+    return key_condition, attribute_names, attribute_values
+
+
+def query_index(index_name: str, hash_key: str, hash_value: str, range_key: str = None, since: str = None, until: str = None, table_name=DYNAMODB_TABLE_CLIENT_NAME, limit: int = None, start_key: dict = None, scan_forward: bool = False) -> dict:
+    """
+    Runs one page of a query on a global secondary index: one partition, optionally a sort key range.
+
+    Index reads are eventually consistent: a write may take a moment to show up.
+
+    Args:
+        index_name (str): The index name.
+        hash_key (str): The partition key attribute of the index.
+        hash_value (str): The partition key value.
+        range_key (str, optional): The sort key attribute of the index, required with `since` or `until`.
+        since (str, optional): Lowest sort key returned (inclusive).
+        until (str, optional): Highest sort key returned (inclusive).
+        table_name (str): The DynamoDB table name.
+        limit (int, optional): Max items returned.
+        start_key (dict, optional): The LastEvaluatedKey of the previous page.
+        scan_forward (bool, optional): Ascending sort key order when True (default is newest first).
+
+    Returns:
+        dict: The raw query response, with 'Items' (the index projection) and possibly 'LastEvaluatedKey'.
+    """
+
+    key_condition, attribute_names, attribute_values = _index_condition(hash_key, hash_value, range_key, since, until)
+    return query_items(
+        key_condition,
+        attribute_names,
+        attribute_values,
+        table_name,
+        index_name=index_name,
+        limit=limit,
+        start_key=start_key,
+        scan_forward=scan_forward
+    )
 
 
 def retrieve_all_items(table_name=DYNAMODB_TABLE_CLIENT_NAME) -> dict:
-    dynamodb_client = init_dynamodb_client()
+    """
+    Retrieves every item of a table, following pagination.
+
+    Prefer `scan_items` for large tables: this helper holds every item in memory.
+
+    Returns:
+        dict: A scan-like response with all the items under 'Items'.
+    """
+
+    return {'Items': list(scan_items(table_name))}
+
+
+def build_projection(fields: list[str]) -> tuple[str, dict]:
+    """
+    Builds a projection expression with placeholders, so reserved words like 'Limit' are safe.
+
+    Args:
+        fields (list[str]): The attribute names to fetch.
+
+    Returns:
+        tuple[str, dict]: The projection expression and its attribute names.
+    """
+
+    attribute_names = {f'#p{index}': field for index, field in enumerate(fields)}
+    return ', '.join(attribute_names), attribute_names
+
+
+def scan_pages(table_name=DYNAMODB_TABLE_CLIENT_NAME, fields: list[str] = None, segment: int = None, total_segments: int = None, page_size: int = None, start_key: dict = None) -> Iterator[dict]:
+    """
+    Scans a table (or one segment of it) page by page, following LastEvaluatedKey.
+
+    Args:
+        table_name (str): The DynamoDB table name.
+        fields (list[str], optional): Attributes to fetch (default is every attribute).
+        segment (int, optional): The segment to scan in a parallel scan.
+        total_segments (int, optional): The number of segments in a parallel scan.
+        page_size (int, optional): Max items evaluated per page.
+        start_key (dict, optional): The key to resume from.
+
+    Yields:
+        dict: Each raw scan response, with 'Items' and possibly 'LastEvaluatedKey'.
+    """
+
+    dynamodb_client = get_client('dynamodb')
+    params = {'TableName': table_name}
+    if fields:
+        params['ProjectionExpression'], params['ExpressionAttributeNames'] = build_projection(fields)
+    if total_segments and total_segments > 1:
+        params['Segment'] = segment
+        params['TotalSegments'] = total_segments
+    if page_size:
+        params['Limit'] = page_size
+
+    while True:
+        if start_key:
+            params['ExclusiveStartKey'] = start_key
+        page = dynamodb_client.scan(**params)
+        yield page
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            return
+
+
+_SEGMENT_DONE = object()
+
+
+def scan_items(table_name=DYNAMODB_TABLE_CLIENT_NAME, fields: list[str] = None, total_segments: int = DYNAMODB_SCAN_SEGMENTS, page_size: int = None) -> Iterator[dict]:
+    """
+    Yields every item of a table, scanning segments in parallel when `total_segments` > 1.
+
+    Pages are handed over through a bounded queue, so memory stays at a few pages
+    whatever the table size. Items from different segments come back interleaved.
 
-    return dynamodb_client.scan(TableName=table_name)
+    Args:
+        table_name (str): The DynamoDB table name.
+        fields (list[str], optional): Attributes to fetch (default is every attribute).
+        total_segments (int, optional): Number of parallel scan segments.
+        page_size (int, optional): Max items evaluated per page.
 
+    Yields:
+        dict: Each DynamoDB item.
+    """
 
-def update_item(item_id: str, update_expression: str, attribute_names: dict, attribute_values: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME) -> dict:
+    if total_segments <= 1:
+        for page in scan_pages(table_name, fields, page_size=page_size):
+            yield from page['Items']
+        return
+
+    pages = queue.Queue(maxsize=total_segments * 2)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                pages.put(entry, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def scan_segment(segment):
+        try:
+            for page in scan_pages(table_name, fields, segment, total_segments, page_size):
+                if stop.is_set():
+                    return
+                put(page['Items'])
+        except Exception as e:
+            put(e)
+        finally:
+            put(_SEGMENT_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=total_segments)
+    try:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+        remaining = total_segments
+        while remaining:
+            entry = pages.get()
+            if entry is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(entry, Exception):
+                raise entry
+            else:
+                yield from entry
+    finally:
+        # Workers notice the event within one put timeout and exit.
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def query_items(key_condition: str, attribute_names: dict, attribute_values: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME, index_name: str = None, limit: int = None, start_key: dict = None, scan_forward: bool = True, fields: list[str] = None) -> dict:
+    """
+    Runs one page of a DynamoDB query.
+
+    Args:
+        key_condition (str): The key condition expression.
+        attribute_names (dict): Placeholders of the attribute names used in the condition.
+        attribute_values (dict): Placeholders of the values used in the condition.
+        table_name (str): The DynamoDB table name.
+        index_name (str, optional): The secondary index to query.
+        limit (int, optional): Max items evaluated.
+        start_key (dict, optional): The key to resume from.
+        scan_forward (bool, optional): Ascending sort key order when True.
+        fields (list[str], optional): Attributes to fetch (default is every attribute).
+
+    Returns:
+        dict: The raw query response, with 'Items' and possibly 'LastEvaluatedKey'.
+    """
+
+    dynamodb_client = get_client('dynamodb')
+
+    return dynamodb_client.query(**_query_params(key_condition, attribute_names, attribute_values, table_name, index_name, limit, start_key, scan_forward, fields))
+
+
+def _query_params(key_condition: str, attribute_names: dict, attribute_values: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME, index_name: str = None, limit: int = None, start_key: dict = None, scan_forward: bool = True, fields: list[str] = None) -> dict:
+    # The request builders (_*_params) are shared with the asyncio clients of services/aio.py.
+    params = {
+        'TableName': table_name,
+        'KeyConditionExpression': key_condition,
+        'ExpressionAttributeNames': dict(attribute_names),
+        'ExpressionAttributeValues': attribute_values,
+        'ScanIndexForward': scan_forward,
+    }
+    if fields:
+        projection, projection_names = build_projection(fields)
+        params['ProjectionExpression'] = projection
+        params['ExpressionAttributeNames'].update(projection_names)
+    if index_name:
+        params['IndexName'] = index_name
+    if limit:
+        params['Limit'] = limit
+    if start_key:
+        params['ExclusiveStartKey'] = start_key
+    return params
+
+
+# BatchGetItem accepts at most 100 keys per call.
+BATCH_GET_LIMIT = 100
+
+
+def batch_get_items(item_ids: list[str], table_name=DYNAMODB_TABLE_CLIENT_NAME, fields: list[str] = None, key_name='ClientID', max_attempts: int = 8, consistent: bool = False) -> list[dict]:
+    """
+    Gets items by key with BatchGetItem, retrying unprocessed keys with jittered backoff.
+
+    Args:
+        item_ids (list[str]): The partition key values.
+        table_name (str): The DynamoDB table name.
+        fields (list[str], optional): Attributes to fetch (default is every attribute).
+        key_name (str, optional): The partition key attribute (default is 'ClientID').
+        max_attempts (int, optional): Attempts per chunk before giving up.
+        consistent (bool, optional): Use strongly consistent reads.
+
+    Returns:
+        list[dict]: The items found, in no particular order.
+
+    Raises:
+        RuntimeError: If some keys are still unprocessed after `max_attempts`, or once no retry fits before the deadline.
+    """
+
+    dynamodb_client = get_client('dynamodb')
+    items = []
+
+    for start in range(0, len(item_ids), BATCH_GET_LIMIT):
+        request = {'Keys': [{key_name: {'S': str(item_id)}} for item_id in item_ids[start:start + BATCH_GET_LIMIT]]}
+        if fields:
+            request['ProjectionExpression'], request['ExpressionAttributeNames'] = build_projection(fields)
+        if consistent:
+            request['ConsistentRead'] = True
+        requests = {table_name: request}
+        for attempt in range(max_attempts):
+            response = dynamodb_client.batch_get_item(RequestItems=requests)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            requests = response.get('UnprocessedKeys')
+            if not requests:
+                break
+            delay = random.uniform(0, min(5, 0.05 * 2 ** attempt))
+            if attempt == max_attempts - 1 or not retry_fits(delay):
+                raise RuntimeError(f"{len(requests[table_name]['Keys'])} keys were not read from {table_name}.")
+            time.sleep(delay)
+
+    return items
+
+
+# BatchWriteItem accepts at most 25 requests per call.
+BATCH_WRITE_LIMIT = 25
+
+
+def batch_write_items(items: list[dict], table_name=DYNAMODB_TABLE_CLIENT_NAME, max_attempts: int = 8) -> None:
+    """
+    Puts items with BatchWriteItem, retrying unprocessed items with jittered backoff.
+
+    Args:
+        items (list[dict]): The DynamoDB items to put.
+        table_name (str): The DynamoDB table name.
+        max_attempts (int, optional): Attempts per chunk before giving up.
+
+    Raises:
+        RuntimeError: If some items are still unprocessed after `max_attempts`, or once no retry fits before the deadline.
+    """
+
+    dynamodb_client = get_client('dynamodb')
+
+    for start in range(0, len(items), BATCH_WRITE_LIMIT):
+        requests = {table_name: [{'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_LIMIT]]}
+        for attempt in range(max_attempts):
+            requests = dynamodb_client.batch_write_item(RequestItems=requests).get('UnprocessedItems')
+            if not requests:
+                break
+            delay = random.uniform(0, min(5, 0.05 * 2 ** attempt))
+            if attempt == max_attempts - 1 or not retry_fits(delay):
+                raise RuntimeError(f"{len(requests[table_name])} items were not written to {table_name}.")
+            time.sleep(delay)
+
+
+def update_item(item_id: str, update_expression: str, attribute_names: dict, attribute_values: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME, condition_expression: str = None, return_values: str = None) -> dict:
     """
     Updates a client's attributes in DynamoDB.
 
@@ -136,24 +723,90 @@ def update_item(item_id: str, update_expression: str, attribute_names: dict, att
         update_expression (str): The update expression for modifying attributes.
         attribute_names (dict): A dictionary of attribute names and their placeholders.
         attribute_values (dict): A dictionary of attribute values and their placeholders.
+        condition_expression (str, optional): A condition the item must meet for the update to apply.
+        return_values (str, optional): Which attributes to return (e.g. 'ALL_NEW').
 
     Returns:
         dict: The response from DynamoDB after updating the item.
     """
 
-    dynamodb_client = init_dynamodb_client()
+    dynamodb_client = get_client('dynamodb')
 
-    return dynamodb_client.update_item(
-        TableName=table_name,
-        Key={
+    return dynamodb_client.update_item(**_update_item_params(item_id, update_expression, attribute_names, attribute_values, table_name, condition_expression, return_values))
+
+
+def _update_item_params(item_id: str, update_expression: str, attribute_names: dict, attribute_values: dict, table_name=DYNAMODB_TABLE_CLIENT_NAME, condition_expression: str = None, return_values: str = None) -> dict:
+    params = {
+        'TableName': table_name,
+        'Key': {
             'ClientID': {'S': str(item_id)}
         },
-        UpdateExpression=update_expression,
-        ExpressionAttributeNames=attribute_names,
-        ExpressionAttributeValues=attribute_values
+        'UpdateExpression': update_expression,
+        'ExpressionAttributeNames': attribute_names,
+        'ExpressionAttributeValues': attribute_values,
+    }
+    if condition_expression:
+        params['ConditionExpression'] = condition_expression
+    if return_values:
+        params['ReturnValues'] = return_values
+    return params
+
+
+# Reasons for which a cancelled transaction was not applied and can be retried as is.
+RETRYABLE_CANCELLATIONS = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
+THROTTLING_ERRORS = {'ProvisionedThroughputExceededException', 'RequestLimitExceeded', 'ThrottlingException'}
+
+
+def _is_retryable_transaction_error(error) -> bool:
+    # A transaction throttled, or cancelled only because another one was updating
+    # the same item or because an item was throttled, was not applied.
+    code = error.response['Error']['Code']
+    reasons = [reason.get('Code') for reason in error.response.get('CancellationReasons', [])]
+    return code in THROTTLING_ERRORS or (
+        code == 'TransactionCanceledException'
+        and any(reason in RETRYABLE_CANCELLATIONS for reason in reasons)
+        and all(reason == 'None' or reason in RETRYABLE_CANCELLATIONS for reason in reasons)
     )
 
 
+def write_items(transact_items: list[dict], max_attempts: int = 4) -> dict:
+    """
+    Applies write operations atomically.
+
+    A single operation is sent as a plain PutItem/UpdateItem/DeleteItem call, which
+    costs half the capacity of a one-item transaction. Transactions cancelled by a
+    conflict with another transaction (e.g. on a shared report counter) or by
+    throttling are retried with jittered backoff while a retry fits before the
+    deadline; the client does not retry them as well.
+
+    Args:
+        transact_items (list[dict]): TransactWriteItems entries ({'Put': {...}}, {'Update': {...}}, ...).
+        max_attempts (int, optional): Attempts of a conflicting or throttled transaction before giving up.
+
+    Returns:
+        dict: The response from DynamoDB.
+    """
+
+    from botocore.exceptions import ClientError
+
+    if len(transact_items) == 1:
+        [(operation, params)] = transact_items[0].items()
+        single_calls = {'Put': 'put_item', 'Update': 'update_item', 'Delete': 'delete_item'}
+        if operation in single_calls:
+            return getattr(get_client('dynamodb'), single_calls[operation])(**params)
+
+    # Retried here: botocore retries would multiply the attempts of this loop.
+    dynamodb_client = get_client('dynamodb', max_attempts=1)
+    for attempt in range(max_attempts):
+        try:
+            return dynamodb_client.transact_write_items(TransactItems=transact_items)
+        except ClientError as e:
+            delay = random.uniform(0, min(1, 0.02 * 2 ** attempt))
+            if attempt == max_attempts - 1 or not _is_retryable_transaction_error(e) or not retry_fits(delay):
+                raise
+        time.sleep(delay)
+
+
 def delete_item(item_id: str, table_name=DYNAMODB_TABLE_CLIENT_NAME) -> dict:
     """
     Deletes a item from the DynamoDB table.
@@ -164,7 +817,7 @@ def delete_item(item_id: str, table_name=DYNAMODB_TABLE_CLIENT_NAME) -> dict:
     Returns:
         dict: The response of the delete operation.
     """
-    dynamodb_client = init_dynamodb_client()
+    dynamodb_client = get_client('dynamodb')
 
     return dynamodb_client.delete_item(
         TableName=table_name,
@@ -0,0 +1,368 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from env_loader import BULK_CONCURRENCY, BULK_IMPORT_BUCKET, BULK_MAX_ROWS
+from exceptions import ClientNotFound
+from codec import ClientDetails
+from factories import _batched, _convert_currency
+from services.aws import _update_item_params, batch_get_items, retrieve_s3_object, write_items
+from services.business import _is_condition_failure, _migrate_numeric_fields, _new_client_put_request, _prepare_new_client, _recharge_update, _validate_recharge
+from services.client_cache import client_cache
+from services.history import Reload, build_reload, reload_put_request
+from services.notifications import CARD_RECHARGES, build_notification, deliver_notifications
+from services.reports import ReportDelta
+
+
+NEW_CLIENT_FIELDS = ('ClientID', 'FirstName', 'LastName', 'Country', 'Email', 'Phone', 'Limit', 'Rate', 'PaymentMethod')
+RECHARGE_FIELDS = ('ClientID', 'Limit', 'Rate', 'PaymentMethod')
+# TransactWriteItems accepts at most 100 operations: a limit update and its reloads.
+RELOADS_PER_TRANSACTION = 99
+
+
+def _load_rows(data) -> list[dict]:
+    """
+    Reads the rows of a bulk request, given inline or as an S3 object key.
+
+    S3 objects are JSON arrays, or CSV files with a header row when the key ends in '.csv'.
+
+    Args:
+        data (list | dict): The rows, or {'S3Key': ...} pointing into BULK_IMPORT_BUCKET.
+
+    Returns:
+        list[dict]: The rows.
+
+    Raises:
+        ValueError: If the payload is malformed or has more than BULK_MAX_ROWS rows.
+    """
+
+    if isinstance(data, dict) and 'S3Key' in data:
+        content = retrieve_s3_object(data['S3Key'], BULK_IMPORT_BUCKET).decode('utf-8-sig')
+        rows = list(csv.DictReader(io.StringIO(content))) if data['S3Key'].endswith('.csv') else json.loads(content)
+    else:
+        rows = data
+    if not isinstance(rows, list):
+        raise ValueError('Bulk data must be a list of rows or an S3Key.')
+    if len(rows) > BULK_MAX_ROWS:
+        raise ValueError(f'Bulk data is limited to {BULK_MAX_ROWS} rows.')
+    return rows
+
+
+def _result(index: int, client_id, status: str, message: str = None, **details) -> dict:
+    return {'row': index, 'ClientID': client_id, 'status': status, 'message': message, **details}
+
+
+def _bulk_response(results: list[dict]) -> dict:
+    failed = sum(result['status'] != 'OK' for result in results)
+    return {
+        'statusCode': 207 if failed else 200,
+        'body': json.dumps({'processed': len(results), 'failed': failed, 'results': results}),
+    }
+
+
+def _create_client(item: dict, recharge: Reload) -> tuple[str, str]:
+    """
+    Writes a new client and its initial reload in one transaction, unless the client exists.
+
+    Args:
+        item (dict): The client item.
+        recharge (Reload): The initial reload.
+
+    Returns:
+        tuple[str, str]: The row status ('OK', 'REJECTED' or 'FAILED') and the error message.
+    """
+
+    try:
+        write_items([_new_client_put_request(item), reload_put_request(recharge)])
+    except ClientError as e:
+        if _is_condition_failure(e):
+            return 'REJECTED', 'Client already exists.'
+        return 'FAILED', str(e)
+    except Exception as e:
+        return 'FAILED', str(e)
+    return 'OK', None
+
+
+def bulk_create_clients(data) -> dict:
+    """
+    Creates many clients in one request.
+
+    Currencies are converted through the cached rate provider (one rate fetch per
+    currency). Each client is written with its initial reload in a transaction
+    that fails if the client exists, so a client created meanwhile is never
+    overwritten; these writes run concurrently up to BULK_CONCURRENCY. Welcome
+    emails are delivered in batches.
+
+    Args:
+        data (list | dict): The client rows (as for CREATE_CLIENT, with an optional
+            'Currency', default "XAF"), or {'S3Key': ...}.
+
+    Returns:
+        dict: The HTTP response with one result per row.
+    """
+
+    try:
+        rows = _load_rows(data)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+
+    results = [None] * len(rows)
+    candidates = {}
+    for index, row in enumerate(rows):
+        client_id = str(row.get('ClientID', '')) or None
+        missing = [field for field in NEW_CLIENT_FIELDS if row.get(field) in (None, '')]
+        if missing:
+            results[index] = _result(index, client_id, 'REJECTED', f"Missing fields: {', '.join(missing)}")
+            continue
+        if client_id in candidates:
+            results[index] = _result(index, client_id, 'REJECTED', 'Duplicate ClientID in the batch.')
+            continue
+        try:
+            error = _validate_recharge(row['Rate'], row['Limit'])
+        except ValueError as e:
+            error = str(e)
+        if error:
+            results[index] = _result(index, client_id, 'REJECTED', error)
+            continue
+        candidates[client_id] = index
+
+    prepared = []
+    for client_id, index in candidates.items():
+        row = {**rows[index], 'ClientID': client_id}
+        try:
+            limit_EUR = round(_convert_currency(float(row['Limit']), row.get('Currency') or 'XAF'), 2)
+        except ValueError as e:
+            results[index] = _result(index, client_id, 'REJECTED', str(e))
+            continue
+        item, recharge, notification = _prepare_new_client(row, limit_EUR)
+        prepared.append((index, row, limit_EUR, item, recharge, notification))
+
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY) as executor:
+        outcomes = list(executor.map(_create_client, [entry[3] for entry in prepared], [entry[4] for entry in prepared]))
+
+    created, notifications = [], []
+    report = ReportDelta()
+    for (index, row, limit_EUR, item, recharge, notification), (status, error) in zip(prepared, outcomes):
+        if status != 'OK':
+            results[index] = _result(index, row['ClientID'], status, error)
+            continue
+        report.reloaded(recharge)
+        created.append((index, row['ClientID'], limit_EUR, row['Limit']))
+        notifications.append(notification)
+    _apply_report(report)
+
+    try:
+        failed_notifications = {failure['NotificationID']: failure['error'] for failure in deliver_notifications(notifications)}
+    except Exception as e:
+        print(f"Error: welcome notifications of the bulk creation were not delivered: {e}")
+        failed_notifications = {notification['NotificationID']: str(e) for notification in notifications}
+    for (index, client_id, limit_EUR, new_limit), notification in zip(created, notifications):
+        results[index] = _result(
+            index, client_id, 'OK', 'Client created successfully.',
+            conversion_amount=limit_EUR,
+            new_limit=new_limit,
+            notification_error=failed_notifications.get(notification['NotificationID'])
+        )
+
+    print(f"Success: {len(created)} of {len(rows)} clients created.")
+    return _bulk_response(results)
+
+
+def _apply_report(report: ReportDelta) -> None:
+    """
+    Adds the counts of a bulk action to the report; the bulk writes are already applied.
+
+    Args:
+        report (ReportDelta): The counts of the rows written.
+    """
+
+    try:
+        report.apply()
+    except Exception as e:
+        print(f"Error: report counters of the bulk action are incomplete: {e}")
+
+
+def _recharge_rows(client_id: str, recharges: list[dict]) -> str:
+    """
+    Adds recharge rows of one client to its limit and appends their reloads, in one transaction.
+
+    Args:
+        client_id (str): The unique client identifier.
+        recharges (list[dict]): At most RELOADS_PER_TRANSACTION rows, with their 'net_amount_eur' and 'reload'.
+
+    Returns:
+        str: The error message, or None if the rows were applied.
+    """
+
+    total = round(sum(recharge['net_amount_eur'] for recharge in recharges), 2)
+    update = _recharge_update(client_id, total, recharges[-1]['reload']['ReloadedAt'])
+    transact_items = [{'Update': _update_item_params(**update)}, *(reload_put_request(recharge['reload']) for recharge in recharges)]
+    try:
+        for attempt in range(2):
+            try:
+                write_items(transact_items)
+                return None
+            except ClientError as e:
+                # ADD fails on items still storing Limit as a string: convert them once.
+                reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+                if attempt or not (e.response['Error']['Code'] == 'ValidationException' or 'ValidationError' in reasons):
+                    raise
+                _migrate_numeric_fields(client_id)
+    except ClientNotFound:
+        return f'Client {client_id} not found.'
+    except ClientError as e:
+        if _is_condition_failure(e):
+            return f'Client {client_id} not found.'
+        return str(e)
+    except Exception as e:
+        return str(e)
+
+
+def _recharge_client(client_id: str, recharges: list[dict]) -> dict:
+    """
+    Applies the recharges of one client, RELOADS_PER_TRANSACTION rows per transaction.
+
+    Args:
+        client_id (str): The unique client identifier.
+        recharges (list[dict]): The client's rows, with their 'index', 'net_amount_eur' and 'reload'.
+
+    Returns:
+        dict: The error of each row not applied, by row index.
+    """
+
+    errors = {}
+    for chunk in _batched(recharges, RELOADS_PER_TRANSACTION):
+        error = _recharge_rows(client_id, chunk)
+        if error:
+            errors.update((recharge['index'], error) for recharge in chunk)
+    return errors
+
+
+def _read_recharged_clients(client_ids: list[str]) -> dict:
+    """
+    Reads back recharged clients for their notifications, and refreshes the client cache.
+
+    Args:
+        client_ids (list[str]): The recharged clients.
+
+    Returns:
+        dict: The clients as stored, by ClientID (empty if they could not be read).
+    """
+
+    try:
+        items = batch_get_items(client_ids, consistent=True)
+    except Exception as e:
+        print(f"Error: recharged clients could not be read back: {e}")
+        for client_id in client_ids:
+            client_cache.invalidate(client_id)
+        return {}
+    clients = {item['ClientID']['S']: ClientDetails.from_item(item) for item in items}
+    for client_id, client in clients.items():
+        client_cache.put(client_id, client)
+    return clients
+
+
+def bulk_card_recharge(data) -> dict:
+    """
+    Recharges many cards in one request, merging the rows of each client.
+
+    The rows of a client are applied in one transaction that adds them to its
+    limit and appends their reloads, so a row is applied entirely or not at all
+    (clients with more than RELOADS_PER_TRANSACTION rows use several). Clients
+    are recharged concurrently up to BULK_CONCURRENCY, then read back in batches
+    and sent one combined notification each.
+
+    Once a row is applied, later failures are reported on it and never raised:
+    a failed notification sets 'notification_error'.
+
+    Args:
+        data (list | dict): The recharge rows (as for CARD_RECHARGE), or {'S3Key': ...}.
+
+    Returns:
+        dict: The HTTP response with one result per row.
+    """
+
+    try:
+        rows = _load_rows(data)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+
+    results = [None] * len(rows)
+    per_client = {}
+    for index, row in enumerate(rows):
+        client_id = str(row.get('ClientID', '')) or None
+        missing = [field for field in RECHARGE_FIELDS if row.get(field) in (None, '')]
+        if missing:
+            results[index] = _result(index, client_id, 'REJECTED', f"Missing fields: {', '.join(missing)}")
+            continue
+        try:
+            amount_eur = round(_convert_currency(float(row['Limit']), row.get('Currency') or 'XAF'), 2)
+            error = _validate_recharge(row['Rate'], amount_eur)
+        except ValueError as e:
+            error = str(e)
+        if error:
+            results[index] = _result(index, client_id, 'REJECTED', error)
+            continue
+        reload = build_reload(client_id, amount_eur, row['PaymentMethod'])
+        # Rows stamped in the same microsecond must not overwrite each other in the history.
+        reload['ReloadedAt'] = f"{reload['ReloadedAt']}#{index:04d}"
+        per_client.setdefault(client_id, []).append({
+            'index': index,
+            'amount_eur': amount_eur,
+            'net_amount_eur': round(amount_eur - float(row['Rate']) * amount_eur, 2),
+            'reload': reload,
+        })
+
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY) as executor:
+        errors = dict(zip(per_client, executor.map(_recharge_client, per_client, per_client.values())))
+
+    # From here on the rows are applied: errors are reported on the rows, never raised.
+    clients = _read_recharged_clients([client_id for client_id, recharges in per_client.items() if len(errors[client_id]) < len(recharges)])
+    notifications, notified_rows = [], {}
+    report = ReportDelta()
+    for client_id, recharges in per_client.items():
+        applied = []
+        for recharge in recharges:
+            if recharge['index'] in errors[client_id]:
+                results[recharge['index']] = _result(recharge['index'], client_id, 'FAILED', errors[client_id][recharge['index']])
+            else:
+                applied.append(recharge)
+        if not applied:
+            continue
+        reloads = [recharge['reload'] for recharge in applied]
+        for reload in reloads:
+            report.reloaded(reload)
+        client = clients.get(client_id)
+        new_limit = float(round(client['Limit'], 2)) if client else None
+        for recharge in applied:
+            results[recharge['index']] = _result(
+                recharge['index'], client_id, 'OK', f'Client {client_id} recharge successful.',
+                conversion_amount=recharge['amount_eur'],
+                new_limit=new_limit
+            )
+        if client is None:
+            for recharge in applied:
+                results[recharge['index']]['notification_error'] = 'The client could not be read back.'
+            continue
+        notification = build_notification(CARD_RECHARGES, client_id, client['Email'], {
+            'FirstName': client['FirstName'],
+            'LastName': client['LastName'],
+            'Recharges': [{'Amount': reload['Amount'], 'PaymentMethod': reload['PaymentMethod'], 'Date': reload['Date']} for reload in reloads],
+            'Balance': float(round(client['Limit'] - client.get('Spend', 0), 2)),
+        })
+        notifications.append(notification)
+        notified_rows[notification['NotificationID']] = [recharge['index'] for recharge in applied]
+    _apply_report(report)
+
+    try:
+        failed_notifications = {failure['NotificationID']: failure['error'] for failure in deliver_notifications(notifications)}
+    except Exception as e:
+        failed_notifications = {notification['NotificationID']: str(e) for notification in notifications}
+    if failed_notifications:
+        print(f"Error: {len(failed_notifications)} bulk recharge notifications failed.")
+    for notification_id, error in failed_notifications.items():
+        for index in notified_rows[notification_id]:
+            results[index]['notification_error'] = error
+
+    return _bulk_response(results)
@@ -1,23 +1,39 @@
 import json
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
+from functools import cache
+from typing import Iterable, Iterator
+from botocore.exceptions import ClientError
 from env_loader import (
     ADMIN_EMAILS,
+    DYNAMODB_INDEX_DIGEST_NAME,
+    DYNAMODB_TABLE_CLIENT_NAME,
+    DYNAMODB_TABLE_HISTORY_NAME,
+    HISTORY_DIGEST_FIRST_DAYS,
+    HISTORY_DIGEST_SHARDS,
+    HISTORY_EMAIL_BATCH_SIZE,
+    HISTORY_PAGE_SIZE,
+    HISTORY_SES_TEMPLATE,
+    HISTORY_TIME_MARGIN_MS,
 )
+from codec import ClientDetails
 from exceptions import ClientNotFound
-from factories import (
-    ClientDetails,
-    _cast_client_details_to_item_dynamodb, 
-    _cast_item_dynamodb_to_client_details,
-    _convert_currency,
-    _generate_transactions_table,
-    _today
-)
-from services.aws import create_item, retrieve_all_items, retrieve_item, send_email, update_item
+from factories import _batched, _cast_client_details_to_item_dynamodb, _convert_currency
+from messages import message_template, render_fragments, resolve_locale
+from services import aio
+from services.aws import batch_get_items, batch_write_items, invoke_function_async, put_email_template, query_index, retrieve_item, scan_items, scan_pages, update_item
+from services.client_cache import client_cache
+from services.history import Reload, _cast_item_dynamodb_to_reload, _now_iso, build_reload, feed_shard, fetch_client_reloads, history_feed, iter_client_reloads, migrate_client_history, query_client_reloads, reload_put_request
+from services.lookups import _page_size
+from services.mailer import email_dispatcher
+from services.notifications import CARD_RECHARGE, CLIENT_CREATED, build_notification, write_and_notify
+from services.reports import ReportDelta, clear_report, legacy_reloads
+from templates import MessageTemplate
 
 
 def retrieve_a_client(client_id: str) -> ClientDetails:
     """
-    Retrieves a client from the DynamoDB database.
+    Retrieves a client, from the client cache or the DynamoDB database.
 
     Args:
         client_id (str): The unique identifier of the client.
@@ -26,6 +42,10 @@ def retrieve_a_client(client_id: str) -> ClientDetails:
          ClientDetails: The client details
     """
 
+    return client_cache.get(client_id, _load_client)
+
+
+def _load_client(client_id: str) -> ClientDetails:
     response = retrieve_item(client_id)
  
     # Return the items from the response
@@ -33,73 +53,177 @@ def retrieve_a_client(client_id: str) -> ClientDetails:
     if item is None:
         raise ClientNotFound(client_id)
 
-    client: ClientDetails = _cast_item_dynamodb_to_client_details(item)
+    client: ClientDetails = ClientDetails.from_item(item)
     return client
 
 
-def retrieve_all_clients() -> list[ClientDetails]:
+def retrieve_all_clients(fields: list[str] = None) -> Iterator[ClientDetails]:
     """
-    Retrieves all customers from the DynamoDB table.
+    Retrieves all customers from the DynamoDB table, page by page.
+
+    Args:
+        fields (list[str], optional): Attributes to fetch (default is every attribute).
 
     Returns:
-        list[ClientDetails]: A list of client details.
+        Iterator[ClientDetails]: The client details, decoded lazily.
     """
 
-    response = retrieve_all_items()
-
-    return list(map(lambda item: _cast_item_dynamodb_to_client_details(item), response['Items']))
+    return (ClientDetails.from_item(item, fields) for item in scan_items(fields=fields))
 
 
-def retrieve_a_reload(client_id: str) -> str: 
+def retrieve_a_reload(client_id: str, limit: int = None, cursor: str = None) -> dict: 
     """
-    Sends transaction history to customers via email.
+    Retrieves the reload history of a client, newest first.
 
-    Retrieves completed transactions for each customer, generates a transaction table,
-    and sends an email containing the transaction history.
+    Reloads are read from the history table, followed by those still stored on the
+    client item by the previous layout.
 
     Args:
-        None
+        client_id (str): The unique identifier of the client.
+        limit (int, optional): Page size (at most 1000); the whole history is returned when None.
+        cursor (str, optional): The cursor returned with the previous page.
 
     Returns:
-        str: Success message
+        dict: The HTTP response. When paginated, the body holds 'items' and 'cursor'.
     """
 
+    try:
+        limit = None if limit is None else _page_size(limit)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+
     client = retrieve_a_client(client_id)
-    for objet in client['ReloadingHistory']:
-        objet["Name"] = f"{client['FirstName']} {client['LastName']}"
+    name = f"{client['FirstName']} {client['LastName']}"
+    if limit is None:
+        reloads = [{**objet, 'Name': name} for objet in iter_client_reloads(client_id, client['ReloadingHistory'])]
+        return {
+            'statusCode': 200,
+            'body': json.dumps(reloads),
+        }
+
+    try:
+        reloads, next_cursor = query_client_reloads(client_id, client['ReloadingHistory'], limit, cursor)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
     return {
         'statusCode': 200,
-        'body': json.dumps(sorted(client['ReloadingHistory'], key=lambda x: datetime.strptime(x['Date'], '%d/%m/%Y'), reverse=True)),
+        'body': json.dumps({'items': [{**objet, 'Name': name} for objet in reloads], 'cursor': next_cursor}),
     }
 
 
-def retrieve_all_reload() -> str: 
+def retrieve_all_reload(since: str = None, until: str = None, limit: int = None, cursor: str = None) -> dict: 
     """
-    Sends transaction history to customers via email.
+    Retrieves the reload history of every client, newest first.
 
-    Retrieves completed transactions for each customer, generates a transaction table,
-    and sends an email containing the transaction history.
+    Reloads are read from the feed index of the history table (see `history_feed`);
+    the names are then fetched for the clients of the page only.
 
     Args:
-        None
+        since (str, optional): First day ('YYYY-MM-DD') or instant (ISO-8601) included.
+        until (str, optional): Last day ('YYYY-MM-DD') or instant (ISO-8601) included.
+        limit (int, optional): Page size (at most 1000); the whole history is returned when None.
+        cursor (str, optional): The cursor returned with the previous page.
 
     Returns:
-        str: Success message
+        dict: The HTTP response. When paginated, the body holds 'items' and 'cursor'.
     """
 
-    clients = retrieve_all_clients()
-    reload_histories = []
-    for client in clients:
-        for objet in client['ReloadingHistory']:
-            objet["Name"] = f"{client['FirstName']} {client['LastName']}"
-        reload_histories = [*reload_histories, *client['ReloadingHistory']]
+    try:
+        limit = None if limit is None else _page_size(limit)
+        reloads, next_cursor = history_feed(since, until, limit, cursor)
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'message': str(e)})}
+
+    client_ids = list({reload['clientID'] for reload in reloads})
+    names = {
+        item['ClientID']['S']: f"{item['FirstName']['S']} {item['LastName']['S']}"
+        for item in (batch_get_items(client_ids, fields=['ClientID', 'FirstName', 'LastName']) if client_ids else [])
+    }
+    for objet in reloads:
+        objet["Name"] = names.get(objet['clientID'])
 
     return {
         'statusCode': 200,
-        'body': json.dumps(sorted(reload_histories, key=lambda x: datetime.strptime(x['Date'], '%d/%m/%Y'), reverse=True)),
+        'body': json.dumps(reloads if limit is None else {'items': reloads, 'cursor': next_cursor}),
     }
 
 
+def _validate_recharge(rate, amount) -> str:
+    """
+    Checks the commission rate and the amount of a recharge.
+
+    Args:
+        rate: The EAZYCard commission rate, between 0 and 1.
+        amount: The recharge amount.
+
+    Returns:
+        str: The error message, or None if both are valid.
+    """
+
+    taux_eazycard = float(rate)
+    if taux_eazycard < 0 or taux_eazycard > 1:
+        return 'The rate is incorrect it must be between 0 and 1.'
+    if float(amount) < 0:
+        return 'Refill amount cannot be negative'
+    return None
+
+
+def _digest_shard() -> str:
+    # Spreads the clients awaiting a digest over the partitions of the sparse digest index.
+    return str(random.randrange(HISTORY_DIGEST_SHARDS))
+
+
+def _prepare_new_client(client: ClientDetails, limit_EUR: float) -> tuple[dict, dict, dict]:
+    """
+    Builds the writes and the welcome notification of a new client.
+
+    Args:
+        client (ClientDetails): The client details from the request, with 'Rate' and 'PaymentMethod'.
+        limit_EUR (float): The initial recharge converted to EUR, before commission.
+
+    Returns:
+        tuple[dict, Reload, Notification]: The client item, the initial reload and the notification.
+    """
+
+    taux_eazycard = float(client['Rate'])
+    client['Limit'] = round(limit_EUR - taux_eazycard * limit_EUR, 2)
+    client['Spend'] = 0
+    client['CardLimitReached'] = 0
+    recharge = build_reload(client['ClientID'], client['Limit'], client['PaymentMethod'])
+    client['LastReloadedAt'] = recharge['ReloadedAt']
+    client['DigestShard'] = _digest_shard()
+
+    item = _cast_client_details_to_item_dynamodb(client)
+    notification = build_notification(CLIENT_CREATED, client['ClientID'], client['Email'], {
+        'FirstName': client['FirstName'],
+        'LastName': client['LastName'],
+        'ClientID': client['ClientID'],
+        'Date': recharge['Date'],
+        'InitialAmount': limit_EUR,
+        'Balance': client['Limit'],
+    })
+    return item, recharge, notification
+
+
+def _new_client_put_request(item: dict) -> dict:
+    """
+    Builds the write of a new client, which fails if the client already exists.
+
+    Args:
+        item (dict): The client item.
+
+    Returns:
+        dict: A TransactWriteItems 'Put' entry.
+    """
+
+    return {'Put': {
+        'TableName': DYNAMODB_TABLE_CLIENT_NAME,
+        'Item': item,
+        'ConditionExpression': 'attribute_not_exists(#client_id)',
+        'ExpressionAttributeNames': {'#client_id': 'ClientID'},
+    }}
+
+
 def create_client(client: ClientDetails) -> str:
     """
     Creates a client record in DynamoDB.
@@ -122,74 +246,171 @@ def create_client(client: ClientDetails) -> str:
     """
 
 
-    try:
-        client = retrieve_a_client(client['ClientID'])
+    error = _validate_recharge(client['Rate'], client['Limit'])
+    if error:
         return {
             'statusCode': 400,
-            'body': json.dumps({'message': 'Client already exists.'})
+            'body': json.dumps({'message': error})
         }
-    
-    except ClientNotFound:
-        taux_eazycard = float(client['Rate'])
-        if taux_eazycard < 0 or taux_eazycard > 1:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'message': 'The rate is incorrect it must be between 0 and 1.'})
-            }
-        if client['Limit'] < 0: 
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'message': 'Refill amount cannot be negative'})
-            }
-        limit_EUR = round(_convert_currency(float(client['Limit'])), 2)
-        client['Limit'] = round(limit_EUR - taux_eazycard * limit_EUR, 2)
-        client['Spend'] = 0
-        client['CardLimitReached'] = 0
-        client['ReloadingHistory'] = [{
-            "Amount": client['Limit'],
-            "PaymentMethod": client['PaymentMethod'],
-            "Date": _today(),
-            "clientID": client['ClientID'],
-        }]
-        
-
-        item = _cast_client_details_to_item_dynamodb(client)
-        
-        create_item(item)
-
-        message = f"""Bonjour {client['FirstName']} {client['LastName']}
-Nous avons le plaisir de vous informer que votre compte EAZYCard a été créé avec succès.
-Détails du compte :
-    - ID du compte : {client['ClientID']}
-    - Date de création : {_today()}
-    - Recharge initiale : {limit_EUR}
-    - Solde actuel : {client['Limit']} EUR
-
-Pour toute communication future, veuillez s'il vous plaît préciser l'ID de votre compte : {client['ClientID']}
-
-Nous restons à votre disposition pour toute question ou assistance complémentaire.
-Cordialement,
-L'équipe EAZYCard
-"""
-
-        # send_email(ADMIN_EMAILS, message, 'CONFIRMATION DE CRÉATION DE VOTRE COMPTE EAZYCARD')
-        send_email([client['Email']], ADMIN_EMAILS, message, 'CONFIRMATION DE CRÉATION DE VOTRE COMPTE EAZYCARD')
-
-        print("Success: Client created successfully.")
+    limit_EUR = round(_convert_currency(float(client['Limit'])), 2)
+    item, recharge, notification = _prepare_new_client(client, limit_EUR)
+    report = ReportDelta().reloaded(recharge)
+
+    # The existence check is part of the write: no read is needed beforehand.
+    try:
+        write_and_notify([
+            _new_client_put_request(item),
+            reload_put_request(recharge),
+            *report.update_requests(),
+        ], notification)
+    except ClientError as e:
+        if not _is_condition_failure(e):
+            raise
         return {
-            'statusCode': 201,
-            'body': json.dumps({
-                'message': 'Client created successfully.',
-                'conversion_amount': limit_EUR,
-                'new_limit': client['Limit']
-            })
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Client already exists.'})
         }
+    client_cache.put(client['ClientID'], ClientDetails.from_item(item))
+
+    print("Success: Client created successfully.")
+    return {
+        'statusCode': 201,
+        'body': json.dumps({
+            'message': 'Client created successfully.',
+            'conversion_amount': limit_EUR,
+            'new_limit': client['Limit']
+        })
+    }
+
+
+def _is_condition_failure(error: ClientError) -> bool:
+    """
+    Tells whether a write failed on its condition, as a plain call or inside a transaction.
+
+    Args:
+        error (ClientError): The error raised by the write.
+
+    Returns:
+        bool: True if a condition check failed.
+    """
+
+    code = error.response['Error']['Code']
+    if code == 'ConditionalCheckFailedException':
+        return True
+    reasons = error.response.get('CancellationReasons', [])
+    return code == 'TransactionCanceledException' and any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons)
+
+
+def _migrate_numeric_fields(client_id: str) -> None:
+    """
+    Rewrites the legacy string-typed Limit, Spend and CardLimitReached of a client as numbers.
+
+    The rewrite only applies if the values have not changed since they were read.
+
+    Args:
+        client_id (str): The unique client identifier.
+    """
+
+    item = retrieve_item(client_id).get('Item')
+    if item is None:
+        raise ClientNotFound(client_id)
+    fields = [field for field in ('Limit', 'Spend', 'CardLimitReached') if 'S' in item.get(field, {})]
+    if not fields:
+        return
+    attribute_names = {f'#f{index}': field for index, field in enumerate(fields)}
+    attribute_values = {}
+    for index, field in enumerate(fields):
+        attribute_values[f':n{index}'] = {'N': item[field]['S']}
+        attribute_values[f':s{index}'] = item[field]
+    try:
+        update_item(
+            client_id,
+            'SET ' + ', '.join(f'#f{index} = :n{index}' for index in range(len(fields))),
+            attribute_names,
+            attribute_values,
+            condition_expression=' AND '.join(f'#f{index} = :s{index}' for index in range(len(fields)))
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def _recharge_update(client_id: str, amount_eur: float, reloaded_at: str) -> dict:
+    """
+    Builds the update adding an amount to a client's limit, which also resets
+    CardLimitReached, stamps LastReloadedAt and lists the client for the next
+    history digest. The update only applies to an existing client.
+
+    Args:
+        client_id (str): The unique client identifier.
+        amount_eur (float): The amount to add, in EUR.
+        reloaded_at (str): The ReloadedAt of the reload, stored as LastReloadedAt.
+
+    Returns:
+        dict: The `update_item` arguments.
+    """
+
+    return {
+        'item_id': client_id,
+        'update_expression': 'ADD #limit :amount SET #card_limit_reached = :zero, #last_reloaded_at = :reloaded_at, #digest_shard = if_not_exists(#digest_shard, :digest_shard)',
+        'attribute_names': {
+            '#limit': 'Limit',
+            '#card_limit_reached': 'CardLimitReached',
+            '#last_reloaded_at': 'LastReloadedAt',
+            '#digest_shard': 'DigestShard',
+            '#client_id': 'ClientID',
+        },
+        'attribute_values': {':amount': {'N': str(amount_eur)}, ':zero': {'N': '0'}, ':reloaded_at': {'S': reloaded_at}, ':digest_shard': {'S': _digest_shard()}},
+        'condition_expression': 'attribute_exists(#client_id)',
+    }
+
+
+def _apply_recharge(client_id: str, amount_eur: float, reloaded_at: str) -> ClientDetails:
+    """
+    Adds an amount to a client's limit in one atomic update (see `_recharge_update`).
+
+    Concurrent recharges of the same client all apply, since the addition happens
+    in DynamoDB. The update returns the client as stored after it, which refreshes
+    the client cache.
+
+    Args:
+        client_id (str): The unique client identifier.
+        amount_eur (float): The amount to add, in EUR.
+        reloaded_at (str): The ReloadedAt of the reload, stored as LastReloadedAt.
+
+    Returns:
+        ClientDetails: The client as stored after the update.
+
+    Raises:
+        ClientNotFound: If the client does not exist.
+    """
+
+    for attempt in range(2):
+        try:
+            response = update_item(**_recharge_update(client_id, amount_eur, reloaded_at), return_values='ALL_NEW')
+            client = ClientDetails.from_item(response['Attributes'])
+            client_cache.put(client_id, client)
+            return client
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code == 'ConditionalCheckFailedException':
+                client_cache.invalidate(client_id)
+                raise ClientNotFound(client_id)
+            # ADD fails on items still storing Limit as a string: convert them once.
+            if code != 'ValidationException' or attempt:
+                raise
+            _migrate_numeric_fields(client_id)
 
 
 def card_recharge(client_id: str, amount: float, rate: float, currency: str, payment_method: str) -> str:
     """
     Recharges a client's card by updating the spending limit.
 
+    The limit is raised by a single conditional update, so concurrent recharges
+    all apply. The reload and its report counters (and in 'outbox' mode the
+    notification) are then written together; since the recharge is applied by
+    then, a failure to record them is logged instead of raised.
+
     Args:
         client_id (str): The unique client identifier.
         amount (float): The recharge amount in the client's currency.
@@ -197,119 +418,534 @@ def card_recharge(client_id: str, amount: float, rate: float, currency: str, pay
     Returns:
         str: A message indicating successful card recharge.
     """
-    try:
-        client = retrieve_a_client(client_id)
-    except ClientNotFound as e:
-        message = f'{str(e)}'
-        return {
-            'statusCode': 404,
-            'body': json.dumps({'message': f'Client {client_id} not found.'})
-        }
-    
+
     amount_eur = round(_convert_currency(amount, currency), 2)
-    taux_eazycard = float(rate)
-    if taux_eazycard < 0 or taux_eazycard > 1:
+    error = _validate_recharge(rate, amount_eur)
+    if error:
         return {
             'statusCode': 400,
-            'body': json.dumps({'message': 'The rate is incorrect it must be between 0 and 1.'})
+            'body': json.dumps({'message': error})
         }
-    if amount_eur < 0: 
+    taux_eazycard = float(rate)
+    new_amount_eur = round(amount_eur - taux_eazycard * amount_eur, 2)
+
+    recharge = build_reload(client_id, amount_eur, payment_method)
+    try:
+        client = _apply_recharge(client_id, new_amount_eur, recharge['ReloadedAt'])
+    except ClientNotFound:
         return {
-            'statusCode': 400,
-            'body': json.dumps({'message': 'Refill amount cannot be negative'})
+            'statusCode': 404,
+            'body': json.dumps({'message': f'Client {client_id} not found.'})
         }
-    new_amount_eur = amount_eur - taux_eazycard * amount_eur
-    new_limit = round(float(client['Limit']) + new_amount_eur, 2)
-    balance = round(new_limit - float(client['Spend']), 2)
-    recharge = {
-        "Amount": amount_eur,
-        "PaymentMethod": payment_method,
-        "Date": _today(),
-        "clientID": client['ClientID']
-    }
-    update_expression = 'SET #field1 = :field1, #field2 = :field2, #field3 = :field3'
-    attribute_names = {
-        '#field1': 'Limit',
-        '#field2': 'CardLimitReached',
-        '#field3': 'ReloadingHistory'
+
+    new_limit = float(round(client['Limit'], 2))
+    notification = build_notification(CARD_RECHARGE, client_id, client['Email'], {
+        'FirstName': client['FirstName'],
+        'LastName': client['LastName'],
+        'PaymentMethod': payment_method,
+        'Amount': amount_eur,
+        'Date': recharge['Date'],
+        'Balance': float(round(client['Limit'] - client.get('Spend', 0), 2)),
+    })
+    try:
+        write_and_notify([reload_put_request(recharge, unique=True), *ReportDelta().reloaded(recharge).update_requests()], notification)
+    except Exception as e:
+        print(f"Error: recharge of client {client_id} applied but its reload was not recorded: {e}. Reload: {json.dumps(recharge)}")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': f'Client {client_id} recharge successful.',
+            'conversion_amount': amount_eur,
+            'new_limit': new_limit
+        })
     }
-    attribute_values = {
-        ':field1': {'S': str(new_limit)},
-        ':field2': {'S': str(0)},
-        ':field3': {'S': json.dumps([recharge, *client['ReloadingHistory']])},
+
+
+HISTORY_FIELDS = ['ClientID', 'FirstName', 'LastName', 'Email', 'Limit', 'Spend', 'DigestedAt']
+# Values shared by every digest, pre-rendered into the templates once per container.
+HISTORY_SHARED = {'Currency': 'EUR'}
+
+
+@cache
+def _history_templates() -> tuple[MessageTemplate, MessageTemplate]:
+    """
+    Returns the compiled digest and row templates.
+
+    Returns:
+        tuple[MessageTemplate, MessageTemplate]: The digest and the row template.
+    """
+
+    return tuple(message_template(name).partial(**HISTORY_SHARED) for name in ('HISTORY_DIGEST', 'HISTORY_DIGEST_ROW'))
+
+
+@cache
+def _history_ses_template() -> str:
+    """
+    Stores the digest as an SES template, once per container.
+
+    Returns:
+        str: The SES template name.
+    """
+
+    name = f'{HISTORY_SES_TEMPLATE}-{resolve_locale()}'
+    put_email_template(_history_templates()[0].to_ses(name))
+    return name
+
+
+def _digested_at(client: ClientDetails, cutoff: str) -> str:
+    # The watermark of the client's last digest; a first digest covers HISTORY_DIGEST_FIRST_DAYS.
+    return client.get('DigestedAt') or (datetime.fromisoformat(cutoff) - timedelta(days=HISTORY_DIGEST_FIRST_DAYS)).isoformat(timespec='microseconds')
+
+
+def _history_message(client: ClientDetails, cutoff: str) -> tuple[str, dict]:
+    """
+    Builds the per-client values of the weekly history email: the reloads made
+    since the client's last digest, and the current balance.
+
+    Only the rows are rendered here; the rest of the message comes from the
+    compiled digest template (or from the SES stored template).
+
+    Args:
+        client (ClientDetails): The client details.
+        cutoff (str): The ReloadedAt up to which the run digests reloads.
+
+    Returns:
+        tuple[str, dict]: The recipient address and the template data, or None when
+            there is no new reload.
+    """
+
+    digested_at = _digested_at(client, cutoff)
+    # Reloads still in a legacy ReloadingHistory blob predate any watermark: only the table is read.
+    return _history_data(client, digested_at, iter_client_reloads(client['ClientID'], since=digested_at, until=cutoff))
+
+
+async def _history_message_async(client: ClientDetails, cutoff: str) -> tuple[str, dict]:
+    # _history_message on the asyncio path.
+    digested_at = _digested_at(client, cutoff)
+    return _history_data(client, digested_at, await fetch_client_reloads(client['ClientID'], digested_at, cutoff))
+
+
+def _history_data(client: ClientDetails, digested_at: str, reloads: Iterable[Reload]) -> tuple[str, dict]:
+    _, row = _history_templates()
+    transactions = [reload for reload in reloads if reload['ReloadedAt'] > digested_at]
+    if not transactions:
+        return None
+    rows, html_rows = render_fragments(row, transactions)
+    return client['Email'], {
+        'FirstName': client['FirstName'],
+        'LastName': client['LastName'],
+        'Balance': str(round(client['Limit'] - client['Spend'], 2)),
+        'Rows': rows,
+        'HtmlRows': html_rows,
     }
 
-    update_item(client_id, update_expression, attribute_names, attribute_values)
 
-    if payment_method == 'Remboursement':
-        message = f"""Bonjour {client['FirstName']} {client['LastName']},
-Nous avons le plaisir de vous informer que votre remboursement EAZYCard a été réalisée avec succès.
-Détails de la transaction :
-    - Montant du remboursement : {amount_eur} EUR
-    - Date du remboursement : {_today()}
-    - Nouveau solde : {balance} EUR
+def _send_history_batch(batch: list[tuple[str, dict]]) -> list[bool]:
+    """
+    Sends a batch of history emails.
 
-Nous vous remercions pour votre confiance. 
+    With HISTORY_SES_TEMPLATE, SES renders the stored template: each call carries
+    only the per-client data of up to 50 recipients. Otherwise the messages are
+    rendered here and sent one by one.
 
-Nous restons à votre disposition pour toute question ou assistance complémentaire.
-Cordialement,
-L'équipe EAZYCard
-"""
-        # send_email(ADMIN_EMAILS, message, 'VOTRE REMBOURSEMENT EAZYCard A REUSSI')
-        send_email([client['Email']], ADMIN_EMAILS, message, 'VOTRE REMBOURSEMENT EAZYCard A REUSSI')
+    Args:
+        batch (list[tuple[str, dict]]): Recipient and template data pairs.
 
+    Returns:
+        list[bool]: Whether each email was sent, in the order of the batch.
+    """
+
+    if HISTORY_SES_TEMPLATE:
+        outcomes = email_dispatcher.send_bulk_templated(
+            _history_ses_template(),
+            [([email], data) for email, data in batch],
+            bcc_addresses=ADMIN_EMAILS
+        )
     else:
-        message = f"""Bonjour {client['FirstName']} {client['LastName']},
-Nous avons le plaisir de vous informer que votre recharge EAZYCard a été réalisée avec succès.
-Détails de la transaction :
-    - Montant de la recharge : {amount_eur} EUR
-    - Date de la recharge : {_today()} 
-    - Nouveau solde : {balance} EUR
+        digest = _history_templates()[0]
+        outcomes = email_dispatcher.send_many([{
+            'to_addresses': [email],
+            'bcc_addresses': ADMIN_EMAILS,
+            'body_message': message.text,
+            'subject_message': message.subject,
+            'html_message': message.html,
+        } for email, message in ((email, digest.render(data)) for email, data in batch)])
+    for outcome in outcomes:
+        if outcome['status'] != 'SENT':
+            print(f"Error: history email to {outcome['to_addresses']} failed: {outcome['error']}")
+    return [outcome['status'] == 'SENT' for outcome in outcomes]
+
+
+def _mark_digested(client_id: str, cutoff: str) -> None:
+    """
+    Moves a client's digest watermark to the cutoff and removes it from the digest index.
+
+    A client reloaded after the cutoff keeps its DigestShard, so the next run
+    sends the reloads this one did not include.
+
+    Args:
+        client_id (str): The unique client identifier.
+        cutoff (str): The ReloadedAt up to which the run digested reloads.
+    """
 
-Nous vous remercions de votre confiance. 
+    for update in _digested_updates(client_id, cutoff):
+        try:
+            update_item(**update)
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+async def _mark_digested_async(client_id: str, cutoff: str) -> None:
+    # _mark_digested on the asyncio path.
+    for update in _digested_updates(client_id, cutoff):
+        try:
+            await aio.update_item(**update)
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+
+def _digested_updates(client_id: str, cutoff: str) -> list[dict]:
+    # The updates tried in turn: the first one also leaves the digest index, unless
+    # the client reloaded after the cutoff. Deleted clients fail both conditions.
+    attribute_names = {'#digested_at': 'DigestedAt', '#client_id': 'ClientID'}
+    attribute_values = {':cutoff': {'S': cutoff}}
+    return [
+        {
+            'item_id': client_id,
+            'update_expression': 'SET #digested_at = :cutoff REMOVE #digest_shard',
+            'attribute_names': {**attribute_names, '#digest_shard': 'DigestShard', '#last_reloaded_at': 'LastReloadedAt'},
+            'attribute_values': attribute_values,
+            'condition_expression': 'attribute_exists(#client_id) AND (attribute_not_exists(#last_reloaded_at) OR #last_reloaded_at <= :cutoff)',
+        },
+        {
+            'item_id': client_id,
+            'update_expression': 'SET #digested_at = :cutoff',
+            'attribute_names': attribute_names,
+            'attribute_values': attribute_values,
+            'condition_expression': 'attribute_exists(#client_id)',
+        },
+    ]
+
+
+def _should_checkpoint(context) -> bool:
+    return context is not None and context.get_remaining_time_in_millis() < HISTORY_TIME_MARGIN_MS
+
+
+def _checkpoint(action: str, start_key: dict, context, progress: dict) -> dict:
+    """
+    Hands a table-wide job over to a new invocation, resuming after `start_key`.
 
-Nous restons à votre disposition pour toute question ou assistance complémentaire.
-Cordialement,
-L'équipe EAZYCard
-"""
+    Args:
+        action (str): The job action, replayed in the new invocation.
+        start_key (dict): The position after the last processed page (e.g. its LastEvaluatedKey).
+        context (LambdaContext): The Lambda context.
+        progress (dict): Counters reported in the response.
 
-        # send_email(ADMIN_EMAILS, message, 'VOTRE RECHARGE EAZYCard A REUSSI')
-        send_email([client['Email']], ADMIN_EMAILS, message, 'VOTRE RECHARGE EAZYCard A REUSSI')
+    Returns:
+        dict: The HTTP response carrying the checkpoint.
+    """
 
+    invoke_function_async(context.invoked_function_arn, {
+        'action': action,
+        'ExclusiveStartKey': start_key,
+    })
+    print(f"Info: {action} checkpointed at {start_key} with {progress}")
     return {
-        'statusCode': 200,
+        'statusCode': 202,
         'body': json.dumps({
-            'message': f'Client {client_id} recharge successful.',
-            'conversion_amount': amount_eur,
-            'new_limit': new_limit
-        })
+            'message': f'{action} checkpointed, resuming in a new invocation.',
+            **progress,
+            'ExclusiveStartKey': start_key,
+        }),
     }
 
 
-def send_transaction_history_to_customers() -> str: 
+def send_transaction_history_to_customers(start_key: dict = None, context=None) -> dict: 
     """
     Sends transaction history to customers via email.
 
-    Retrieves completed transactions for each customer, generates a transaction table,
-    and sends an email containing the transaction history.
+    Only clients with reloads since their last digest are read: every reload sets
+    the client's DigestShard, which lists it in the sparse digest index, and a
+    sent digest moves the client's DigestedAt watermark and removes it from the
+    index. Each email holds the reloads after the watermark and the current
+    balance. Clients whose email failed stay listed for the next run. When the
+    invocation runs low on time, the job re-invokes the function with its
+    position (shard, LastEvaluatedKey and cutoff).
+
+    With AIO_ENABLED, the history queries and watermark updates of a page run
+    concurrently on the asyncio path instead of one after the other.
 
     Args:
-        None
+        start_key (dict, optional): The position to resume from ('Shard', 'Key', 'Cutoff').
+        context (LambdaContext, optional): The Lambda context, used to watch the remaining time.
 
     Returns:
-        str: Success message
+        dict: The HTTP response, with the checkpoint when the job was handed over.
     """
 
-    clients = retrieve_all_clients()
-    for client in clients:
-        transactions = client['ReloadingHistory']
-        table_title = 'Voici votre historique des recharges\n'
-        balance = round(float(client['Limit']) - float(client['Spend']), 2)
-        message = f"{client['FirstName']} {client['LastName']}\nVotre solde actuel est {balance} EUR\n{_generate_transactions_table(transactions, table_title)}"
-        send_email([client['Email']], ADMIN_EMAILS, message, 'VOTRE HISTORIQUE DE TRANSACTION EAZYCard ENVOYE CHAQUE SEMAINE')
+    position = start_key or {}
+    cutoff = position.get('Cutoff') or _now_iso()
+    sent = 0
+    use_aio = aio.enabled()
+    for shard in range(position.get('Shard', 0), HISTORY_DIGEST_SHARDS):
+        key = position.get('Key') if shard == position.get('Shard') else None
+        while True:
+            page = query_index(DYNAMODB_INDEX_DIGEST_NAME, 'DigestShard', str(shard), limit=HISTORY_PAGE_SIZE, start_key=key)
+            clients = [ClientDetails.from_item(item, HISTORY_FIELDS) for item in page['Items']]
+            if use_aio:
+                messages = aio.run(aio.gather(*(_history_message_async(client, cutoff) for client in clients)))
+            else:
+                messages = [_history_message(client, cutoff) for client in clients]
+            digests = list(zip(clients, messages))
+            # Clients without reloads up to the cutoff leave the index without an email.
+            digested = [client for client, message in digests if message is None]
+            pending = [(client, message) for client, message in digests if message is not None]
+            for batch in _batched(pending, HISTORY_EMAIL_BATCH_SIZE):
+                for (client, _), delivered in zip(batch, _send_history_batch([message for _, message in batch])):
+                    if delivered:
+                        digested.append(client)
+                        sent += 1
+            if use_aio:
+                aio.run(aio.gather(*(_mark_digested_async(client['ClientID'], cutoff) for client in digested)))
+            else:
+                for client in digested:
+                    _mark_digested(client['ClientID'], cutoff)
+
+            key = page.get('LastEvaluatedKey')
+            if not key:
+                break
+            if _should_checkpoint(context):
+                return _checkpoint('HISTORY_TRANSACTION', {'Shard': shard, 'Key': key, 'Cutoff': cutoff}, context, {'sent': sent})
+
+        if shard + 1 < HISTORY_DIGEST_SHARDS and _should_checkpoint(context):
+            return _checkpoint('HISTORY_TRANSACTION', {'Shard': shard + 1, 'Cutoff': cutoff}, context, {'sent': sent})
 
     return {
         'statusCode': 200,
         'body': json.dumps('Email history transaction sent successfully'),
     }
 
+
+def migrate_reload_histories(start_key: dict = None, context=None) -> dict:
+    """
+    Moves the ReloadingHistory blob of every client item into the history table.
+
+    Runs page by page and checkpoints like the weekly digest. Clients written
+    concurrently are skipped and picked up by the next run.
+
+    Args:
+        start_key (dict, optional): The LastEvaluatedKey to resume from.
+        context (LambdaContext, optional): The Lambda context, used to watch the remaining time.
+
+    Returns:
+        dict: The HTTP response with the migration counters.
+    """
+
+    migrated = 0
+    reloads = 0
+    for page in scan_pages(fields=['ClientID', 'ReloadingHistory'], page_size=HISTORY_PAGE_SIZE, start_key=start_key):
+        for item in page['Items']:
+            if 'ReloadingHistory' not in item:
+                continue
+            try:
+                reloads += migrate_client_history(item['ClientID']['S'], item['ReloadingHistory']['S'])
+                migrated += 1
+                client_cache.invalidate(item['ClientID']['S'])
+            except ClientError as e:
+                print(f"Error: migration of client {item['ClientID']['S']} skipped: {e}")
+
+        start_key = page.get('LastEvaluatedKey')
+        if start_key and _should_checkpoint(context):
+            return _checkpoint('MIGRATE_RELOAD_HISTORY', start_key, context, {'migrated': migrated, 'reloads': reloads})
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Reload histories migrated.', 'migrated': migrated, 'reloads': reloads}),
+    }
+
+
+REPORT_FIELDS = ['ClientID', 'Limit', 'Spend', 'CardLimitReached', 'ReloadingHistory']
+
+
+def rebuild_report(start_key: dict = None, context=None) -> dict:
+    """
+    Recomputes the report counters from the client table, then from the history table.
+
+    A new run (no `start_key`) first deletes the counters. Counts are merged in
+    memory and added once per invocation, before the job checkpoints like the
+    weekly digest; the history table is read by REBUILD_REPORT_RELOADS, chained at
+    the end. Writes made while the rebuild runs may be counted twice: run it with
+    writes paused.
+
+    Args:
+        start_key (dict, optional): The LastEvaluatedKey to resume from.
+        context (LambdaContext, optional): The Lambda context, used to watch the remaining time.
+
+    Returns:
+        dict: The HTTP response with the rebuild counters.
+    """
+
+    if start_key is None:
+        print(f"Info: {clear_report()} report counters deleted.")
+    clients = 0
+    report = ReportDelta()
+    for page in scan_pages(fields=REPORT_FIELDS, page_size=HISTORY_PAGE_SIZE, start_key=start_key):
+        for client in (ClientDetails.from_item(item, REPORT_FIELDS) for item in page['Items']):
+            report.client_added(client)
+            for reload in legacy_reloads(client):
+                report.reloaded(reload)
+            clients += 1
+
+        start_key = page.get('LastEvaluatedKey')
+        if start_key and _should_checkpoint(context):
+            report.apply(shard=0)
+            return _checkpoint('REBUILD_REPORT', start_key, context, {'clients': clients})
+
+    report.apply(shard=0)
+    print(f"Info: report counters rebuilt for {clients} clients, reading the reloads.")
+    return rebuild_report_reloads(None, context)
+
+
+def rebuild_report_reloads(start_key: dict = None, context=None) -> dict:
+    """
+    Adds the reloads of the history table to the report counters (second step of REBUILD_REPORT).
+
+    Args:
+        start_key (dict, optional): The LastEvaluatedKey to resume from.
+        context (LambdaContext, optional): The Lambda context, used to watch the remaining time.
+
+    Returns:
+        dict: The HTTP response with the rebuild counters.
+    """
+
+    reloads = 0
+    report = ReportDelta()
+    for page in scan_pages(DYNAMODB_TABLE_HISTORY_NAME, page_size=HISTORY_PAGE_SIZE, start_key=start_key):
+        for reload in map(_cast_item_dynamodb_to_reload, page['Items']):
+            report.reloaded(reload)
+            reloads += 1
+
+        start_key = page.get('LastEvaluatedKey')
+        if start_key and _should_checkpoint(context):
+            report.apply(shard=0)
+            return _checkpoint('REBUILD_REPORT_RELOADS', start_key, context, {'reloads': reloads})
+
+    report.apply(shard=0)
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'Report counters rebuilt.', 'reloads': reloads}),
+    }
+
+
+BACKFILL_FIELDS = ['ClientID', 'LastReloadedAt', 'DigestShard', 'DigestedAt', 'ReloadingHistory']
+
+
+def _update_if(client_id: str, update_expression: str, attribute_names: dict, attribute_values: dict, condition_expression: str) -> bool:
+    # A conditional update of a backfill: False when the condition no longer holds.
+    try:
+        update_item(client_id, update_expression, attribute_names, attribute_values, condition_expression=condition_expression)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+
+
+def backfill_last_reloads(start_key: dict = None, context=None) -> dict:
+    """
+    Stamps LastReloadedAt on the clients written before it existed, so that they appear in the country index.
+
+    Clients reloaded within the first digest window and not digested since are
+    also listed for the next history digest, whether or not they already had a
+    LastReloadedAt. Each attribute is set on its own condition: a client reloaded
+    meanwhile already carries a newer LastReloadedAt (and a DigestShard) and is
+    left as is. Runs page by page and checkpoints like the weekly digest.
+
+    Args:
+        start_key (dict, optional): The LastEvaluatedKey to resume from.
+        context (LambdaContext, optional): The Lambda context, used to watch the remaining time.
+
+    Returns:
+        dict: The HTTP response with the number of clients updated and listed for the digest.
+    """
+
+    recent = (datetime.fromisoformat(_now_iso()) - timedelta(days=HISTORY_DIGEST_FIRST_DAYS)).isoformat(timespec='microseconds')
+    updated = 0
+    listed = 0
+    for page in scan_pages(fields=BACKFILL_FIELDS, page_size=HISTORY_PAGE_SIZE, start_key=start_key):
+        for client in (ClientDetails.from_item(item, BACKFILL_FIELDS) for item in page['Items']):
+            last_reloaded_at = client.get('LastReloadedAt')
+            if last_reloaded_at is None:
+                latest = next(iter_client_reloads(client['ClientID'], client['ReloadingHistory'], page_size=1), None)
+                if latest is None:
+                    continue
+                last_reloaded_at = latest['ReloadedAt']
+                if _update_if(
+                    client['ClientID'],
+                    'SET #last_reloaded_at = :reloaded_at',
+                    {'#last_reloaded_at': 'LastReloadedAt', '#client_id': 'ClientID'},
+                    {':reloaded_at': {'S': last_reloaded_at}},
+                    'attribute_exists(#client_id) AND attribute_not_exists(#last_reloaded_at)'
+                ):
+                    updated += 1
+
+            if 'DigestShard' in client or last_reloaded_at <= recent or client.get('DigestedAt', '') >= last_reloaded_at:
+                continue
+            if _update_if(
+                client['ClientID'],
+                'SET #digest_shard = :digest_shard',
+                {'#digest_shard': 'DigestShard', '#last_reloaded_at': 'LastReloadedAt', '#digested_at': 'DigestedAt', '#client_id': 'ClientID'},
+                {':digest_shard': {'S': _digest_shard()}, ':recent': {'S': recent}},
+                'attribute_exists(#client_id) AND attribute_not_exists(#digest_shard) AND #last_reloaded_at > :recent'
+                ' AND (attribute_not_exists(#digested_at) OR #digested_at < #last_reloaded_at)'
+            ):
+                listed += 1
+
+        start_key = page.get('LastEvaluatedKey')
+        if start_key and _should_checkpoint(context):
+            return _checkpoint('BACKFILL_LAST_RELOAD', start_key, context, {'updated': updated, 'listed': listed})
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'LastReloadedAt backfilled.', 'updated': updated, 'listed': listed}),
+    }
+
+
+def backfill_feed_shards(start_key: dict = None, context=None) -> dict:
+    """
+    Stamps FeedShard on the reloads written before it existed, so that they appear in the feed index.
+
+    Reloads are never modified once written, so they are put back whole, with
+    BatchWriteItem. Runs page by page and checkpoints like the weekly digest.
+
+    Args:
+        start_key (dict, optional): The LastEvaluatedKey to resume from.
+        context (LambdaContext, optional): The Lambda context, used to watch the remaining time.
+
+    Returns:
+        dict: The HTTP response with the number of reloads updated.
+    """
+
+    updated = 0
+    for page in scan_pages(DYNAMODB_TABLE_HISTORY_NAME, page_size=HISTORY_PAGE_SIZE, start_key=start_key):
+        items = [
+            {**item, 'FeedShard': {'S': feed_shard(item['ClientID']['S'], item['ReloadedAt']['S'])}}
+            for item in page['Items'] if 'FeedShard' not in item
+        ]
+        if items:
+            batch_write_items(items, DYNAMODB_TABLE_HISTORY_NAME)
+            updated += len(items)
+
+        start_key = page.get('LastEvaluatedKey')
+        if start_key and _should_checkpoint(context):
+            return _checkpoint('BACKFILL_FEED_SHARD', start_key, context, {'updated': updated})
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': 'FeedShard backfilled.', 'updated': updated}),
+    }
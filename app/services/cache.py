@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe in-memory cache with least-recently-used eviction and a TTL.
+
+    Args:
+        max_size (int): Max number of entries kept.
+        ttl (float, optional): Seconds an entry stays valid (default is no expiry).
+    """
+
+    def __init__(self, max_size: int, ttl: float = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the value cached under `key`, or `default` if it is missing or expired.
+
+        Args:
+            key: The cache key.
+            default (optional): The value returned on a miss.
+
+        Returns:
+            The cached value, or `default`.
+        """
+
+        with self._lock:
+            value, expires_at = self._entries.get(key, (_MISSING, None))
+            if value is _MISSING or (expires_at is not None and expires_at <= time.monotonic()):
+                if value is not _MISSING:
+                    del self._entries[key]
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """
+        Caches `value` under `key`, evicting the least recently used entry when full.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+            ttl (float, optional): Overrides the cache TTL for this entry.
+        """
+
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Size, hits, misses and evictions.
+        """
+
+        return {
+            'size': len(self._entries),
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+        }
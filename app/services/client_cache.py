@@ -0,0 +1,142 @@
+import copy
+import threading
+from typing import Callable
+from codec import ClientDetails
+from env_loader import CLIENT_CACHE_SIZE, CLIENT_CACHE_TTL, DAX_ENDPOINT, DYNAMODB_TABLE_CLIENT_NAME
+from services.aws import get_client
+from services.cache import LRUCache
+from services.telemetry import span
+
+
+class DaxClientTier:
+    """
+    Shared client cache tier backed by a DAX cluster.
+
+    DAX speaks the DynamoDB item API and is read-through: `get` is a GetItem sent to
+    the cluster, which answers from its item cache or reads DynamoDB. Writes made
+    directly against DynamoDB become visible once the cluster's item TTL expires,
+    so `set` and `delete` have nothing to do. Any object with a DynamoDB-style
+    `get_item` (e.g. a DynamoDB fake) can be registered as the 'dax' client.
+
+    Args:
+        table_name (str, optional): The client table name.
+    """
+
+    def __init__(self, table_name=DYNAMODB_TABLE_CLIENT_NAME):
+        self.table_name = table_name
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, client_id: str, default=None):
+        with span('dax.GetItem'):
+            item = get_client('dax').get_item(
+                TableName=self.table_name,
+                Key={'ClientID': {'S': str(client_id)}}
+            ).get('Item')
+        if item is None:
+            self._misses += 1
+            return default
+        self._hits += 1
+        return ClientDetails.from_item(item)
+
+    def set(self, client_id: str, client: ClientDetails, ttl: float = None) -> None:
+        pass
+
+    def delete(self, client_id: str) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {'hits': self._hits, 'misses': self._misses}
+
+
+class ClientCache:
+    """
+    Read-through cache of decoded clients, kept for the lifetime of a warm container.
+
+    Lookups go to the in-memory LRU first, then to the optional shared tier (a DAX
+    cluster, or any object with the LRUCache get/set/delete interface), and only
+    then to the loader. Writers call `put` with the client as stored after the
+    write, or `invalidate` when they do not know it.
+
+    Args:
+        local (LRUCache, optional): The in-container tier.
+        shared (optional): The shared tier (default is a DaxClientTier when DAX_ENDPOINT is set).
+    """
+
+    def __init__(self, local: LRUCache = None, shared=None):
+        self.local = local or LRUCache(CLIENT_CACHE_SIZE, CLIENT_CACHE_TTL)
+        self.shared = shared if shared is not None else (DaxClientTier() if DAX_ENDPOINT else None)
+        self._lock = threading.Lock()
+        self._loads = 0
+
+    def get(self, client_id: str, loader: Callable[[str], ClientDetails]) -> ClientDetails:
+        """
+        Returns a client, loading it on a miss.
+
+        Args:
+            client_id (str): The unique client identifier.
+            loader (Callable[[str], ClientDetails]): Reads the client from DynamoDB;
+                its exceptions (e.g. ClientNotFound) propagate and nothing is cached.
+
+        Returns:
+            ClientDetails: A copy of the cached client, safe to modify.
+        """
+
+        client_id = str(client_id)
+        client = self.local.get(client_id)
+        if client is None and self.shared is not None:
+            client = self.shared.get(client_id)
+            if client is not None:
+                self.local.set(client_id, client)
+        if client is None:
+            client = loader(client_id)
+            with self._lock:
+                self._loads += 1
+            self.put(client_id, client)
+        return copy.copy(client)
+
+    def put(self, client_id: str, client: ClientDetails) -> None:
+        """
+        Stores the client as it is after a write.
+
+        Args:
+            client_id (str): The unique client identifier.
+            client (ClientDetails): The client details.
+        """
+
+        client = copy.copy(client)
+        self.local.set(str(client_id), client)
+        if self.shared is not None:
+            self.shared.set(str(client_id), client)
+
+    def invalidate(self, client_id: str) -> None:
+        """
+        Drops a client from every tier.
+
+        Args:
+            client_id (str): The unique client identifier.
+        """
+
+        self.local.delete(str(client_id))
+        if self.shared is not None:
+            self.shared.delete(str(client_id))
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The local tier counters (size, hits, misses, evictions), the shared
+                tier ones if any, and the number of loads from DynamoDB.
+        """
+
+        stats = {'local': self.local.stats(), 'loads': self._loads}
+        if self.shared is not None and hasattr(self.shared, 'stats'):
+            stats['shared'] = self.shared.stats()
+        return stats
+
+
+client_cache = ClientCache()
@@ -0,0 +1,515 @@
+import heapq
+import json
+import zlib
+from datetime import date, datetime, timezone
+from itertools import dropwhile, islice
+from typing import Iterator, TypedDict
+from env_loader import DYNAMODB_INDEX_FEED_NAME, DYNAMODB_TABLE_CLIENT_NAME, DYNAMODB_TABLE_HISTORY_NAME, HISTORY_FEED_SHARDS
+from factories import _decode_cursor, _encode_cursor
+from services import aio
+from services.aws import batch_write_items, get_client, query_index, query_items
+
+
+class Reload(TypedDict):
+    clientID: str
+    ReloadedAt: str  # ISO-8601 UTC timestamp, the stored and sortable representation
+    Amount: float
+    PaymentMethod: str
+    Date: str  # Display date ('d/m/Y'), derived from ReloadedAt and never stored
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def display_date(reloaded_at: str) -> str:
+    """
+    Derives the display date of a reload from its timestamp.
+
+    Args:
+        reloaded_at (str): The ISO-8601 timestamp.
+
+    Returns:
+        str: The date as 'd/m/Y' (e.g. '5/3/2024'), the format of the legacy records.
+    """
+
+    year, month, day = reloaded_at[:10].split('-')
+    return f"{int(day)}/{int(month)}/{year}"
+
+
+def feed_shard(client_id: str, reloaded_at: str) -> str:
+    """
+    Returns the partition of the feed index a reload belongs to.
+
+    Derived from the reload key, so rewriting a reload keeps it in the same partition.
+
+    Args:
+        client_id (str): The client identifier.
+        reloaded_at (str): The ISO-8601 timestamp of the reload.
+
+    Returns:
+        str: The FeedShard value, from '0' to HISTORY_FEED_SHARDS - 1.
+    """
+
+    return str(zlib.crc32(f"{client_id}#{reloaded_at}".encode()) % HISTORY_FEED_SHARDS)
+
+
+def _cast_reload_to_item_dynamodb(reload: Reload) -> dict:
+    """
+    Converts a reload event to a history table item.
+
+    Args:
+        reload (Reload): The reload event.
+
+    Returns:
+        dict: The DynamoDB item, keyed by ClientID and ReloadedAt, with its FeedShard.
+    """
+
+    return {
+        'ClientID': {'S': str(reload['clientID'])},
+        'ReloadedAt': {'S': reload['ReloadedAt']},
+        'Amount': {'N': str(reload['Amount'])},
+        'PaymentMethod': {'S': reload['PaymentMethod']},
+        'FeedShard': {'S': feed_shard(reload['clientID'], reload['ReloadedAt'])},
+    }
+
+
+def _cast_item_dynamodb_to_reload(item: dict) -> Reload:
+    """
+    Converts a history table item to a reload event.
+
+    The display date is derived from ReloadedAt; a 'Date' attribute left on items
+    written before it was dropped is ignored.
+
+    Args:
+        item (dict): The DynamoDB item.
+
+    Returns:
+        Reload: The reload event.
+    """
+
+    reloaded_at = item['ReloadedAt']['S']
+    return {
+        'clientID': item['ClientID']['S'],
+        'ReloadedAt': reloaded_at,
+        'Amount': float(item['Amount']['N']),
+        'PaymentMethod': item['PaymentMethod']['S'],
+        'Date': display_date(reloaded_at),
+    }
+
+
+def build_reload(client_id: str, amount: float, payment_method: str) -> Reload:
+    """
+    Builds a reload event stamped with the current time.
+
+    Args:
+        client_id (str): The client identifier.
+        amount (float): The reloaded amount in EUR.
+        payment_method (str): The payment method.
+
+    Returns:
+        Reload: The reload event.
+    """
+
+    reloaded_at = _now_iso()
+    return {
+        'clientID': str(client_id),
+        'ReloadedAt': reloaded_at,
+        'Amount': amount,
+        'PaymentMethod': payment_method,
+        'Date': display_date(reloaded_at),
+    }
+
+
+def reload_put_request(reload: Reload, unique: bool = False) -> dict:
+    """
+    Builds the write that appends a reload to the history table.
+
+    Args:
+        reload (Reload): The reload event.
+        unique (bool, optional): Fail the write if a reload with the same key exists,
+            instead of replacing it.
+
+    Returns:
+        dict: A TransactWriteItems 'Put' entry.
+    """
+
+    request = {'TableName': DYNAMODB_TABLE_HISTORY_NAME, 'Item': _cast_reload_to_item_dynamodb(reload)}
+    if unique:
+        request['ConditionExpression'] = 'attribute_not_exists(#reloaded_at)'
+        request['ExpressionAttributeNames'] = {'#reloaded_at': 'ReloadedAt'}
+    return {'Put': request}
+
+
+def _reload_condition(client_id: str, since: str = None, until: str = None) -> tuple[str, dict, dict]:
+    key_condition = '#client_id = :client_id'
+    attribute_names = {'#client_id': 'ClientID'}
+    attribute_values = {':client_id': {'S': str(client_id)}}
+    if since or until:
+        attribute_names['#reloaded_at'] = 'ReloadedAt'
+    if since and until:
+        key_condition += ' AND #reloaded_at BETWEEN :since AND :until'
+    elif since:
+        key_condition += ' AND #reloaded_at >= :since'
+    elif until:
+        key_condition += ' AND #reloaded_at <= :until'
+    if since:
+        attribute_values[':since'] = {'S': since}
+    if until:
+        attribute_values[':until'] = {'S': until}
+    return key_condition, attribute_names, attribute_values
+
+
+def _query_page(client_id: str, limit: int = None, start_key: dict = None, since: str = None, until: str = None) -> dict:
+    return query_items(
+        *_reload_condition(client_id, since, until),
+        DYNAMODB_TABLE_HISTORY_NAME,
+        limit=limit,
+        start_key=start_key,
+        scan_forward=False
+    )
+
+
+async def _query_page_async(client_id: str, limit: int = None, start_key: dict = None, since: str = None, until: str = None) -> dict:
+    return await aio.query_items(
+        *_reload_condition(client_id, since, until),
+        DYNAMODB_TABLE_HISTORY_NAME,
+        limit=limit,
+        start_key=start_key,
+        scan_forward=False
+    )
+
+
+async def fetch_client_reloads(client_id: str, since: str = None, until: str = None) -> list[Reload]:
+    """
+    Reads the reloads of a client from the history table, newest first, on the asyncio path.
+
+    Unlike `iter_client_reloads`, reloads still in a legacy ReloadingHistory blob are not read.
+
+    Args:
+        client_id (str): The client identifier.
+        since (str, optional): Lowest ReloadedAt returned (ISO-8601, inclusive).
+        until (str, optional): Highest ReloadedAt returned (ISO-8601, inclusive).
+
+    Returns:
+        list[Reload]: The reload events.
+    """
+
+    reloads, start_key = [], None
+    while True:
+        page = await _query_page_async(client_id, start_key=start_key, since=since, until=until)
+        reloads.extend(map(_cast_item_dynamodb_to_reload, page['Items']))
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            return reloads
+
+
+def iter_client_reloads(client_id: str, legacy_history: list = None, since: str = None, until: str = None, page_size: int = None, first_page: dict = None) -> Iterator[Reload]:
+    """
+    Yields the reloads of a client, newest first, optionally within a time range.
+
+    During the rollout, reloads still stored on the client item (`legacy_history`)
+    are yielded after the table ones: they all predate the history table. They are
+    given the ReloadedAt the migration would assign them (read shim).
+
+    Args:
+        client_id (str): The client identifier.
+        legacy_history (list, optional): The ReloadingHistory still stored on the client item.
+        since (str, optional): Lowest ReloadedAt returned (ISO-8601, inclusive).
+        until (str, optional): Highest ReloadedAt returned (ISO-8601, inclusive).
+        page_size (int, optional): Items read per query (default is as many as DynamoDB returns).
+        first_page (dict, optional): The response of the first query, when already read.
+
+    Yields:
+        Reload: Each reload event.
+    """
+
+    start_key = None
+    while True:
+        page = first_page if first_page is not None and start_key is None else _query_page(client_id, page_size, start_key, since, until)
+        yield from map(_cast_item_dynamodb_to_reload, page['Items'])
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            break
+
+    for reload in _sorted_legacy_reloads(legacy_history):
+        if (since is None or reload['ReloadedAt'] >= since) and (until is None or reload['ReloadedAt'] <= until):
+            yield reload
+
+
+def query_client_reloads(client_id: str, legacy_history: list = None, limit: int = 50, cursor: str = None) -> tuple[list[Reload], str]:
+    """
+    Returns one page of a client's reloads, newest first.
+
+    Args:
+        client_id (str): The client identifier.
+        legacy_history (list, optional): The ReloadingHistory still stored on the client item.
+        limit (int, optional): The page size.
+        cursor (str, optional): The cursor returned with the previous page.
+
+    Returns:
+        tuple[list[Reload], str]: The reloads and the cursor of the next page (None on the last page).
+    """
+
+    position = _reloads_position(cursor, client_id)
+    reloads = []
+
+    if 'legacy' not in position:
+        start_key = position.get('key')
+        while len(reloads) < limit:
+            page = _query_page(client_id, limit - len(reloads), start_key)
+            reloads.extend(map(_cast_item_dynamodb_to_reload, page['Items']))
+            start_key = page.get('LastEvaluatedKey')
+            if not start_key:
+                break
+        if start_key:
+            return reloads, _encode_cursor({'key': start_key})
+
+    legacy = _sorted_legacy_reloads(legacy_history)
+    offset = position.get('legacy', 0)
+    remaining = limit - len(reloads)
+    reloads.extend(legacy[offset:offset + remaining])
+    next_offset = offset + remaining
+    return reloads, _encode_cursor({'legacy': next_offset}) if next_offset < len(legacy) else None
+
+
+def _reloads_position(cursor: str, client_id: str) -> dict:
+    """
+    Decodes the cursor of `query_client_reloads`, checking that it points into this client's reloads.
+
+    Args:
+        cursor (str): The cursor returned with the previous page, or None.
+        client_id (str): The client identifier.
+
+    Returns:
+        dict: The position, with a 'key' (history table start key) or a 'legacy' offset; empty without a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another client.
+    """
+
+    position = _decode_cursor(cursor)
+    if position is None:
+        return {}
+    if not isinstance(position, dict) or len(position) != 1:
+        raise ValueError('Invalid cursor.')
+    if 'legacy' in position:
+        offset = position['legacy']
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+            raise ValueError('Invalid cursor.')
+        return position
+    start_key = position.get('key')
+    if not isinstance(start_key, dict) or set(start_key) != {'ClientID', 'ReloadedAt'}:
+        raise ValueError('Invalid cursor.')
+    for value in start_key.values():
+        if not isinstance(value, dict) or list(value) != ['S'] or not isinstance(value['S'], str):
+            raise ValueError('Invalid cursor.')
+    if start_key['ClientID']['S'] != client_id:
+        raise ValueError('Invalid cursor.')
+    return position
+
+
+def _sorted_legacy_reloads(legacy_history: list) -> list[Reload]:
+    """
+    Gives the reloads of a legacy ReloadingHistory their ReloadedAt, newest first.
+
+    Args:
+        legacy_history (list): The ReloadingHistory stored on the client item, or None.
+
+    Returns:
+        list[Reload]: The reloads, sorted like the history table returns them.
+    """
+
+    legacy_history = legacy_history or []
+    return sorted(
+        ({**reload, 'ReloadedAt': reloaded_at} for reload, reloaded_at in zip(legacy_history, _legacy_reload_timestamps(legacy_history))),
+        key=lambda reload: reload['ReloadedAt'],
+        reverse=True
+    )
+
+
+def _feed_key(reload: Reload) -> tuple[str, str]:
+    return reload['ReloadedAt'], reload['clientID']
+
+
+def _parse_range(since: str = None, until: str = None) -> tuple[str, str]:
+    """
+    Turns the dates of a feed request into inclusive ReloadedAt bounds.
+
+    Args:
+        since (str, optional): First day ('YYYY-MM-DD') or instant (ISO-8601) included.
+        until (str, optional): Last day ('YYYY-MM-DD') or instant (ISO-8601) included.
+
+    Returns:
+        tuple[str, str]: The lower and upper bounds, None when open.
+
+    Raises:
+        ValueError: If a bound is not an ISO-8601 date or datetime.
+    """
+
+    bounds = []
+    for value, end_of_day in ((since, False), (until, True)):
+        if not value:
+            bounds.append(None)
+        elif len(value) == 10:
+            day = datetime.combine(date.fromisoformat(value), datetime.max.time() if end_of_day else datetime.min.time(), timezone.utc)
+            bounds.append(day.isoformat(timespec='microseconds'))
+        else:
+            bounds.append(datetime.fromisoformat(value).astimezone(timezone.utc).isoformat(timespec='microseconds'))
+    return bounds[0], bounds[1]
+
+
+def _feed_page(shard: int, limit: int = None, start_key: dict = None, since: str = None, until: str = None) -> dict:
+    return query_index(
+        DYNAMODB_INDEX_FEED_NAME,
+        'FeedShard',
+        str(shard),
+        'ReloadedAt',
+        since,
+        until,
+        DYNAMODB_TABLE_HISTORY_NAME,
+        limit=limit,
+        start_key=start_key
+    )
+
+
+async def _feed_page_async(shard: int, limit: int = None, start_key: dict = None, since: str = None, until: str = None) -> dict:
+    return await aio.query_index(
+        DYNAMODB_INDEX_FEED_NAME,
+        'FeedShard',
+        str(shard),
+        'ReloadedAt',
+        since,
+        until,
+        DYNAMODB_TABLE_HISTORY_NAME,
+        limit=limit,
+        start_key=start_key
+    )
+
+
+def _iter_feed_shard(shard: int, since: str = None, until: str = None, page_size: int = None, first_page: dict = None) -> Iterator[Reload]:
+    start_key = None
+    while True:
+        page = first_page if first_page is not None and start_key is None else _feed_page(shard, page_size, start_key, since, until)
+        yield from map(_cast_item_dynamodb_to_reload, page['Items'])
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            return
+
+
+def history_feed(since: str = None, until: str = None, limit: int = None, cursor: str = None) -> tuple[list[Reload], str]:
+    """
+    Returns one page of the reloads of every client, newest first.
+
+    Reloads are read from the feed index, whose HISTORY_FEED_SHARDS partitions each
+    hold their reloads ordered by ReloadedAt: the partitions are merged with a heap
+    and only read as far as the page needs. The cursor is the (ReloadedAt, ClientID)
+    of the last reload returned.
+
+    Reloads still in a legacy ReloadingHistory blob are not listed: run
+    MIGRATE_RELOAD_HISTORY first, and BACKFILL_FEED_SHARD for the reloads written
+    before the index.
+
+    Args:
+        since (str, optional): First day ('YYYY-MM-DD') or instant (ISO-8601) included.
+        until (str, optional): Last day ('YYYY-MM-DD') or instant (ISO-8601) included.
+        limit (int, optional): The page size (default is every reload).
+        cursor (str, optional): The cursor returned with the previous page.
+
+    Returns:
+        tuple[list[Reload], str]: The reloads and the cursor of the next page (None on the last page).
+
+    Raises:
+        ValueError: If the range or the cursor is malformed.
+    """
+
+    since, until = _parse_range(since, until)
+    position = _decode_cursor(cursor)
+    if position is not None and not (isinstance(position, dict) and isinstance(position.get('before'), list) and len(position['before']) == 2):
+        raise ValueError('Invalid cursor.')
+    before = tuple(position['before']) if position else None
+    if before and (until is None or before[0] < until):
+        until = before[0]
+
+    page_size = limit and limit + 1
+    shards = range(HISTORY_FEED_SHARDS)
+    # The merge starts by reading the first page of every partition: on the asyncio
+    # path these queries run concurrently up front.
+    first_pages = aio.run(aio.gather(*(
+        _feed_page_async(shard, page_size, since=since, until=until) for shard in shards
+    ))) if aio.enabled() else [None] * len(shards)
+
+    merged = heapq.merge(*(
+        _iter_feed_shard(shard, since, until, page_size, first_page) for shard, first_page in zip(shards, first_pages)
+    ), key=_feed_key, reverse=True)
+    if before:
+        merged = dropwhile(lambda reload: _feed_key(reload) >= before, merged)
+    if limit is None:
+        return list(merged), None
+
+    reloads = list(islice(merged, limit + 1))
+    if len(reloads) <= limit:
+        return reloads, None
+    reloads = reloads[:limit]
+    return reloads, _encode_cursor({'before': list(_feed_key(reloads[-1]))})
+
+
+def _legacy_reload_timestamps(legacy_history: list) -> list[str]:
+    """
+    Derives sortable timestamps for reloads stored on the client item.
+
+    Legacy reloads only carry a 'd/m/Y' date. The list is newest first, so
+    same-day reloads are spread by microseconds to keep their order and keys unique.
+
+    Args:
+        legacy_history (list): The ReloadingHistory stored on the client item.
+
+    Returns:
+        list[str]: One ISO-8601 timestamp per reload.
+    """
+
+    count = len(legacy_history)
+    timestamps = []
+    for index, reload in enumerate(legacy_history):
+        day, month, year = map(int, reload['Date'].split('/'))
+        timestamps.append(f"{year:04d}-{month:02d}-{day:02d}T00:00:00.{count - index:06d}+00:00")
+    return timestamps
+
+
+def migrate_client_history(client_id: str, legacy_json: str) -> int:
+    """
+    Moves the ReloadingHistory blob of a client item into the history table.
+
+    The blob is removed only if it has not changed since it was read, so a
+    concurrent legacy write is never lost; the next run picks it up again.
+    Re-running the migration is safe: items are keyed by ClientID and ReloadedAt.
+
+    Args:
+        client_id (str): The client identifier.
+        legacy_json (str): The ReloadingHistory attribute as stored.
+
+    Returns:
+        int: The number of reloads moved.
+    """
+
+    legacy_history = json.loads(legacy_json)
+    items = [
+        _cast_reload_to_item_dynamodb({
+            'clientID': str(client_id),
+            'ReloadedAt': reload.get('ReloadedAt', reloaded_at),
+            'Amount': reload['Amount'],
+            'PaymentMethod': reload['PaymentMethod'],
+        })
+        for reload, reloaded_at in zip(legacy_history, _legacy_reload_timestamps(legacy_history))
+    ]
+    batch_write_items(items, DYNAMODB_TABLE_HISTORY_NAME)
+
+    get_client('dynamodb').update_item(
+        TableName=DYNAMODB_TABLE_CLIENT_NAME,
+        Key={'ClientID': {'S': str(client_id)}},
+        UpdateExpression='REMOVE #history',
+        ConditionExpression='#history = :history',
+        ExpressionAttributeNames={'#history': 'ReloadingHistory'},
+        ExpressionAttributeValues={':history': {'S': legacy_json}}
+    )
+    return len(items)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import time
+from botocore.exceptions import ClientError
+from env_loader import (
+    DYNAMODB_TABLE_REQUEST_NAME,
+    IDEMPOTENCY_CACHE_SIZE,
+    IDEMPOTENCY_LOCK_TIMEOUT,
+    IDEMPOTENCY_TTL
+)
+from exceptions import IdempotencyKeyReused, TransactionAlreadyExecute, TransactionFailed
+from services.aws import get_client
+from services.cache import LRUCache
+
+
+def fingerprint(payload: str) -> str:
+    """
+    Hashes a request payload so a reused key with another payload can be detected.
+
+    The JSON is hashed in canonical form (sorted keys, no formatting), so a retry
+    serialized differently still matches.
+
+    Args:
+        payload (str): The raw request body.
+
+    Returns:
+        str: The SHA-256 hex digest.
+    """
+
+    return hashlib.sha256(json.dumps(json.loads(payload), sort_keys=True).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Remembers the response of each request ID so retries are answered without re-executing.
+
+    Records live in a DynamoDB table keyed by 'RequestID' (with 'ExpiresAt' as TTL
+    attribute); completed responses are also kept in an in-memory LRU front cache.
+    A request is first claimed with a conditional put, locked for as long as the
+    invocation executing it may run. A claim left unfinished by a crashed
+    invocation can be taken over once its lock times out. A request that
+    failed after writing is recorded as FAILED and never executed again.
+
+    Args:
+        table_name (str, optional): The idempotency table name.
+        ttl (int, optional): Seconds a completed request is remembered.
+        lock_timeout (int, optional): Seconds after which an unfinished claim can be taken over,
+            when the time left to the invocation is not known.
+        cache (LRUCache, optional): The in-memory front cache.
+    """
+
+    def __init__(self, table_name=DYNAMODB_TABLE_REQUEST_NAME, ttl=IDEMPOTENCY_TTL, lock_timeout=IDEMPOTENCY_LOCK_TIMEOUT, cache=None):
+        self.table_name = table_name
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.cache = cache or LRUCache(IDEMPOTENCY_CACHE_SIZE, ttl)
+
+    def begin(self, request_id: str, payload_hash: str, lock_timeout: int = None) -> dict:
+        """
+        Claims a request ID, or returns the stored response if it already completed.
+
+        Args:
+            request_id (str): The idempotency key.
+            payload_hash (str): The fingerprint of the request payload.
+            lock_timeout (int, optional): Seconds the claim is held, at least the time left
+                to the invocation (default is the store's lock_timeout).
+
+        Returns:
+            dict: The stored response, or None if the caller must execute the request.
+
+        Raises:
+            TransactionAlreadyExecute: If the same request is still being executed.
+            TransactionFailed: If the same request failed after writing.
+            IdempotencyKeyReused: If the key was used with another payload.
+        """
+
+        cached = self.cache.get(request_id)
+        if cached is not None:
+            return self._check(request_id, payload_hash, cached)
+
+        now = int(time.time())
+        try:
+            get_client('dynamodb').put_item(
+                TableName=self.table_name,
+                Item={
+                    'RequestID': {'S': request_id},
+                    'Status': {'S': 'IN_PROGRESS'},
+                    'Fingerprint': {'S': payload_hash},
+                    'LockExpiresAt': {'N': str(now + (lock_timeout or self.lock_timeout))},
+                    'ExpiresAt': {'N': str(now + self.ttl)},
+                },
+                ConditionExpression='attribute_not_exists(#request_id) OR (#status = :in_progress AND #lock_expires_at < :now)',
+                ExpressionAttributeNames={'#request_id': 'RequestID', '#status': 'Status', '#lock_expires_at': 'LockExpiresAt'},
+                ExpressionAttributeValues={':in_progress': {'S': 'IN_PROGRESS'}, ':now': {'N': str(now)}}
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        item = get_client('dynamodb').get_item(
+            TableName=self.table_name,
+            Key={'RequestID': {'S': request_id}},
+            ConsistentRead=True
+        ).get('Item')
+        if item is None:
+            # The record expired between the two calls: claim it again.
+            return self.begin(request_id, payload_hash, lock_timeout)
+        if item['Status']['S'] == 'FAILED':
+            self._check(request_id, payload_hash, {'fingerprint': item['Fingerprint']['S'], 'response': None})
+            raise TransactionFailed(request_id)
+        if item['Status']['S'] != 'COMPLETED':
+            raise TransactionAlreadyExecute(request_id)
+        record = {'fingerprint': item['Fingerprint']['S'], 'response': json.loads(item['Response']['S'])}
+        self.cache.set(request_id, record)
+        return self._check(request_id, payload_hash, record)
+
+    def complete(self, request_id: str, payload_hash: str, response: dict) -> None:
+        """
+        Stores the response of a claimed request.
+
+        Args:
+            request_id (str): The idempotency key.
+            payload_hash (str): The fingerprint of the request payload.
+            response (dict): The response returned to the caller.
+        """
+
+        get_client('dynamodb').update_item(
+            TableName=self.table_name,
+            Key={'RequestID': {'S': request_id}},
+            UpdateExpression='SET #status = :completed, #response = :response REMOVE #lock_expires_at',
+            ExpressionAttributeNames={'#status': 'Status', '#response': 'Response', '#lock_expires_at': 'LockExpiresAt'},
+            ExpressionAttributeValues={':completed': {'S': 'COMPLETED'}, ':response': {'S': json.dumps(response)}}
+        )
+        self.cache.set(request_id, {'fingerprint': payload_hash, 'response': response})
+
+    def fail(self, request_id: str, error: str) -> None:
+        """
+        Records that a claimed request failed after writing, so it is not executed again.
+
+        Args:
+            request_id (str): The idempotency key.
+            error (str): The error, kept for investigation.
+        """
+
+        get_client('dynamodb').update_item(
+            TableName=self.table_name,
+            Key={'RequestID': {'S': request_id}},
+            UpdateExpression='SET #status = :failed, #error = :error REMOVE #lock_expires_at',
+            ExpressionAttributeNames={'#status': 'Status', '#error': 'Error', '#lock_expires_at': 'LockExpiresAt'},
+            ExpressionAttributeValues={':failed': {'S': 'FAILED'}, ':error': {'S': error or 'unknown error'}}
+        )
+
+    def release(self, request_id: str) -> None:
+        """
+        Drops the claim of a request that failed without writing, so it can be retried.
+
+        Args:
+            request_id (str): The idempotency key.
+        """
+
+        get_client('dynamodb').delete_item(
+            TableName=self.table_name,
+            Key={'RequestID': {'S': request_id}}
+        )
+
+    def _check(self, request_id: str, payload_hash: str, record: dict) -> dict:
+        if record['fingerprint'] != payload_hash:
+            raise IdempotencyKeyReused(request_id)
+        return record['response']
+
+
+idempotency_store = IdempotencyStore()
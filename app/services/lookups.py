@@ -0,0 +1,228 @@
+import json
+from decimal import Decimal
+from typing import Callable
+from env_loader import (
+    DYNAMODB_INDEX_COUNTRY_NAME,
+    DYNAMODB_INDEX_EMAIL_NAME,
+    DYNAMODB_INDEX_PAYMENT_METHOD_NAME,
+    DYNAMODB_TABLE_HISTORY_NAME
+)
+from codec import ClientDetails
+from factories import _decode_cursor, _encode_cursor
+from services.aws import batch_get_items, query_index
+from services.history import _cast_item_dynamodb_to_reload, _parse_range
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+# Attributes projected into the country index besides its keys.
+COUNTRY_INDEX_FIELDS = ['ClientID', 'FirstName', 'LastName', 'Email', 'Country', 'LastReloadedAt']
+
+
+def _client_json(client: ClientDetails) -> dict:
+    """
+    Converts a client to a JSON-serializable dict, without its legacy reload blob.
+
+    Args:
+        client (ClientDetails): The client.
+
+    Returns:
+        dict: The client attributes, amounts as floats.
+    """
+
+    return {
+        name: float(value) if isinstance(value, Decimal) else value
+        for name, value in ((name, client[name]) for name in client.keys() if name != 'ReloadingHistory')
+    }
+
+
+def _page_size(limit) -> int:
+    """
+    Validates the page size of a lookup.
+
+    Raises:
+        ValueError: If the limit is not a positive integer.
+    """
+
+    try:
+        size = int(limit or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError('Limit must be a positive integer.')
+    if size < 1:
+        raise ValueError('Limit must be a positive integer.')
+    return min(size, MAX_PAGE_SIZE)
+
+
+def _start_key(cursor: str, key: dict) -> dict:
+    """
+    Decodes the start key of a cursor, checking that it is a key of the queried index partition.
+
+    Args:
+        cursor (str): The cursor returned with the previous page, or None.
+        key (dict): The key attributes of the index items, to their expected value
+            (the partition queried), or None for any value.
+
+    Returns:
+        dict: The ExclusiveStartKey, or None without a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another query.
+    """
+
+    position = _decode_cursor(cursor)
+    if position is None:
+        return None
+    start_key = position.get('key') if isinstance(position, dict) else None
+    if not isinstance(start_key, dict) or set(start_key) != set(key):
+        raise ValueError('Invalid cursor.')
+    for name, expected in key.items():
+        value = start_key[name]
+        if not isinstance(value, dict) or list(value) != ['S'] or not isinstance(value['S'], str) or expected not in (None, value['S']):
+            raise ValueError('Invalid cursor.')
+    return start_key
+
+
+def _query_page(query: Callable[[int, dict], dict], limit: int, cursor: str, key: dict) -> tuple[list[dict], str]:
+    """
+    Reads one page of index items, following LastEvaluatedKey until the page is full.
+
+    Args:
+        query (Callable[[int, dict], dict]): Runs a query with a limit and a start key.
+        limit (int): The page size.
+        cursor (str): The cursor returned with the previous page, or None.
+        key (dict): The key attributes of the index items and their
+            expected values, against which the cursor is checked (see `_start_key`).
+
+    Returns:
+        tuple[list[dict], str]: The raw items and the cursor of the next page (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another query.
+    """
+
+    start_key = _start_key(cursor, key)
+    items = []
+    while len(items) < limit:
+        page = query(limit - len(items), start_key)
+        items.extend(page['Items'])
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            break
+    return items, _encode_cursor({'key': start_key}) if start_key else None
+
+
+def _bad_request(message: str) -> dict:
+    return {'statusCode': 400, 'body': json.dumps({'message': message})}
+
+
+def find_clients_by_email(email: str) -> dict:
+    """
+    Finds the clients registered with an email address.
+
+    The email index only projects the keys: the clients are then read with one BatchGetItem.
+
+    Args:
+        email (str): The email address, matched exactly.
+
+    Returns:
+        dict: The HTTP response, with the matching clients under 'items'.
+    """
+
+    if not email:
+        return _bad_request('Email is required.')
+    client_ids, start_key = [], None
+    while True:
+        page = query_index(DYNAMODB_INDEX_EMAIL_NAME, 'Email', email.strip(), start_key=start_key)
+        client_ids.extend(item['ClientID']['S'] for item in page['Items'])
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            break
+
+    clients = [ClientDetails.from_item(item) for item in batch_get_items(client_ids)] if client_ids else []
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'items': [_client_json(client) for client in sorted(clients, key=lambda client: client['ClientID'])]}),
+    }
+
+
+def find_clients_by_country(country: str, since: str = None, until: str = None, limit: int = None, cursor: str = None) -> dict:
+    """
+    Lists the clients of a country, most recently reloaded first, optionally by last reload date.
+
+    Clients never reloaded since the index was introduced have no LastReloadedAt
+    and are not listed until BACKFILL_LAST_RELOAD has run.
+
+    Args:
+        country (str): The country, as stored on the clients.
+        since (str, optional): First day ('YYYY-MM-DD') or instant (ISO-8601) of the last reload.
+        until (str, optional): Last day ('YYYY-MM-DD') or instant (ISO-8601) of the last reload.
+        limit (int, optional): The page size (default is 50).
+        cursor (str, optional): The cursor returned with the previous page.
+
+    Returns:
+        dict: The HTTP response, with 'items' (the projected client attributes) and 'cursor'.
+    """
+
+    if not country:
+        return _bad_request('Country is required.')
+    try:
+        since, until = _parse_range(since, until)
+        clients, next_cursor = _query_page(
+            lambda page_size, start_key: query_index(
+                DYNAMODB_INDEX_COUNTRY_NAME, 'Country', country, 'LastReloadedAt', since, until,
+                limit=page_size, start_key=start_key
+            ),
+            _page_size(limit),
+            cursor,
+            {'ClientID': None, 'Country': str(country), 'LastReloadedAt': None}
+        )
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'items': [_client_json(ClientDetails.from_item(item, COUNTRY_INDEX_FIELDS)) for item in clients],
+            'cursor': next_cursor,
+        }),
+    }
+
+
+def find_reloads_by_payment_method(payment_method: str, since: str = None, until: str = None, limit: int = None, cursor: str = None) -> dict:
+    """
+    Lists the reloads made with a payment method, newest first, optionally within a time range.
+
+    Reloads still stored on legacy client items are not indexed: run
+    MIGRATE_RELOAD_HISTORY first.
+
+    Args:
+        payment_method (str): The payment method.
+        since (str, optional): First day ('YYYY-MM-DD') or instant (ISO-8601) included.
+        until (str, optional): Last day ('YYYY-MM-DD') or instant (ISO-8601) included.
+        limit (int, optional): The page size (default is 50).
+        cursor (str, optional): The cursor returned with the previous page.
+
+    Returns:
+        dict: The HTTP response, with 'items' (the reloads) and 'cursor'.
+    """
+
+    if not payment_method:
+        return _bad_request('PaymentMethod is required.')
+    try:
+        since, until = _parse_range(since, until)
+        reloads, next_cursor = _query_page(
+            lambda page_size, start_key: query_index(
+                DYNAMODB_INDEX_PAYMENT_METHOD_NAME, 'PaymentMethod', payment_method, 'ReloadedAt', since, until,
+                table_name=DYNAMODB_TABLE_HISTORY_NAME, limit=page_size, start_key=start_key
+            ),
+            _page_size(limit),
+            cursor,
+            {'ClientID': None, 'ReloadedAt': None, 'PaymentMethod': str(payment_method)}
+        )
+    except ValueError as e:
+        return _bad_request(str(e))
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'items': list(map(_cast_item_dynamodb_to_reload, reloads)), 'cursor': next_cursor}),
+    }
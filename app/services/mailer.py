@@ -0,0 +1,204 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+from botocore.exceptions import ClientError
+from env_loader import SES_MAX_RETRIES, SES_MAX_WORKERS, SES_SEND_RATE, VERIFIED_EMAIL
+from factories import _batched
+from services.aws import email_body, get_client
+from services.resilience import retry_fits
+
+
+# SES accepts at most 50 destinations per SendBulkTemplatedEmail call.
+BULK_DESTINATIONS_LIMIT = 50
+THROTTLING_ERRORS = {'Throttling', 'ThrottlingException', 'TooManyRequestsException'}
+
+
+class EmailMessage(TypedDict):
+    to_addresses: list[str]
+    bcc_addresses: list[str]
+    body_message: str
+    subject_message: str
+    html_message: str  # Optional HTML alternative
+
+
+class EmailOutcome(TypedDict):
+    to_addresses: list[str]
+    status: str
+    message_id: str
+    error: str
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how many calls start per second.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float, optional): Max burst size (default is `rate`).
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """
+        Blocks until `tokens` tokens are available, then takes them.
+
+        Requests larger than the capacity go into debt, which later callers wait off.
+
+        Args:
+            tokens (float, optional): The number of tokens to take.
+        """
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmailDispatcher:
+    """
+    Sends emails concurrently while staying under the account's SES send rate.
+
+    SES counts the send rate in recipients, not messages: each call takes one
+    token per To and Bcc address it sends to.
+
+    Throttled calls are retried with exponential backoff and full jitter, unless
+    the backoff would run past the invocation deadline. Every message gets an
+    outcome, so only failed ones need to be retried.
+
+    Args:
+        max_workers (int, optional): Number of sending threads.
+        send_rate (float, optional): Recipients per second; read from SES GetSendQuota when None.
+        max_retries (int, optional): Retries of a throttled call.
+        source (str, optional): The verified sender address.
+    """
+
+    def __init__(self, max_workers=SES_MAX_WORKERS, send_rate=SES_SEND_RATE, max_retries=SES_MAX_RETRIES, source=VERIFIED_EMAIL):
+        self.max_workers = max_workers
+        self.send_rate = send_rate
+        self.max_retries = max_retries
+        self.source = source
+        self._bucket = None
+        self._bucket_lock = threading.Lock()
+
+    def send_many(self, messages: list[EmailMessage]) -> list[EmailOutcome]:
+        """
+        Sends messages concurrently.
+
+        Args:
+            messages (list[EmailMessage]): The messages to send.
+
+        Returns:
+            list[EmailOutcome]: One outcome per message, in the same order.
+        """
+
+        if not messages:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(messages))) as executor:
+            return list(executor.map(self._send_one, messages))
+
+    def send_bulk_templated(self, template_name: str, destinations: list[tuple[list[str], dict]], default_template_data: dict = None, bcc_addresses: list[str] = None) -> list[EmailOutcome]:
+        """
+        Sends a stored SES template to many destinations, 50 per API call.
+
+        Args:
+            template_name (str): The SES template name.
+            destinations (list[tuple[list[str], dict]]): Recipients and their template data.
+            default_template_data (dict, optional): Data shared by every destination.
+            bcc_addresses (list[str], optional): Addresses copied on every destination.
+
+        Returns:
+            list[EmailOutcome]: One outcome per destination, in the same order.
+        """
+
+        chunks = list(_batched(destinations, BULK_DESTINATIONS_LIMIT))
+        if not chunks:
+            return []
+        send_chunk = lambda chunk: self._send_bulk_chunk(template_name, chunk, default_template_data or {}, bcc_addresses or [])
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            return [outcome for outcomes in executor.map(send_chunk, chunks) for outcome in outcomes]
+
+    def _send_one(self, message: EmailMessage) -> EmailOutcome:
+        try:
+            recipients = len(message['to_addresses']) + len(message['bcc_addresses'] or [])
+            response = self._call(recipients, lambda ses: ses.send_email(
+                Source=self.source,
+                Destination={
+                    'ToAddresses': message['to_addresses'],
+                    'BccAddresses': message['bcc_addresses']
+                },
+                Message={
+                    'Subject': {'Data': message['subject_message']},
+                    'Body': email_body(message['body_message'], message.get('html_message'))
+                }
+            ))
+        except Exception as e:
+            return _outcome(message['to_addresses'], 'FAILED', error=str(e))
+        return _outcome(message['to_addresses'], 'SENT', message_id=response['MessageId'])
+
+    def _send_bulk_chunk(self, template_name: str, chunk: list, default_template_data: dict, bcc_addresses: list[str]) -> list[EmailOutcome]:
+        try:
+            recipients = sum(len(to_addresses) + len(bcc_addresses) for to_addresses, _ in chunk)
+            response = self._call(recipients, lambda ses: ses.send_bulk_templated_email(
+                Source=self.source,
+                Template=template_name,
+                DefaultTemplateData=json.dumps(default_template_data),
+                Destinations=[{
+                    'Destination': {'ToAddresses': to_addresses, 'BccAddresses': bcc_addresses},
+                    'ReplacementTemplateData': json.dumps(template_data),
+                } for to_addresses, template_data in chunk]
+            ))
+        except Exception as e:
+            return [_outcome(to_addresses, 'FAILED', error=str(e)) for to_addresses, _ in chunk]
+
+        return [
+            _outcome(to_addresses, 'SENT', message_id=status.get('MessageId'))
+            if status['Status'] == 'Success'
+            else _outcome(to_addresses, 'FAILED', error=status.get('Error', status['Status']))
+            for (to_addresses, _), status in zip(chunk, response['Status'])
+        ]
+
+    def _call(self, tokens: int, request):
+        # Throttling is retried here, paced by the send rate: botocore does not retry.
+        ses = get_client('ses', max_attempts=1)
+        for attempt in range(self.max_retries + 1):
+            self._limiter().acquire(tokens)
+            try:
+                return request(ses)
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLING_ERRORS or attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, min(20, 0.1 * 2 ** attempt))
+                if not retry_fits(delay):
+                    raise
+                time.sleep(delay)
+
+    def _limiter(self) -> TokenBucket:
+        if self._bucket is None:
+            with self._bucket_lock:
+                if self._bucket is None:
+                    rate = self.send_rate or get_client('ses').get_send_quota()['MaxSendRate']
+                    self._bucket = TokenBucket(rate)
+        return self._bucket
+
+
+def _outcome(to_addresses: list[str], status: str, message_id: str = None, error: str = None) -> EmailOutcome:
+    return {'to_addresses': to_addresses, 'status': status, 'message_id': message_id, 'error': error}
+
+
+email_dispatcher = EmailDispatcher()
@@ -0,0 +1,195 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from env_loader import ADMIN_EMAILS, NOTIFICATION_MODE
+from messages import message_template, render_fragments
+from services.aws import send_email, write_items
+from services.mailer import email_dispatcher
+from services.outbox import Notification, _cast_item_dynamodb_to_notification, get_outbox
+from templates import RenderedMessage
+
+
+CLIENT_CREATED = 'CLIENT_CREATED'
+CARD_RECHARGE = 'CARD_RECHARGE'
+CARD_RECHARGES = 'CARD_RECHARGES'
+# Rendering variant of CARD_RECHARGE, for refunds.
+CARD_REFUND = 'CARD_REFUND'
+
+
+def render_notification(notification: Notification) -> RenderedMessage:
+    """
+    Renders a notification with the compiled template of its kind and locale.
+
+    The locale is the 'Locale' of the notification context, or NOTIFICATION_LOCALE.
+
+    Args:
+        notification (Notification): The notification.
+
+    Returns:
+        RenderedMessage: The subject, text and HTML.
+    """
+
+    context = notification['Context']
+    locale = context.get('Locale')
+    kind = notification['Kind']
+    if kind == CARD_RECHARGE and context['PaymentMethod'] == 'Remboursement':
+        kind = CARD_REFUND
+    elif kind == CARD_RECHARGES:
+        lines, html_lines = render_fragments(message_template('CARD_RECHARGES_LINE', locale), context['Recharges'])
+        context = {**context, 'Lines': lines, 'HtmlLines': html_lines}
+    return message_template(kind, locale).render(context)
+
+
+def build_notification(kind: str, client_id: str, email: str, context: dict) -> Notification:
+    """
+    Builds a notification to be rendered and sent later.
+
+    Args:
+        kind (str): The notification kind (CLIENT_CREATED, CARD_RECHARGE, CARD_RECHARGES).
+        client_id (str): The client the notification is about.
+        email (str): The recipient address.
+        context (dict): The values the template needs, and optionally its 'Locale'.
+
+    Returns:
+        Notification: The notification.
+    """
+
+    return {
+        'NotificationID': str(uuid.uuid4()),
+        'Kind': kind,
+        'ClientID': str(client_id),
+        'Email': email,
+        'Context': context,
+        'CreatedAt': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def dispatch_notification(notification: Notification) -> str:
+    """
+    Renders a notification and sends it by email, with the admins in copy.
+
+    Args:
+        notification (Notification): The notification.
+
+    Returns:
+        str: Success message
+    """
+
+    subject, text, html = render_notification(notification)
+    return send_email([notification['Email']], ADMIN_EMAILS, text, subject, html_message=html)
+
+
+def write_and_notify(transact_items: list[dict], notification: Notification) -> None:
+    """
+    Applies business writes and delivers the matching notification.
+
+    In 'outbox' mode, the writes and the notification record are committed in one
+    transaction and the worker sends the mail. In 'sync' mode, the mail is sent
+    right after the writes; since they are committed by then, a failed send is
+    logged instead of raised.
+
+    Args:
+        transact_items (list[dict]): The business writes, as TransactWriteItems entries.
+        notification (Notification): The notification to deliver.
+    """
+
+    if NOTIFICATION_MODE == 'outbox':
+        get_outbox().write(notification, transact_items)
+        return
+    write_items(transact_items)
+    try:
+        dispatch_notification(notification)
+    except Exception as e:
+        print(f"Error: notification {notification['NotificationID']} to client {notification['ClientID']} was not sent: {e}")
+
+
+def deliver_notifications(notifications: list[Notification]) -> list[dict]:
+    """
+    Delivers notifications not tied to a single business write (e.g. after a bulk import).
+
+    In 'outbox' mode they are queued with BatchWriteItem; in 'sync' mode they are
+    rendered and sent concurrently through the SES dispatcher.
+
+    Args:
+        notifications (list[Notification]): The notifications to deliver.
+
+    Returns:
+        list[dict]: The failed deliveries, as {'NotificationID', 'error'}.
+    """
+
+    if NOTIFICATION_MODE == 'outbox':
+        get_outbox().write_many(notifications)
+        return []
+
+    messages = []
+    for notification in notifications:
+        subject, text, html = render_notification(notification)
+        messages.append({
+            'to_addresses': [notification['Email']],
+            'bcc_addresses': ADMIN_EMAILS,
+            'body_message': text,
+            'subject_message': subject,
+            'html_message': html,
+        })
+    outcomes = email_dispatcher.send_many(messages)
+    return [
+        {'NotificationID': notification['NotificationID'], 'error': outcome['error']}
+        for notification, outcome in zip(notifications, outcomes)
+        if outcome['status'] != 'SENT'
+    ]
+
+
+def _notification_from_record(record: dict) -> Notification:
+    """
+    Extracts a notification from a DynamoDB Streams or SQS record.
+
+    Args:
+        record (dict): The event record.
+
+    Returns:
+        Notification: The notification, or None for records that carry no new notification.
+    """
+
+    if record.get('eventSource') == 'aws:dynamodb':
+        if record['eventName'] != 'INSERT':
+            return None
+        return _cast_item_dynamodb_to_notification(record['dynamodb']['NewImage'])
+    return json.loads(record['body'])
+
+
+def _record_identifier(record: dict) -> str:
+    return record.get('messageId') or record.get('dynamodb', {}).get('SequenceNumber')
+
+
+def process_notification_records(records: list[dict]) -> list[dict]:
+    """
+    Sends the notifications carried by a batch of stream or queue records.
+
+    Each notification is claimed in the outbox before it is sent, so a redelivered
+    record whose notification was already sent (or is being sent) is skipped.
+    Processing stops at the first failure: that record and every later one are
+    reported, so the stream retries them in order.
+
+    Args:
+        records (list[dict]): The event records.
+
+    Returns:
+        list[dict]: The batch item failures, for partial batch responses.
+    """
+
+    outbox = get_outbox()
+    for position, record in enumerate(records):
+        try:
+            notification = _notification_from_record(record)
+            if notification is None or not outbox.claim(notification['NotificationID']):
+                continue
+            try:
+                dispatch_notification(notification)
+            except Exception:
+                outbox.release(notification['NotificationID'])
+                raise
+            outbox.mark_sent(notification['NotificationID'])
+        except Exception as e:
+            print(f"Error: notification delivery failed, {len(records) - position} records left for retry: {e}")
+            return [{'itemIdentifier': _record_identifier(record)} for record in records[position:]]
+    return []
@@ -0,0 +1,248 @@
+import json
+import time
+from datetime import datetime, timezone
+from typing import TypedDict
+from botocore.exceptions import ClientError
+from env_loader import DYNAMODB_TABLE_OUTBOX_NAME, NOTIFICATION_CLAIM_TIMEOUT
+from services.aws import batch_write_items, get_client, write_items
+
+
+class Notification(TypedDict):
+    NotificationID: str
+    Kind: str
+    ClientID: str
+    Email: str
+    Context: dict
+    CreatedAt: str
+
+
+def _cast_notification_to_item_dynamodb(notification: Notification) -> dict:
+    """
+    Converts a notification to a DynamoDB outbox item.
+
+    Args:
+        notification (Notification): The notification.
+
+    Returns:
+        dict: The DynamoDB item, with a 'PENDING' status.
+    """
+
+    return {
+        'NotificationID': {'S': notification['NotificationID']},
+        'Kind': {'S': notification['Kind']},
+        'ClientID': {'S': str(notification['ClientID'])},
+        'Email': {'S': notification['Email']},
+        'Context': {'S': json.dumps(notification['Context'])},
+        'CreatedAt': {'S': notification['CreatedAt']},
+        'Status': {'S': 'PENDING'},
+    }
+
+
+def _cast_item_dynamodb_to_notification(item: dict) -> Notification:
+    """
+    Converts a DynamoDB outbox item (or stream image) to a notification.
+
+    Args:
+        item (dict): The DynamoDB item.
+
+    Returns:
+        Notification: The notification.
+    """
+
+    return {
+        'NotificationID': item['NotificationID']['S'],
+        'Kind': item['Kind']['S'],
+        'ClientID': item['ClientID']['S'],
+        'Email': item['Email']['S'],
+        'Context': json.loads(item['Context']['S']),
+        'CreatedAt': item['CreatedAt']['S'],
+    }
+
+
+class DynamoDBOutbox:
+    """
+    Outbox stored in a DynamoDB table keyed by 'NotificationID'.
+
+    Notifications are written in the same transaction as the business change, and
+    the worker is triggered by the table's stream (or by SQS fed from it). The
+    worker claims a notification (PENDING to SENDING) before sending it, so a
+    redelivered record is not sent twice; a claim left by a crashed worker can be
+    taken over once it times out.
+
+    Args:
+        table_name (str, optional): The outbox table name.
+        claim_timeout (int, optional): Seconds after which an unfinished claim can be taken over.
+    """
+
+    def __init__(self, table_name=DYNAMODB_TABLE_OUTBOX_NAME, claim_timeout=NOTIFICATION_CLAIM_TIMEOUT):
+        self.table_name = table_name
+        self.claim_timeout = claim_timeout
+
+    def write(self, notification: Notification, transact_items: list[dict]) -> None:
+        """
+        Atomically applies `transact_items` and records the notification.
+
+        Args:
+            notification (Notification): The notification to deliver.
+            transact_items (list[dict]): The business writes, as TransactWriteItems entries.
+        """
+
+        write_items([
+            *transact_items,
+            {'Put': {'TableName': self.table_name, 'Item': _cast_notification_to_item_dynamodb(notification)}},
+        ])
+
+    def write_many(self, notifications: list[Notification]) -> None:
+        """
+        Records notifications in batches, independently of any business write.
+
+        Args:
+            notifications (list[Notification]): The notifications to deliver.
+        """
+
+        batch_write_items(list(map(_cast_notification_to_item_dynamodb, notifications)), self.table_name)
+
+    def claim(self, notification_id: str) -> bool:
+        """
+        Flags a pending notification as being sent.
+
+        Args:
+            notification_id (str): The notification ID.
+
+        Returns:
+            bool: False if the notification was already sent, or is being sent by another worker.
+        """
+
+        now = int(time.time())
+        try:
+            get_client('dynamodb').update_item(
+                TableName=self.table_name,
+                Key={'NotificationID': {'S': notification_id}},
+                UpdateExpression='SET #status = :sending, #claim_expires_at = :claim_expires_at',
+                ConditionExpression='#status = :pending OR (#status = :sending AND #claim_expires_at < :now)',
+                ExpressionAttributeNames={'#status': 'Status', '#claim_expires_at': 'ClaimExpiresAt'},
+                ExpressionAttributeValues={
+                    ':pending': {'S': 'PENDING'},
+                    ':sending': {'S': 'SENDING'},
+                    ':claim_expires_at': {'N': str(now + self.claim_timeout)},
+                    ':now': {'N': str(now)},
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    def release(self, notification_id: str) -> None:
+        """
+        Puts a claimed notification back to pending after a failed send, so it can be retried.
+
+        Args:
+            notification_id (str): The notification ID.
+        """
+
+        try:
+            get_client('dynamodb').update_item(
+                TableName=self.table_name,
+                Key={'NotificationID': {'S': notification_id}},
+                UpdateExpression='SET #status = :pending REMOVE #claim_expires_at',
+                ConditionExpression='#status = :sending',
+                ExpressionAttributeNames={'#status': 'Status', '#claim_expires_at': 'ClaimExpiresAt'},
+                ExpressionAttributeValues={':pending': {'S': 'PENDING'}, ':sending': {'S': 'SENDING'}}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    def mark_sent(self, notification_id: str) -> None:
+        """
+        Flags a notification as delivered.
+
+        Args:
+            notification_id (str): The notification ID.
+        """
+
+        get_client('dynamodb').update_item(
+            TableName=self.table_name,
+            Key={'NotificationID': {'S': notification_id}},
+            UpdateExpression='SET #status = :status, #sent_at = :sent_at REMOVE #claim_expires_at',
+            ExpressionAttributeNames={'#status': 'Status', '#sent_at': 'SentAt', '#claim_expires_at': 'ClaimExpiresAt'},
+            ExpressionAttributeValues={
+                ':status': {'S': 'SENT'},
+                ':sent_at': {'S': datetime.now(timezone.utc).isoformat()},
+            }
+        )
+
+
+class InMemoryOutbox:
+    """
+    Local stand-in for the outbox: business writes still go to DynamoDB (or its fake),
+    notifications are kept in a list that tests drain through the worker.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.sending = set()
+        self.sent = []
+
+    def write(self, notification: Notification, transact_items: list[dict]) -> None:
+        if transact_items:
+            write_items(transact_items)
+        self.pending.append(notification)
+
+    def write_many(self, notifications: list[Notification]) -> None:
+        self.pending.extend(notifications)
+
+    def claim(self, notification_id: str) -> bool:
+        if notification_id in self.sending or notification_id in self.sent:
+            return False
+        self.sending.add(notification_id)
+        return True
+
+    def release(self, notification_id: str) -> None:
+        self.sending.discard(notification_id)
+
+    def mark_sent(self, notification_id: str) -> None:
+        self.sending.discard(notification_id)
+        self.sent.append(notification_id)
+
+    def drain(self) -> list[Notification]:
+        """
+        Removes and returns the pending notifications.
+
+        Returns:
+            list[Notification]: The notifications, oldest first.
+        """
+
+        pending, self.pending = self.pending, []
+        return pending
+
+
+_outbox = None
+
+
+def get_outbox():
+    """
+    Returns the container-wide outbox, creating it on first use.
+
+    Returns:
+        DynamoDBOutbox | InMemoryOutbox: The outbox.
+    """
+
+    global _outbox
+    if _outbox is None:
+        _outbox = DynamoDBOutbox()
+    return _outbox
+
+
+def set_outbox(outbox) -> None:
+    """
+    Replaces the container-wide outbox (e.g. with an InMemoryOutbox in tests).
+
+    Args:
+        outbox (DynamoDBOutbox | InMemoryOutbox): The outbox to use.
+    """
+
+    global _outbox
+    _outbox = outbox
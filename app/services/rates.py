@@ -0,0 +1,299 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from env_loader import (
+    DYNAMODB_TABLE_RATES_NAME,
+    EXCHANGE_RATE_API_URL,
+    EXCHANGE_RATE_RETRY_AFTER,
+    EXCHANGE_RATE_SNAPSHOT_PATH,
+    EXCHANGE_RATE_TIMEOUT,
+    EXCHANGE_RATE_TTL
+)
+from exceptions import CircuitOpen, DeadlineExceeded
+from services.aws import create_item, retrieve_item
+from services.resilience import call_timeout, guard
+from services.telemetry import span
+
+
+class RateProvider(ABC):
+    """
+    Source of exchange rates. Subclasses return every rate quoted against a base currency.
+    """
+
+    @abstractmethod
+    def fetch_rates(self, base: str) -> dict:
+        """
+        Fetches the rates of every known currency against `base`.
+
+        Args:
+            base (str): The base currency code.
+
+        Returns:
+            dict: Currency code to rate, with `rates[base] == 1`.
+
+        Raises:
+            ValueError: If the rates cannot be fetched.
+        """
+
+
+class ExchangeRateApiProvider(RateProvider):
+    """
+    Fetches rates from exchangerate-api.com.
+
+    Calls go through the 'rates' circuit breaker and are cut at the invocation
+    deadline: while the API is down, fetches fail fast and CachedRateProvider
+    serves the last cached or snapshotted rates.
+
+    Args:
+        base_url (str, optional): The API base URL; the base currency is appended to it.
+        timeout (float, optional): Request timeout in seconds.
+    """
+
+    def __init__(self, base_url=EXCHANGE_RATE_API_URL, timeout=EXCHANGE_RATE_TIMEOUT):
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def fetch_rates(self, base: str) -> dict:
+        import requests
+
+        try:
+            with guard('rates'), span('rates.fetch'):
+                response = requests.get(self.base_url + base, timeout=call_timeout(self.timeout, 'rates'))
+                data = response.json()
+        except (requests.RequestException, ValueError, CircuitOpen, DeadlineExceeded) as e:
+            raise ValueError(f"Unable to fetch exchange rates! {e}")
+
+        if 'rates' not in data:
+            raise ValueError("Unable to fetch exchange rates!")
+        return data['rates']
+
+
+class StaticRateProvider(RateProvider):
+    """
+    Serves a fixed rate table, for offline runs and tests.
+
+    Args:
+        rates (dict): Currency code to rate, quoted against `base`.
+        base (str, optional): The currency the table is quoted against (default is "EUR").
+    """
+
+    def __init__(self, rates: dict, base: str = "EUR"):
+        self.rates = {**rates, base: 1.0}
+        self.base = base
+
+    @classmethod
+    def from_file(cls, path: str) -> 'StaticRateProvider':
+        """
+        Loads a fixture of the form {"base": "EUR", "rates": {...}}.
+
+        Args:
+            path (str): Path of the JSON fixture.
+
+        Returns:
+            StaticRateProvider: The provider.
+        """
+
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['rates'], data.get('base', 'EUR'))
+
+    def fetch_rates(self, base: str) -> dict:
+        if base not in self.rates:
+            raise ValueError("Invalid currency!")
+        base_rate = self.rates[base]
+        return {currency: rate / base_rate for currency, rate in self.rates.items()}
+
+
+class FileRateSnapshot:
+    """
+    Persists the last fetched rates to a local JSON file.
+
+    Args:
+        path (str, optional): Path of the snapshot file.
+    """
+
+    def __init__(self, path=EXCHANGE_RATE_SNAPSHOT_PATH):
+        self.path = path
+
+    def load(self, base: str) -> tuple[dict, float]:
+        try:
+            with open(self.path) as f:
+                entry = json.load(f).get(base)
+        except (OSError, ValueError):
+            return None
+        return (entry['rates'], entry['fetched_at']) if entry else None
+
+    def save(self, base: str, rates: dict, fetched_at: float) -> None:
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            snapshot = {}
+        snapshot[base] = {'rates': rates, 'fetched_at': fetched_at}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+
+class DynamoDBRateSnapshot:
+    """
+    Persists the last fetched rates to a DynamoDB table keyed by 'Currency'.
+
+    Args:
+        table_name (str, optional): The DynamoDB table name.
+    """
+
+    def __init__(self, table_name=DYNAMODB_TABLE_RATES_NAME):
+        self.table_name = table_name
+
+    def load(self, base: str) -> tuple[dict, float]:
+        item = retrieve_item(base, self.table_name, key_name='Currency').get('Item')
+        if item is None:
+            return None
+        return json.loads(item['Rates']['S']), float(item['FetchedAt']['N'])
+
+    def save(self, base: str, rates: dict, fetched_at: float) -> None:
+        create_item({
+            'Currency': {'S': base},
+            'Rates': {'S': json.dumps(rates)},
+            'FetchedAt': {'N': str(fetched_at)},
+        }, self.table_name)
+
+
+class CachedRateProvider:
+    """
+    Caches rate tables in memory and derives cross rates locally.
+
+    A table fetched for one base currency answers every pair it contains, so N
+    conversions within `ttl` seconds cost at most one upstream call. When the
+    upstream fails, the last cached or snapshotted table is used instead, without
+    trying the upstream again for `retry_after` seconds. Only one fetch runs at a
+    time; while it runs, callers holding a stale table use it instead of waiting.
+
+    Args:
+        provider (RateProvider): The upstream rate source.
+        ttl (float, optional): Seconds a fetched table is reused.
+        snapshot (FileRateSnapshot | DynamoDBRateSnapshot, optional): Fallback store.
+        retry_after (float, optional): Seconds the fallback is served after a failed fetch.
+    """
+
+    def __init__(self, provider: RateProvider, ttl=EXCHANGE_RATE_TTL, snapshot=None, retry_after=EXCHANGE_RATE_RETRY_AFTER):
+        self.provider = provider
+        self.ttl = ttl
+        self.snapshot = snapshot
+        self.retry_after = retry_after
+        self._tables = {}
+        # Base currency -> time before which a failed fetch is not retried.
+        self._retry_at = {}
+        self._lock = threading.Lock()
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """
+        Returns how many `to_currency` one `from_currency` is worth.
+
+        Args:
+            from_currency (str): The source currency code.
+            to_currency (str): The target currency code.
+
+        Returns:
+            float: The conversion rate.
+
+        Raises:
+            ValueError: If a currency is unknown or no rates are available.
+        """
+
+        if from_currency == to_currency:
+            return 1.0
+        rates = self._fresh_table(from_currency, to_currency) or self._refresh(from_currency)
+        if from_currency not in rates or to_currency not in rates:
+            raise ValueError("Invalid currency!")
+        return rates[to_currency] / rates[from_currency]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+            self._retry_at.clear()
+
+    def _fresh_table(self, *currencies) -> dict:
+        now = time.time()
+        for rates, fetched_at in self._tables.values():
+            if now - fetched_at < self.ttl and all(currency in rates for currency in currencies):
+                return rates
+        return None
+
+    def _load_snapshot(self, base: str) -> tuple[dict, float]:
+        if self.snapshot is None:
+            return None
+        try:
+            return self.snapshot.load(base)
+        except Exception as e:
+            print(f"Error: unable to load exchange rate snapshot: {e}")
+            return None
+
+    def _refresh(self, base: str) -> dict:
+        entry = self._tables.get(base)
+        if entry and time.time() < self._retry_at.get(base, 0):
+            return entry[0]
+        # A stale table is served rather than waiting for another caller's fetch.
+        if not self._lock.acquire(blocking=entry is None):
+            return entry[0]
+        try:
+            entry = self._tables.get(base)
+            now = time.time()
+            if entry and (now - entry[1] < self.ttl or now < self._retry_at.get(base, 0)):
+                return entry[0]
+            try:
+                rates = self.provider.fetch_rates(base)
+            except ValueError as e:
+                fallback = entry or self._load_snapshot(base)
+                if fallback is None:
+                    raise
+                print(f"Error: {e} Using rates fetched at {fallback[1]} for the next {self.retry_after}s.")
+                self._tables[base] = fallback
+                self._retry_at[base] = time.time() + self.retry_after
+                return fallback[0]
+            fetched_at = time.time()
+            self._tables[base] = (rates, fetched_at)
+            self._retry_at.pop(base, None)
+        finally:
+            self._lock.release()
+        if self.snapshot:
+            try:
+                self.snapshot.save(base, rates, fetched_at)
+            except Exception as e:
+                print(f"Error: unable to save exchange rate snapshot: {e}")
+        return rates
+
+
+_rate_provider = None
+
+
+def get_rate_provider() -> CachedRateProvider:
+    """
+    Returns the container-wide rate provider, creating it on first use.
+
+    Returns:
+        CachedRateProvider: The shared provider.
+    """
+
+    global _rate_provider
+    if _rate_provider is None:
+        snapshot = DynamoDBRateSnapshot() if DYNAMODB_TABLE_RATES_NAME else FileRateSnapshot()
+        _rate_provider = CachedRateProvider(ExchangeRateApiProvider(), snapshot=snapshot)
+    return _rate_provider
+
+
+def set_rate_provider(provider) -> None:
+    """
+    Replaces the container-wide rate provider (e.g. with a StaticRateProvider in tests).
+
+    Args:
+        provider (RateProvider | CachedRateProvider): The provider to use. Plain
+            providers are wrapped in a CachedRateProvider without snapshot.
+    """
+
+    global _rate_provider
+    _rate_provider = provider if isinstance(provider, CachedRateProvider) else CachedRateProvider(provider)
@@ -0,0 +1,312 @@
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterator
+from env_loader import DYNAMODB_TABLE_AGGREGATE_NAME, REPORT_SHARDS
+from codec import ClientDetails
+from services.aws import get_client, query_items
+from services.history import Reload, _legacy_reload_timestamps
+
+
+# Metrics of the aggregate table (its partition key).
+CLIENTS = 'CLIENTS'
+RELOADS = 'RELOADS'
+# Bucket of the CLIENTS metric: the totals over every client.
+TOTAL = 'TOTAL'
+# Client attributes counted in the CLIENTS totals.
+CLIENT_FIELDS = ['ClientID', 'Limit', 'Spend', 'CardLimitReached']
+
+
+class ReportDelta:
+    """
+    Increments of the report counters caused by one or more writes, merged per bucket.
+
+    The counters live in the aggregate table, keyed by 'Metric' and 'Bucket':
+
+    - ('CLIENTS', 'TOTAL#<shard>'): Clients, Limit, Spend, and CardLimitReached
+      (the number of clients whose CardLimitReached is above 0);
+    - ('RELOADS', '<YYYY-MM-DD>#<PaymentMethod>#<shard>'): Count and Amount of the
+      reloads of the day.
+
+    Each bucket is spread over REPORT_SHARDS items so that concurrent writes rarely
+    update the same item; readers sum the shards.
+
+    The CLIENTS totals follow the client table stream (`process_client_records`),
+    since Spend and CardLimitReached are written by the card processor, not by
+    this function. The RELOADS counters are written with the reloads.
+    """
+
+    def __init__(self):
+        # (metric, bucket) -> {counter: increment}
+        self.buckets = {}
+
+    def add(self, metric: str, bucket: str, **increments) -> 'ReportDelta':
+        counters = self.buckets.setdefault((metric, bucket), {})
+        for name, increment in increments.items():
+            counters[name] = counters.get(name, 0) + Decimal(str(increment))
+        return self
+
+    def client_added(self, client: ClientDetails, sign: int = 1) -> 'ReportDelta':
+        """
+        Counts a client in the totals (a new client, or a client read by the rebuild).
+
+        Args:
+            client (ClientDetails): The client, with 'Limit', 'Spend' and 'CardLimitReached'.
+            sign (int, optional): -1 to take the client out of the totals instead.
+        """
+
+        return self.add(
+            CLIENTS, TOTAL,
+            Clients=sign,
+            Limit=sign * client.get('Limit', 0),
+            Spend=sign * client.get('Spend', 0),
+            CardLimitReached=sign * int(client.get('CardLimitReached', 0) > 0)
+        )
+
+    def client_changed(self, old: ClientDetails = None, new: ClientDetails = None) -> 'ReportDelta':
+        """
+        Counts a change of a client item: the old values leave the totals, the new ones enter.
+
+        Args:
+            old (ClientDetails, optional): The item before the change; None when created.
+            new (ClientDetails, optional): The item after the change; None when deleted.
+        """
+
+        if old is not None:
+            self.client_added(old, -1)
+        if new is not None:
+            self.client_added(new)
+        return self
+
+    def reloaded(self, reload: Reload) -> 'ReportDelta':
+        """
+        Counts a reload in the bucket of its day and payment method.
+
+        Args:
+            reload (Reload): The reload event.
+        """
+
+        return self.add(RELOADS, f"{reload['ReloadedAt'][:10]}#{reload['PaymentMethod']}", Count=1, Amount=reload['Amount'])
+
+    def update_requests(self, shard: int = None) -> list[dict]:
+        """
+        Builds the writes adding the increments to the counters.
+
+        Args:
+            shard (int, optional): The shard written (default is a random one).
+
+        Returns:
+            list[dict]: TransactWriteItems 'Update' entries, one per bucket; empty
+                when reports are disabled (no aggregate table).
+        """
+
+        if not DYNAMODB_TABLE_AGGREGATE_NAME:
+            return []
+        shard = random.randrange(REPORT_SHARDS) if shard is None else shard
+        requests = []
+        for (metric, bucket), counters in self.buckets.items():
+            counters = [(name, increment) for name, increment in counters.items() if increment]
+            if not counters:
+                continue
+            requests.append({'Update': {
+                'TableName': DYNAMODB_TABLE_AGGREGATE_NAME,
+                'Key': {'Metric': {'S': metric}, 'Bucket': {'S': f'{bucket}#{shard}'}},
+                'UpdateExpression': 'ADD ' + ', '.join(f'#c{index} :c{index}' for index in range(len(counters))),
+                'ExpressionAttributeNames': {f'#c{index}': name for index, (name, _) in enumerate(counters)},
+                'ExpressionAttributeValues': {f':c{index}': {'N': str(increment)} for index, (_, increment) in enumerate(counters)},
+            }})
+        return requests
+
+    def apply(self, shard: int = None) -> None:
+        """
+        Adds the increments outside of any transaction, one UpdateItem per bucket.
+
+        Used by the bulk actions and the rebuild, whose own writes are not transactional either.
+
+        Args:
+            shard (int, optional): The shard written (default is a random one).
+        """
+
+        dynamodb_client = get_client('dynamodb')
+        for request in self.update_requests(shard):
+            dynamodb_client.update_item(**request['Update'])
+
+
+def process_client_records(records: list[dict]) -> list[dict]:
+    """
+    Maintains the CLIENTS totals from a batch of client table stream records (NEW_AND_OLD_IMAGES).
+
+    The changes of the batch are merged into one increment of the totals, written
+    with a single UpdateItem: the batch is counted entirely or not at all, and a
+    failed batch is retried whole. Only a write that succeeds but times out before
+    its answer can be counted twice; REBUILD_REPORT recomputes the totals.
+
+    Args:
+        records (list[dict]): The stream records.
+
+    Returns:
+        list[dict]: The batch item failures, for partial batch responses.
+    """
+
+    report = ReportDelta()
+    for record in records:
+        images = record['dynamodb']
+        report.client_changed(
+            ClientDetails.from_item(images['OldImage'], CLIENT_FIELDS) if 'OldImage' in images else None,
+            ClientDetails.from_item(images['NewImage'], CLIENT_FIELDS) if 'NewImage' in images else None
+        )
+    try:
+        report.apply()
+    except Exception as e:
+        print(f"Error: client totals of {len(records)} stream records not updated, retrying the batch: {e}")
+        return [{'itemIdentifier': record['dynamodb']['SequenceNumber']} for record in records]
+    return []
+
+
+def legacy_reloads(client: ClientDetails) -> Iterator[Reload]:
+    """
+    Yields the reloads still stored on a client item, with the ReloadedAt the migration assigns them.
+
+    Args:
+        client (ClientDetails): The client, with 'ClientID' and 'ReloadingHistory'.
+
+    Yields:
+        Reload: Each legacy reload.
+    """
+
+    legacy_history = client['ReloadingHistory']
+    for reload, reloaded_at in zip(legacy_history, _legacy_reload_timestamps(legacy_history)):
+        yield {**reload, 'clientID': client['ClientID'], 'ReloadedAt': reload.get('ReloadedAt', reloaded_at)}
+
+
+def clear_report() -> int:
+    """
+    Deletes every counter of the aggregate table, before a rebuild.
+
+    Returns:
+        int: The number of items deleted.
+    """
+
+    dynamodb_client = get_client('dynamodb')
+    deleted = 0
+    for metric in (CLIENTS, RELOADS):
+        for bucket, _ in _query_buckets(metric, raw=True):
+            dynamodb_client.delete_item(
+                TableName=DYNAMODB_TABLE_AGGREGATE_NAME,
+                Key={'Metric': {'S': metric}, 'Bucket': {'S': bucket}}
+            )
+            deleted += 1
+    return deleted
+
+
+def _query_buckets(metric: str, since: str = None, until: str = None, raw: bool = False) -> Iterator[tuple[str, dict]]:
+    """
+    Reads the counters of a metric, optionally for a range of days.
+
+    Args:
+        metric (str): CLIENTS or RELOADS.
+        since (str, optional): First day included ('YYYY-MM-DD').
+        until (str, optional): Last day included ('YYYY-MM-DD').
+        raw (bool, optional): Yield the stored bucket, shard suffix included.
+
+    Yields:
+        tuple[str, dict]: The bucket (without its shard unless `raw`) and its counters.
+    """
+
+    key_condition = '#metric = :metric'
+    attribute_names = {'#metric': 'Metric'}
+    attribute_values = {':metric': {'S': metric}}
+    if since or until:
+        attribute_names['#bucket'] = 'Bucket'
+    if since:
+        attribute_values[':since'] = {'S': since}
+    if until:
+        # Buckets start with their day: every bucket of `until` sorts before the next day.
+        attribute_values[':before'] = {'S': (date.fromisoformat(until) + timedelta(days=1)).isoformat()}
+    if since and until:
+        key_condition += ' AND #bucket BETWEEN :since AND :before'
+    elif since:
+        key_condition += ' AND #bucket >= :since'
+    elif until:
+        key_condition += ' AND #bucket < :before'
+
+    start_key = None
+    while True:
+        page = query_items(key_condition, attribute_names, attribute_values, DYNAMODB_TABLE_AGGREGATE_NAME, start_key=start_key)
+        for item in page['Items']:
+            bucket = item['Bucket']['S']
+            counters = {name: Decimal(value['N']) for name, value in item.items() if 'N' in value}
+            yield (bucket if raw else bucket.rsplit('#', 1)[0]), counters
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            break
+
+
+def _validate_day(value: str) -> str:
+    if value:
+        date.fromisoformat(value)
+    return value
+
+
+def report_summary(since: str = None, until: str = None) -> dict:
+    """
+    Returns the admin dashboard totals from the pre-aggregated counters.
+
+    The client totals are current values; the reload volume covers the requested
+    days. The cost depends on the number of buckets read, not on the number of
+    clients or reloads.
+
+    Args:
+        since (str, optional): First day of the reload volume ('YYYY-MM-DD').
+        until (str, optional): Last day of the reload volume ('YYYY-MM-DD').
+
+    Returns:
+        dict: The HTTP response with 'Clients', 'Limit', 'Spend', 'Balance',
+            'CardLimitReached' and 'Reloads' (totals, per payment method and per day).
+    """
+
+    if not DYNAMODB_TABLE_AGGREGATE_NAME:
+        return {'statusCode': 400, 'body': json.dumps({'message': 'Reports are not enabled.'})}
+    try:
+        since, until = _validate_day(since), _validate_day(until)
+    except ValueError:
+        return {'statusCode': 400, 'body': json.dumps({'message': 'From and To must be dates (YYYY-MM-DD).'})}
+
+    totals = dict.fromkeys(('Clients', 'Limit', 'Spend', 'CardLimitReached'), Decimal(0))
+    for _, counters in _query_buckets(CLIENTS):
+        for name in totals:
+            totals[name] += counters.get(name, 0)
+
+    reloads = {'Count': 0, 'Amount': Decimal(0)}
+    per_method, per_day = {}, {}
+    for bucket, counters in _query_buckets(RELOADS, since, until):
+        day, payment_method = bucket.split('#', 1)
+        for summary in (reloads, per_method.setdefault(payment_method, {'Count': 0, 'Amount': Decimal(0)}), per_day.setdefault((day, payment_method), {'Count': 0, 'Amount': Decimal(0)})):
+            summary['Count'] += int(counters.get('Count', 0))
+            summary['Amount'] += counters.get('Amount', 0)
+
+    def money(value: Decimal) -> float:
+        return float(round(value, 2))
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'Clients': int(totals['Clients']),
+            'Limit': money(totals['Limit']),
+            'Spend': money(totals['Spend']),
+            'Balance': money(totals['Limit'] - totals['Spend']),
+            'CardLimitReached': int(totals['CardLimitReached']),
+            'Reloads': {
+                'From': since,
+                'To': until,
+                'Count': reloads['Count'],
+                'Amount': money(reloads['Amount']),
+                'ByPaymentMethod': {method: {'Count': summary['Count'], 'Amount': money(summary['Amount'])} for method, summary in sorted(per_method.items())},
+                'ByDay': [
+                    {'Day': day, 'PaymentMethod': method, 'Count': summary['Count'], 'Amount': money(summary['Amount'])}
+                    for (day, method), summary in sorted(per_day.items())
+                ],
+            },
+        }),
+    }
@@ -0,0 +1,438 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from env_loader import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, RESILIENCE_DEADLINE_MARGIN_MS, RESILIENCE_MIN_ATTEMPT_MS
+from exceptions import CircuitOpen, DeadlineExceeded
+from services.telemetry import count
+
+
+# Error codes of a dependency that is down or overloaded, as opposed to a request it rejected.
+UNAVAILABLE_ERRORS = {
+    'InternalFailure',
+    'InternalServerError',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+}
+
+# Operations that may change the state of a dependency (see `GuardedClient.writes`).
+WRITE_OPERATIONS = frozenset({
+    'batch_write_item',
+    'delete_item',
+    'put_item',
+    'transact_write_items',
+    'update_item',
+    'send_bulk_templated_email',
+    'send_email',
+    'send_raw_email',
+    'send_templated_email',
+})
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+# Monotonic time by which the current invocation must have made its last call; None outside the handler.
+_deadline = None
+
+
+def with_deadline(handler):
+    """
+    Wraps a Lambda handler: gives the invocation a deadline from the Lambda context,
+    and reports the state of every circuit as metrics when it ends.
+
+    The deadline keeps RESILIENCE_DEADLINE_MARGIN_MS of the remaining time back, so a
+    call refused or cut at the deadline still leaves time to answer.
+    """
+
+    @wraps(handler)
+    def wrapper(event, context):
+        global _deadline
+        remaining_ms = context.get_remaining_time_in_millis() if context is not None else None
+        _deadline = None if remaining_ms is None else time.monotonic() + (remaining_ms - RESILIENCE_DEADLINE_MARGIN_MS) / 1000
+        try:
+            return handler(event, context)
+        finally:
+            _deadline = None
+            for breaker in breakers():
+                breaker.report()
+    return wrapper
+
+
+def remaining() -> float:
+    """
+    Returns the seconds left before the deadline of the current invocation.
+
+    Returns:
+        float: The time left (negative once passed), or None outside the handler.
+    """
+
+    return None if _deadline is None else _deadline - time.monotonic()
+
+
+def call_timeout(timeout: float = None, dependency: str = None) -> float:
+    """
+    Cuts the timeout of a call to the time left in the invocation.
+
+    Args:
+        timeout (float, optional): The timeout of the call in seconds (default is none).
+        dependency (str, optional): The dependency called, reported in the error.
+
+    Returns:
+        float: The timeout to use; `timeout` itself outside the handler.
+
+    Raises:
+        DeadlineExceeded: If no time is left for the call.
+    """
+
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        count('deadline.exceeded')
+        raise DeadlineExceeded(dependency)
+    return left if timeout is None else min(timeout, left)
+
+
+def retry_fits(delay: float) -> bool:
+    """
+    Tells whether a retry after a backoff still leaves time for an attempt before the deadline.
+
+    Args:
+        delay (float): The backoff before the retry, in seconds.
+
+    Returns:
+        bool: False if the backoff and RESILIENCE_MIN_ATTEMPT_MS do not fit in the time left; True outside the handler.
+    """
+
+    left = remaining()
+    if left is None or left >= delay + RESILIENCE_MIN_ATTEMPT_MS / 1000:
+        return True
+    count('deadline.retry_skipped')
+    return False
+
+
+def _bound_to_deadline(client) -> None:
+    # urllib3 clones the timeout of a botocore client for each attempt: the clones
+    # get the time left as their total, which cuts the connect and read timeouts.
+    timeout = getattr(getattr(getattr(client, '_endpoint', None), 'http_session', None), '_timeout', None)
+    if timeout is None:
+        return
+
+    from urllib3.util import Timeout
+
+    connect, read = timeout.connect_timeout, timeout.read_timeout
+
+    def clone():
+        left = remaining()
+        return Timeout(connect=connect, read=read, total=None if left is None else max(left, 0.001))
+    timeout.clone = clone
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one dependency, shared by every call of the container.
+
+    After `failure_threshold` consecutive failures the circuit opens: calls fail
+    fast with CircuitOpen instead of waiting on a dependency that is down. After
+    `reset_timeout` seconds a single trial call is let through (half-open); its
+    success closes the circuit, its failure opens it again. Rejected requests
+    (conditional check failures, validation errors...) are not failures.
+
+    Args:
+        name (str): The dependency (e.g. 'dynamodb:<table>', 'ses', 'rates').
+        failure_threshold (int, optional): Consecutive failures opening the circuit.
+        reset_timeout (float, optional): Seconds the circuit stays open before a trial call.
+    """
+
+    def __init__(self, name: str, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._rejected = 0
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Lets a call through or refuses it.
+
+        Returns:
+            bool: Whether the call is the trial call of a half-open circuit.
+
+        Raises:
+            CircuitOpen: If the circuit is open, or half-open with its trial call in flight.
+        """
+
+        with self._lock:
+            if self.state == OPEN:
+                wait = self.opened_at + self.reset_timeout - time.monotonic()
+                if wait > 0:
+                    self._reject(wait)
+                self.state = HALF_OPEN
+                print(f"Info: circuit of {self.name} half-open, letting a trial call through.")
+            if self.state == HALF_OPEN:
+                if self._trial:
+                    self._reject(self.reset_timeout)
+                self._trial = True
+                return True
+            return False
+
+    def record(self, failed: bool, trial: bool = False) -> None:
+        """
+        Records the outcome of a call let through by `before_call`.
+
+        Args:
+            failed (bool): Whether the dependency failed; None when the call had no outcome (e.g. cancelled).
+            trial (bool, optional): What `before_call` returned for the call.
+        """
+
+        with self._lock:
+            if trial:
+                self._trial = False
+            if failed is None:
+                return
+            if not failed:
+                if self.state != CLOSED:
+                    print(f"Info: circuit of {self.name} closed.")
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            count(f'circuit.{self.name}.failures')
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self._opened += 1
+                    count(f'circuit.{self.name}.opened')
+                    print(f"Error: circuit of {self.name} opened after {self.failures} consecutive failures, failing fast for {self.reset_timeout}s.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        """
+        Returns the state and counters of the circuit.
+
+        Returns:
+            dict: The state, consecutive failures, and the calls refused and openings since the container started.
+        """
+
+        return {'state': self.state, 'failures': self.failures, 'rejected': self._rejected, 'opened': self._opened}
+
+    def report(self) -> None:
+        # One 'circuit.<name>.open' count per invocation: 1 while the circuit is not closed.
+        count(f'circuit.{self.name}.open', int(self.state != CLOSED))
+
+    def _reject(self, retry_after: float):
+        self._rejected += 1
+        count(f'circuit.{self.name}.rejected')
+        raise CircuitOpen(self.name, retry_after)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Returns the circuit breaker of a dependency, creating it on first use.
+
+    Args:
+        name (str): The dependency (e.g. 'ses').
+
+    Returns:
+        CircuitBreaker: The shared breaker.
+    """
+
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def breakers() -> list[CircuitBreaker]:
+    """
+    Returns the circuit breakers created so far.
+    """
+
+    return list(_breakers.values())
+
+
+def reset_breakers() -> None:
+    """
+    Forgets every circuit breaker, so the next calls start with closed circuits.
+    """
+
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def _is_failure(error: Exception) -> bool:
+    if isinstance(error, (CircuitOpen, DeadlineExceeded)):
+        return False
+    # botocore ClientError: only throttling and server errors count against the dependency.
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict) and 'Error' in response:
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return response['Error'].get('Code') in UNAVAILABLE_ERRORS or status >= 500
+    # Timeouts, connection errors, unreadable responses...
+    return True
+
+
+def call_dependency(service: str, params: dict) -> str:
+    """
+    Names the dependency of an API call: the service, plus the DynamoDB table it targets.
+
+    A throttled table (e.g. the history table during a job) then opens its own
+    circuit, and the calls to the other tables keep going through.
+
+    Args:
+        service (str): The service (e.g. 'dynamodb').
+        params (dict): The parameters of the call.
+
+    Returns:
+        str: 'service:table', or the service for calls without a table.
+    """
+
+    table = params.get('TableName')
+    if table is None and params.get('RequestItems'):
+        table = next(iter(params['RequestItems']))
+    if table is None and params.get('TransactItems'):
+        # A transaction is keyed by the table of its first write, the business one.
+        table = next(iter(params['TransactItems'][0].values())).get('TableName')
+    return f'{service}:{table}' if table else service
+
+
+@contextmanager
+def guard(dependency: str):
+    """
+    Runs one call to a dependency under its circuit breaker and the invocation deadline.
+
+    Args:
+        dependency (str): The dependency (e.g. 'rates').
+
+    Raises:
+        CircuitOpen: If the circuit of the dependency is open.
+        DeadlineExceeded: If no time is left for the call.
+    """
+
+    call_timeout(dependency=dependency)
+    breaker = get_breaker(dependency)
+    trial = breaker.before_call()
+    failed = None
+    try:
+        yield
+        failed = False
+    except Exception as e:
+        failed = _is_failure(e)
+        raise
+    finally:
+        breaker.record(failed, trial)
+
+
+class GuardedClient:
+    """
+    Wraps a client so that every API call goes through `guard` for its dependency:
+    the service, or the service and table for DynamoDB (see `call_dependency`).
+
+    botocore clients are also held to the deadline: the connect and read timeouts
+    of each attempt are cut to the time left, a retry whose worst-case backoff and
+    RESILIENCE_MIN_ATTEMPT_MS no longer fit raises the last error instead (see
+    `retry_fits`), and an attempt that would start after the deadline raises
+    DeadlineExceeded, which botocore does not retry.
+
+    `writes` counts the calls of WRITE_OPERATIONS that may have been applied: those
+    that succeeded, and those that failed without an answer from the service
+    (e.g. a timeout). A request can so tell whether it changed anything.
+
+    Args:
+        dependency (str): The service (e.g. 'dynamodb').
+        client: The boto3 client (or a fake).
+    """
+
+    def __init__(self, dependency: str, client):
+        self.dependency = dependency
+        self.client = client
+        self.writes = 0
+        self._writes_lock = threading.Lock()
+        events = getattr(getattr(client, 'meta', None), 'events', None)
+        if events is not None:
+            events.register('before-send.*.*', self._before_send)
+            events.register_first('needs-retry.*.*', self._needs_retry)
+            _bound_to_deadline(client)
+
+    def _before_send(self, **kwargs) -> None:
+        call_timeout(dependency=self.dependency)
+
+    def _needs_retry(self, attempts: int, operation, response=None, caught_exception=None, **kwargs) -> None:
+        # Runs before the retry handler of botocore, which sleeps up to 2 ** (attempts - 1)
+        # seconds (20 at most) before retrying timeouts, connection errors, throttling
+        # and server errors.
+        if caught_exception is None:
+            parsed = response[1]
+            status = parsed.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+            if parsed.get('Error', {}).get('Code') not in UNAVAILABLE_ERRORS and status < 500:
+                return None
+        if attempts >= (self.client.meta.config.retries or {}).get('total_max_attempts', 1) or retry_fits(min(2 ** (attempts - 1), 20)):
+            return None
+        if caught_exception is not None:
+            raise caught_exception
+        # The error botocore raises once it stops retrying.
+        raise self.client.exceptions.from_code(response[1]['Error'].get('Code'))(response[1], operation.name)
+
+    def _wrote(self) -> None:
+        with self._writes_lock:
+            self.writes += 1
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.client, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        if name in WRITE_OPERATIONS:
+            @wraps(attribute)
+            def call(*args, **kwargs):
+                with guard(call_dependency(self.dependency, kwargs)):
+                    try:
+                        response = attribute(*args, **kwargs)
+                    except Exception as e:
+                        # An error response (ClientError) means the service did not apply the call.
+                        if not isinstance(getattr(e, 'response', None), dict):
+                            self._wrote()
+                        raise
+                    self._wrote()
+                    return response
+            self.__dict__[name] = call
+            return call
+
+        @wraps(attribute)
+        def call(*args, **kwargs):
+            with guard(call_dependency(self.dependency, kwargs)):
+                return attribute(*args, **kwargs)
+        # Later lookups find the wrapper without going through __getattr__.
+        self.__dict__[name] = call
+        return call
+
+
+def guarded(dependency: str, client):
+    """
+    Wraps a client in a GuardedClient, unless it already is one.
+
+    Args:
+        dependency (str): The dependency (e.g. 'dynamodb').
+        client: The client.
+
+    Returns:
+        GuardedClient: The wrapped client.
+    """
+
+    return client if isinstance(client, GuardedClient) else GuardedClient(dependency, client)
@@ -0,0 +1,160 @@
+import hmac
+import threading
+import time
+from env_loader import (
+    SECRET_CACHE_REFRESH_MARGIN,
+    SECRET_CACHE_TTL,
+    SECRET_CLIENT_NAME,
+    SECRET_ROTATION_CHECK_INTERVAL
+)
+from services.aws import retrieve_secret_current_version, retrieve_secret_version
+
+
+class SecretCache:
+    """
+    Keeps a Secrets Manager secret in memory for the lifetime of a warm container.
+
+    The value is served from memory until it expires. Once it enters the refresh
+    margin, a background thread reloads it so callers never wait on Secrets Manager.
+    When a key is rotated, `reload_if_rotated` compares the AWSCURRENT version with
+    the cached one and reloads only if it changed. If Secrets Manager cannot be
+    reached (e.g. its circuit is open), an expired value keeps being served.
+
+    Args:
+        secret_id (str): The name or ARN of the secret.
+        ttl (float): Seconds a loaded value stays valid.
+        refresh_margin (float): Seconds before expiry a background refresh starts.
+        rotation_check_interval (float): Minimum seconds between two rotation checks.
+    """
+
+    def __init__(self, secret_id=SECRET_CLIENT_NAME, ttl=SECRET_CACHE_TTL, refresh_margin=SECRET_CACHE_REFRESH_MARGIN, rotation_check_interval=SECRET_ROTATION_CHECK_INTERVAL):
+        self.secret_id = secret_id
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.rotation_check_interval = rotation_check_interval
+        self._lock = threading.Lock()
+        self._value = None
+        self._version_id = None
+        self._loaded_at = 0.0
+        self._last_rotation_check = 0.0
+        self._refreshing = False
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._rotations = 0
+
+    def get(self) -> dict:
+        """
+        Returns the secret, loading it synchronously only if it is missing or expired.
+
+        Returns:
+            dict: The decoded secret.
+        """
+
+        age = time.monotonic() - self._loaded_at
+        if self._value is None or age >= self.ttl:
+            with self._lock:
+                if self._value is None or time.monotonic() - self._loaded_at >= self.ttl:
+                    self._misses += 1
+                    try:
+                        self._load()
+                    except Exception as e:
+                        if self._value is None:
+                            raise
+                        print(f"Error: secret reload failed, serving the value loaded {age:.0f}s ago: {e}")
+                    return self._value
+        self._hits += 1
+        if age >= self.ttl - self.refresh_margin:
+            self._refresh_in_background()
+        return self._value
+
+    def reload_if_rotated(self) -> bool:
+        """
+        Reloads the secret if its AWSCURRENT version differs from the cached one.
+
+        Checks are throttled by `rotation_check_interval` so that invalid keys cannot
+        turn every request into a Secrets Manager call.
+
+        Returns:
+            bool: True if a new version was loaded.
+        """
+
+        now = time.monotonic()
+        if now - self._last_rotation_check < self.rotation_check_interval:
+            return False
+        with self._lock:
+            if now - self._last_rotation_check < self.rotation_check_interval:
+                return False
+            self._last_rotation_check = now
+            if retrieve_secret_current_version(self.secret_id) == self._version_id:
+                return False
+            self._rotations += 1
+            self._load()
+            return True
+
+    def invalidate(self) -> None:
+        """
+        Forgets the cached value so the next `get` reloads it.
+        """
+
+        with self._lock:
+            self._value = None
+            self._version_id = None
+            self._loaded_at = 0.0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hits, misses, background refreshes and rotation reloads.
+        """
+
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'refreshes': self._refreshes,
+            'rotations': self._rotations,
+        }
+
+    def _load(self) -> None:
+        self._version_id, self._value = retrieve_secret_version(self.secret_id)
+        self._loaded_at = time.monotonic()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self) -> None:
+        try:
+            with self._lock:
+                self._load()
+                self._refreshes += 1
+        except Exception as e:
+            # The current value stays valid until its TTL; the next call retries.
+            print(f"Error: background secret refresh failed: {e}")
+        finally:
+            self._refreshing = False
+
+
+def compare_secret(candidate: str, expected: str) -> bool:
+    """
+    Compares two secret strings in constant time.
+
+    Args:
+        candidate (str): The value supplied by the caller.
+        expected (str): The stored secret.
+
+    Returns:
+        bool: True if both values are equal.
+    """
+
+    if not candidate or not expected:
+        return False
+    return hmac.compare_digest(candidate.encode(), expected.encode())
+
+
+secret_cache = SecretCache()
@@ -0,0 +1,219 @@
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from env_loader import TELEMETRY_DEBUG_SAMPLE_RATE, TELEMETRY_ENABLED, TELEMETRY_NAMESPACE, TELEMETRY_SERVICE
+
+
+# True until the first invocation of the container starts.
+_cold_start = True
+_current = None
+
+
+class Invocation:
+    """
+    Timings of one Lambda invocation, emitted as a single CloudWatch Embedded Metric Format log line.
+
+    Spans with the same name are summed (e.g. every 'dynamodb.GetItem' of the
+    invocation) and reported with their call count; counts (e.g. calls refused by
+    a circuit breaker) are summed likewise. Spans may be recorded from worker
+    threads (SES dispatcher, parallel scans).
+
+    Args:
+        context (LambdaContext, optional): The Lambda context.
+        cold_start (bool): Whether this is the first invocation of the container.
+        sampled (bool): Whether debug logs are written for this invocation.
+    """
+
+    def __init__(self, context=None, cold_start: bool = False, sampled: bool = False):
+        self.request_id = getattr(context, 'aws_request_id', None)
+        self.cold_start = cold_start
+        self.sampled = sampled
+        self.started_at = time.perf_counter()
+        self.tags = {'Action': 'UNKNOWN'}
+        self.spans = {}
+        self.counts = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed_ms: float, failed: bool = False) -> None:
+        with self._lock:
+            total, count, errors = self.spans.get(name, (0.0, 0, 0))
+            self.spans[name] = (total + elapsed_ms, count + 1, errors + failed)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_emf(self) -> dict:
+        """
+        Builds the Embedded Metric Format document of the invocation.
+
+        Returns:
+            dict: The log record, with 'Duration', '<span>' (ms) and '<span>.count' metrics.
+        """
+
+        duration = (time.perf_counter() - self.started_at) * 1000
+        metrics = [{'Name': 'Duration', 'Unit': 'Milliseconds'}, {'Name': 'Errors', 'Unit': 'Count'}]
+        values = {'Duration': round(duration, 3), 'Errors': self.errors}
+        for name, (total, count, errors) in self.spans.items():
+            metrics.append({'Name': name, 'Unit': 'Milliseconds'})
+            metrics.append({'Name': f'{name}.count', 'Unit': 'Count'})
+            values[name] = round(total, 3)
+            values[f'{name}.count'] = count
+            if errors:
+                metrics.append({'Name': f'{name}.errors', 'Unit': 'Count'})
+                values[f'{name}.errors'] = errors
+        for name, value in self.counts.items():
+            metrics.append({'Name': name, 'Unit': 'Count'})
+            values[name] = value
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': TELEMETRY_NAMESPACE,
+                    'Dimensions': [['Service', 'Action'], ['Service', 'Action', 'Start']],
+                    'Metrics': metrics,
+                }],
+            },
+            'Service': TELEMETRY_SERVICE,
+            'Start': 'cold' if self.cold_start else 'warm',
+            'RequestId': self.request_id,
+            **self.tags,
+            **values,
+        }
+
+
+def current() -> Invocation:
+    """
+    Returns the invocation being handled, or None outside the handler.
+    """
+
+    return _current
+
+
+def tag(**tags) -> None:
+    """
+    Adds dimensions or properties to the current invocation (e.g. Action='CARD_RECHARGE').
+    """
+
+    if _current is not None:
+        _current.tags.update(tags)
+
+
+def record(name: str, elapsed_ms: float, failed: bool = False) -> None:
+    """
+    Adds a measured span to the current invocation; ignored outside the handler.
+
+    Args:
+        name (str): The span name, e.g. 'dynamodb.GetItem'.
+        elapsed_ms (float): The span duration in milliseconds.
+        failed (bool, optional): Whether the call raised.
+    """
+
+    if _current is not None:
+        _current.record(name, elapsed_ms, failed)
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+    Adds to a count metric of the current invocation; ignored outside the handler.
+
+    Args:
+        name (str): The metric name, e.g. 'circuit.ses.rejected'.
+        value (int, optional): The increment.
+    """
+
+    if _current is not None:
+        _current.count(name, value)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Times the enclosed block as a span of the current invocation.
+
+    Args:
+        name (str): The span name, e.g. 'rates.fetch'.
+    """
+
+    started_at = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        record(name, (time.perf_counter() - started_at) * 1000, failed)
+
+
+def debug(message: str, **fields) -> None:
+    """
+    Writes a structured debug log line, only for sampled invocations.
+
+    Callers must not pass request bodies or other personal data.
+
+    Args:
+        message (str): The message.
+        **fields: Extra JSON-serializable fields.
+    """
+
+    if _current is not None and _current.sampled:
+        print(json.dumps({'level': 'DEBUG', 'message': message, 'RequestId': _current.request_id, **fields}, default=str))
+
+
+def instrumented(handler):
+    """
+    Wraps a Lambda handler: opens an Invocation, tags cold or warm start, and
+    emits the EMF metrics line when the handler returns or raises.
+    """
+
+    @wraps(handler)
+    def wrapper(event, context):
+        global _cold_start, _current
+        if not TELEMETRY_ENABLED:
+            return handler(event, context)
+
+        invocation = Invocation(context, _cold_start, random.random() < TELEMETRY_DEBUG_SAMPLE_RATE)
+        _cold_start = False
+        _current = invocation
+        try:
+            return handler(event, context)
+        except BaseException:
+            invocation.errors += 1
+            raise
+        finally:
+            _current = None
+            print(json.dumps(invocation.to_emf()))
+    return wrapper
+
+
+def _before_call(context, **kwargs) -> None:
+    context['telemetry_started_at'] = time.perf_counter()
+
+
+def _after_call(event_name, context, parsed=None, exception=None, **kwargs) -> None:
+    # event_name is e.g. 'after-call.dynamodb.GetItem': the span is 'dynamodb.GetItem'.
+    started_at = context.pop('telemetry_started_at', None)
+    if started_at is not None:
+        failed = exception is not None or bool(parsed and 'Error' in parsed)
+        record(event_name.split('.', 1)[1], (time.perf_counter() - started_at) * 1000, failed)
+
+
+def instrument_client(client) -> None:
+    """
+    Records a span for every API call made by a boto3 client ('<service>.<Operation>').
+
+    Args:
+        client: The boto3 client; objects without botocore events (fakes, DAX) are left as is.
+    """
+
+    events = getattr(getattr(client, 'meta', None), 'events', None)
+    if events is None:
+        return
+    events.register('before-call.*.*', _before_call)
+    events.register('after-call.*.*', _after_call)
+    events.register('after-call-error.*.*', _after_call)
@@ -0,0 +1,180 @@
+from html import escape
+from string import Formatter
+from typing import Callable, NamedTuple
+from exceptions import GenerateTemplateFailed
+
+
+# Format spec of fields inserted as is: parts pre-rendered by the caller (e.g. table rows).
+RAW = 'raw'
+
+
+class Template:
+    """
+    A `str.format`-style template parsed once into a render function.
+
+    Fields are `{Name}`, `{Name:<format spec>}` or `{Name:raw}`. In HTML templates
+    every field except raw ones is escaped.
+
+    Args:
+        source (str): The template source.
+        html (bool, optional): Escape the field values for HTML.
+    """
+
+    def __init__(self, source: str, html: bool = False):
+        self.html = html
+        # (literal, field name or None, format spec)
+        self.parts = [(literal, name, spec or '') for literal, name, spec, _ in Formatter().parse(source)]
+        self._render = self._compile()
+
+    @classmethod
+    def _from_parts(cls, parts: list[tuple[str, str, str]], html: bool) -> 'Template':
+        template = cls.__new__(cls)
+        template.html = html
+        template.parts = parts
+        template._render = template._compile()
+        return template
+
+    def _compile(self) -> Callable[[dict], str]:
+        # The parts are resolved once into (literal, name, format spec, escaped)
+        # steps, so rendering does no parsing.
+        steps = tuple(
+            (literal, name, '' if spec == RAW else spec, self.html and spec != RAW)
+            for literal, name, spec in self.parts
+        )
+
+        def render(context: dict) -> str:
+            text = []
+            for literal, name, spec, escaped in steps:
+                text.append(literal)
+                if name is None:
+                    continue
+                value = format(context[name], spec) if spec else str(context[name])
+                text.append(escape(value, False) if escaped else value)
+            return ''.join(text)
+
+        return render
+
+    def render(self, context: dict) -> str:
+        """
+        Renders the template.
+
+        Args:
+            context (dict): The field values.
+
+        Returns:
+            str: The rendered text.
+
+        Raises:
+            GenerateTemplateFailed: If a field is missing or cannot be formatted.
+        """
+
+        try:
+            return self._render(context)
+        except (KeyError, ValueError, TypeError) as e:
+            raise GenerateTemplateFailed(str(e))
+
+    def partial(self, **values) -> 'Template':
+        """
+        Pre-renders some fields, e.g. the values shared by every message of a run.
+
+        Args:
+            **values: The field values to bake into the template.
+
+        Returns:
+            Template: A template with these fields turned into literal text.
+        """
+
+        parts = []
+        for literal, name, spec in self.parts:
+            if name in values:
+                literal += Template._from_parts([('', name, spec)], self.html).render(values)
+                name, spec = None, ''
+            if parts and parts[-1][1] is None:
+                literal = parts.pop()[0] + literal
+            parts.append((literal, name, spec))
+        return Template._from_parts(parts, self.html)
+
+    def to_handlebars(self) -> str:
+        """
+        Converts the template to the Handlebars syntax of SES stored templates.
+
+        Returns:
+            str: The source, with `{{Name}}` fields, or `{{{Name}}}` for raw fields and plain text.
+
+        Raises:
+            ValueError: If a field has a format spec, which SES cannot apply.
+        """
+
+        source = []
+        for literal, name, spec in self.parts:
+            source.append(literal)
+            if name is None:
+                continue
+            if spec not in ('', RAW):
+                raise ValueError(f"Field {name} has a format spec ({spec}): pre-render it with partial() or format the value.")
+            # Handlebars escapes {{Name}} for HTML: plain-text parts use {{{Name}}} throughout.
+            source.append(f'{{{{{{{name}}}}}}}' if spec == RAW or not self.html else f'{{{{{name}}}}}')
+        return ''.join(source)
+
+
+class RenderedMessage(NamedTuple):
+    subject: str
+    text: str
+    html: str
+
+
+class MessageTemplate:
+    """
+    An email template: subject, plain-text body and HTML body.
+
+    Args:
+        subject (str, optional): The subject template.
+        text (str, optional): The plain-text body template.
+        html (str, optional): The HTML body template.
+    """
+
+    def __init__(self, subject: str = '', text: str = '', html: str = ''):
+        self.subject = subject if isinstance(subject, Template) else Template(subject)
+        self.text = text if isinstance(text, Template) else Template(text)
+        self.html = html if isinstance(html, Template) else Template(html, html=True)
+
+    def render(self, context: dict) -> RenderedMessage:
+        """
+        Renders the subject and both bodies.
+
+        Args:
+            context (dict): The field values.
+
+        Returns:
+            RenderedMessage: The subject, text and HTML.
+        """
+
+        return RenderedMessage(self.subject.render(context), self.text.render(context), self.html.render(context))
+
+    def partial(self, **values) -> 'MessageTemplate':
+        """
+        Pre-renders the given fields in the subject and both bodies.
+
+        Returns:
+            MessageTemplate: The partially rendered template.
+        """
+
+        return MessageTemplate(self.subject.partial(**values), self.text.partial(**values), self.html.partial(**values))
+
+    def to_ses(self, name: str) -> dict:
+        """
+        Builds the SES stored template (CreateTemplate/UpdateTemplate 'Template' parameter).
+
+        Args:
+            name (str): The SES template name.
+
+        Returns:
+            dict: The TemplateName, SubjectPart, TextPart and HtmlPart.
+        """
+
+        return {
+            'TemplateName': name,
+            'SubjectPart': self.subject.to_handlebars(),
+            'TextPart': self.text.to_handlebars(),
+            'HtmlPart': self.html.to_handlebars(),
+        }
@@ -0,0 +1,124 @@
+"""
+Micro-benchmark of the client item codec against the hand-written casts it replaced.
+
+Decodes pages of synthetic client items (10k per page by default), as a full-table
+scan does, and prints the best time per page of each case:
+
+    python benchmarks/codec.py [--items 10000] [--history 5] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from codec import ClientDetails  # noqa: E402
+
+
+# The casts of factories.py before the codec, kept here as the baseline.
+
+def _number(attribute: dict) -> float:
+    return float(attribute['N'] if 'N' in attribute else attribute['S'])
+
+
+def legacy_decode(client: dict) -> dict:
+    details = {
+        field: client[field]['S']
+        for field in ('ClientID', 'FirstName', 'LastName', 'Country', 'Email', 'Phone')
+        if field in client
+    }
+    for field in ('Spend', 'Limit', 'CardLimitReached'):
+        if field in client:
+            details[field] = _number(client[field])
+    details['ReloadingHistory'] = json.loads(client['ReloadingHistory']['S']) if 'ReloadingHistory' in client else []
+    return details
+
+
+PROJECTION = ['ClientID', 'Email', 'Limit', 'Spend']
+# The projection of the report rebuild, which reads every legacy history blob.
+HISTORY_PROJECTION = ['ClientID', 'Limit', 'Spend', 'CardLimitReached', 'ReloadingHistory']
+
+
+def make_items(count: int, history: int) -> list[dict]:
+    """
+    Builds client items shaped like the client table, with a legacy history blob.
+
+    Args:
+        count (int): Number of items.
+        history (int): Reloads in each ReloadingHistory blob.
+
+    Returns:
+        list[dict]: The DynamoDB items.
+    """
+
+    rng = random.Random(42)
+    items = []
+    for index in range(count):
+        reloads = [
+            {'clientID': str(index), 'Amount': round(rng.uniform(5, 500), 2), 'PaymentMethod': 'OM', 'Date': f'{rng.randint(1, 28)}/{rng.randint(1, 12)}/2024'}
+            for _ in range(history)
+        ]
+        items.append({
+            'ClientID': {'S': str(index)},
+            'FirstName': {'S': f'First{index}'},
+            'LastName': {'S': f'Last{index}'},
+            'Country': {'S': 'CM'},
+            'Email': {'S': f'client{index}@example.com'},
+            'Phone': {'S': '+237600000000'},
+            'Spend': {'N': f'{rng.uniform(0, 100):.2f}'},
+            'Limit': {'N': f'{rng.uniform(100, 1000):.2f}'},
+            'CardLimitReached': {'N': '0'},
+            'ReloadingHistory': {'S': json.dumps(reloads)},
+        })
+    return items
+
+
+def cases(items: list[dict]) -> dict:
+    return {
+        'decode, all fields': (
+            lambda: [legacy_decode(item) for item in items],
+            lambda: [ClientDetails.from_item(item) for item in items],
+        ),
+        'decode, read history': (
+            lambda: [legacy_decode(item)['ReloadingHistory'] for item in items],
+            lambda: [ClientDetails.from_item(item)['ReloadingHistory'] for item in items],
+        ),
+        'read history, projection': (
+            lambda: [legacy_decode(item)['ReloadingHistory'] for item in items],
+            lambda: [ClientDetails.from_item(item, HISTORY_PROJECTION)['ReloadingHistory'] for item in items],
+        ),
+        'decode, 4-field projection': (
+            lambda: [legacy_decode(item) for item in items],
+            lambda: [ClientDetails.from_item(item, PROJECTION) for item in items],
+        ),
+        'balance of every client': (
+            lambda: [round(client['Limit'] - client['Spend'], 2) for client in map(legacy_decode, items)],
+            lambda: [round(client['Limit'] - client['Spend'], 2) for client in (ClientDetails.from_item(item, PROJECTION) for item in items)],
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000, help='items per page')
+    parser.add_argument('--history', type=int, default=5, help='reloads in each legacy history blob')
+    parser.add_argument('--repeat', type=int, default=5, help='timings per case, the best is kept')
+    args = parser.parse_args()
+
+    items = make_items(args.items, args.history)
+    print(f"{args.items} items per page, {args.history} legacy reloads each (best of {args.repeat}, ms per page)")
+    print(f"{'case':<28}{'casts':>10}{'codec':>10}{'speedup':>10}")
+    for name, (legacy, codec) in cases(items).items():
+        # Alternated, so a noisy machine slows both sides alike.
+        timings = [(timeit.timeit(legacy, number=1), timeit.timeit(codec, number=1)) for _ in range(args.repeat)]
+        legacy_time = min(legacy for legacy, _ in timings) * 1000
+        codec_time = min(codec for _, codec in timings) * 1000
+        print(f"{name:<28}{legacy_time:>10.1f}{codec_time:>10.1f}{legacy_time / codec_time:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
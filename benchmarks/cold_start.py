@@ -0,0 +1,138 @@
+"""
+Measures the cold start of the Lambda handler: module import time and init duration.
+
+Each run starts a fresh interpreter (as a new Lambda container would) and times:
+    - import: `import lambda_function`
+    - route: loading the modules an action needs (a no-op on trees that import everything eagerly)
+    - client: creating the first boto3 client (no network call)
+
+Compare two trees by pointing --app-dir at another checkout, e.g.:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/cold_start.py --app-dir /tmp/before/app
+    python benchmarks/cold_start.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+# Handler names loaded for each route, as listed in lambda_function.LAZY_IMPORTS.
+ROUTES = {
+    'none': [],
+    'worker': ['process_notification_records'],
+    'recharge': ['compare_secret', 'secret_cache', 'fingerprint', 'idempotency_store', 'card_recharge'],
+    'all': None,
+}
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+lazy = getattr(lambda_function, '_lazy', None)
+if lazy is not None:
+    names = {names}
+    for name in (lambda_function.LAZY_IMPORTS if names is None else names):
+        lazy(name)
+routed = time.perf_counter()
+import services.aws as aws
+if hasattr(aws, 'get_client'):
+    aws.get_client('dynamodb')
+else:
+    aws.init_dynamodb_client()
+created = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start,
+    'route': routed - imported,
+    'client': created - routed,
+    'modules': len(sys.modules),
+}}))
+"""
+
+ENVIRONMENT = {
+    'ADMIN_EMAILS': '[]',
+    'COMMERCIAL_EMAILS': '[]',
+    'AWS_REGION': 'eu-west-1',
+    'AWS_DEFAULT_REGION': 'eu-west-1',
+    'AWS_LAMBDA_FUNCTION_NAME': 'cold-start-benchmark',
+}
+
+
+def run_once(app_dir: str, route: str) -> dict:
+    """
+    Times one cold start in a fresh interpreter.
+
+    Args:
+        app_dir (str): The directory holding lambda_function.py.
+        route (str): A key of ROUTES.
+
+    Returns:
+        dict: Seconds spent in each phase, and the number of loaded modules.
+    """
+
+    env = {**os.environ, **ENVIRONMENT, 'PYTHONDONTWRITEBYTECODE': '1'}
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD.format(names=ROUTES[route])],
+        cwd=app_dir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(app_dir: str, top: int) -> list[tuple[int, str]]:
+    """
+    Lists the slowest imports of lambda_function, from `python -X importtime`.
+
+    Args:
+        app_dir (str): The directory holding lambda_function.py.
+        top (int): Number of modules returned.
+
+    Returns:
+        list[tuple[int, str]]: Cumulative microseconds and module name, slowest first.
+    """
+
+    env = {**os.environ, **ENVIRONMENT}
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import lambda_function'],
+        cwd=app_dir, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--app-dir', default=APP_DIR, help='directory holding lambda_function.py')
+    parser.add_argument('--runs', type=int, default=10, help='cold starts per route')
+    parser.add_argument('--route', choices=ROUTES, action='append', help='routes to measure (default: all of them)')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='also list the N slowest imports')
+    args = parser.parse_args()
+
+    print(f"{args.app_dir} ({args.runs} runs, median ms)")
+    print(f"{'route':<10}{'import':>10}{'route':>10}{'client':>10}{'total':>10}{'modules':>10}")
+    for route in args.route or list(ROUTES):
+        runs = [run_once(args.app_dir, route) for _ in range(args.runs)]
+        phases = {phase: statistics.median(run[phase] for run in runs) * 1000 for phase in ('import', 'route', 'client')}
+        total = statistics.median((run['import'] + run['route'] + run['client']) * 1000 for run in runs)
+        modules = max(run['modules'] for run in runs)
+        print(f"{route:<10}{phases['import']:>10.1f}{phases['route']:>10.1f}{phases['client']:>10.1f}{total:>10.1f}{modules:>10}")
+
+    if args.importtime:
+        print("\nSlowest imports of lambda_function (cumulative ms):")
+        for cumulative, name in import_profile(args.app_dir, args.importtime):
+            print(f"{cumulative / 1000:>10.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
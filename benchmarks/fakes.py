@@ -0,0 +1,854 @@
+"""
+In-process fakes of the AWS services and of the exchange-rate API used by the app.
+
+The fakes implement the client methods the app calls, with the same request and
+response shapes as boto3, and raise botocore ClientError the way the services do
+(ConditionalCheckFailedException, TransactionCanceledException with its
+CancellationReasons, ValidationException when ADD meets a string...). Each one
+counts its calls per operation ('dynamodb.GetItem') and can delay or fail calls
+according to a Fault, so the handler can be load-tested offline:
+
+    dynamodb = FakeDynamoDB({'clients': Table('ClientID')}, Fault(latency_ms=4))
+    set_client('dynamodb', dynamodb)
+    set_async_client('dynamodb', AsyncFake(dynamodb))
+
+Stored items are never modified in place (writes replace them), so reads hand
+out the stored dicts without copying them.
+"""
+
+import asyncio
+import contextvars
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+from functools import lru_cache
+from botocore.exceptions import ClientError
+
+
+# Set while AsyncFake runs a call whose fault it already applied.
+_fault_awaited = contextvars.ContextVar('fault_awaited', default=False)
+
+
+class Fault:
+    """
+    Latency and errors injected into the calls of a fake.
+
+    Args:
+        latency_ms (float, optional): Delay added to every call.
+        jitter_ms (float, optional): Uniform random delay added on top of `latency_ms`.
+        error_rate (float, optional): Share of calls failing with `error_code`.
+        error_code (str, optional): The error code of injected failures.
+        seed (int, optional): Seed of the random draws, for repeatable runs.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, error_code: str = 'ThrottlingException', seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self, operation: str) -> tuple[float, ClientError]:
+        """
+        Draws the latency and the error of one call.
+
+        Args:
+            operation (str): The operation name, reported in the error.
+
+        Returns:
+            tuple[float, ClientError]: The delay in seconds, and the error to raise or None.
+        """
+
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms) if self.jitter_ms else self.latency_ms
+            failed = self.error_rate and self._random.random() < self.error_rate
+        return delay / 1000, _error(operation, self.error_code, 'Injected failure.') if failed else None
+
+    def apply(self, operation: str) -> None:
+        """
+        Sleeps for the injected latency, then raises the injected error if drawn.
+
+        Args:
+            operation (str): The operation name, reported in the error.
+
+        Raises:
+            ClientError: For the `error_rate` share of calls.
+        """
+
+        if _fault_awaited.get():
+            return
+        delay, error = self.draw(operation)
+        if delay:
+            time.sleep(delay)
+        if error:
+            raise error
+
+
+def _error(operation: str, code: str, message: str, **response) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}, **response}, operation)
+
+
+class FakeService:
+    """
+    Base of the fakes: call counting and fault injection.
+
+    Args:
+        fault (Fault, optional): Latency and errors injected into every call.
+    """
+
+    service_name = None
+
+    def __init__(self, fault: Fault = None):
+        self.fault = fault or Fault()
+        self.calls = Counter()
+        self._calls_lock = threading.Lock()
+
+    def _call(self, operation: str) -> None:
+        with self._calls_lock:
+            self.calls[f'{self.service_name}.{operation}'] += 1
+        self.fault.apply(operation)
+
+
+class AsyncFake:
+    """
+    Coroutine view of a fake, in the shape of an aioboto3 client (`await client.get_item(...)`),
+    for services/aio.py.
+
+    The injected latency is awaited instead of slept, so concurrent calls overlap
+    as they do over the network; the call itself then runs on the shared fake.
+
+    Args:
+        fake (FakeService): The fake to wrap.
+    """
+
+    def __init__(self, fake: FakeService):
+        self.fake = fake
+
+    def __getattr__(self, name: str):
+        method = getattr(self.fake, name)
+        operation = ''.join(part.title() for part in name.split('_'))
+
+        async def call(**kwargs):
+            delay, error = self.fake.fault.draw(operation)
+            if delay:
+                await asyncio.sleep(delay)
+            token = _fault_awaited.set(True)
+            try:
+                if error:
+                    self.fake._call(operation)
+                    raise error
+                return method(**kwargs)
+            finally:
+                _fault_awaited.reset(token)
+        return call
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB expressions
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r'\s*(?:(<>|<=|>=|[=<>(),+-])|([#:]?[A-Za-z_][A-Za-z0-9_]*))')
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'ADD', 'REMOVE', 'DELETE'}
+
+
+@lru_cache(maxsize=None)
+def _tokenize(expression: str) -> tuple[str, ...]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None:
+            raise ValueError(f'Invalid expression: {expression!r}')
+        token = match.group(1) or match.group(2)
+        tokens.append(token.upper() if token.upper() in _KEYWORDS else token)
+        position = match.end()
+    return tuple(tokens)
+
+
+class _Parser:
+    """
+    Recursive-descent parser of condition, key condition and update expressions.
+
+    Expressions compile to closures taking (item, names, values); attribute
+    values keep their DynamoDB form ({'S': ...}, {'N': ...}).
+    """
+
+    def __init__(self, expression: str):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected: str = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError(f'Expected {expected or "a token"} at {token!r} in {" ".join(self.tokens)!r}')
+        self.position += 1
+        return token
+
+    # Conditions: OR > AND > NOT > comparison / function / parentheses.
+
+    def condition(self):
+        left = self.conjunction()
+        while self.peek() == 'OR':
+            self.take()
+            right = self.conjunction()
+            left = (lambda a, b: lambda *args: a(*args) or b(*args))(left, right)
+        return left
+
+    def conjunction(self):
+        left = self.negation()
+        while self.peek() == 'AND':
+            self.take()
+            right = self.negation()
+            left = (lambda a, b: lambda *args: a(*args) and b(*args))(left, right)
+        return left
+
+    def negation(self):
+        if self.peek() == 'NOT':
+            self.take()
+            operand = self.negation()
+            return lambda *args: not operand(*args)
+        return self.predicate()
+
+    def predicate(self):
+        if self.peek() == '(':
+            self.take()
+            condition = self.condition()
+            self.take(')')
+            return condition
+        if self.peek() in ('attribute_exists', 'attribute_not_exists', 'begins_with'):
+            function = self.take()
+            self.take('(')
+            path = self.operand()
+            if function == 'begins_with':
+                self.take(',')
+                prefix = self.operand()
+                self.take(')')
+                return lambda *args: _begins_with(path(*args), prefix(*args))
+            self.take(')')
+            if function == 'attribute_exists':
+                return lambda *args: path(*args) is not None
+            return lambda *args: path(*args) is None
+        left = self.operand()
+        operator = self.take()
+        if operator == 'BETWEEN':
+            low = self.operand()
+            self.take('AND')
+            high = self.operand()
+            return lambda *args: _compare(low(*args), '<=', left(*args)) and _compare(left(*args), '<=', high(*args))
+        right = self.operand()
+        return lambda *args: _compare(left(*args), operator, right(*args))
+
+    def operand(self):
+        token = self.take()
+        if token.startswith(':'):
+            return lambda item, names, values: values[token]
+        if token == 'if_not_exists':
+            self.take('(')
+            path = self.operand()
+            self.take(',')
+            default = self.operand()
+            self.take(')')
+            return lambda *args: path(*args) if path(*args) is not None else default(*args)
+        if token.startswith('#'):
+            return lambda item, names, values: item.get(names[token])
+        return lambda item, names, values: item.get(token)
+
+    def path(self):
+        token = self.take()
+        return (lambda names: names[token]) if token.startswith('#') else (lambda names: token)
+
+    # Updates: SET path = value [+|- value], ADD path value, REMOVE path.
+
+    def update(self):
+        actions = []
+        while self.peek() is not None:
+            clause = self.take()
+            while True:
+                if clause == 'SET':
+                    actions.append(self._set_action())
+                elif clause == 'ADD':
+                    path, value = self.path(), self.operand()
+                    actions.append(('ADD', path, value))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', self.path(), None))
+                else:
+                    raise ValueError(f'Unsupported update clause {clause!r}')
+                if self.peek() != ',':
+                    break
+                self.take(',')
+        return actions
+
+    def _set_action(self):
+        path = self.path()
+        self.take('=')
+        value = self.operand()
+        if self.peek() in ('+', '-'):
+            operator, right = self.take(), self.operand()
+            left = value
+            value = lambda *args: _arithmetic(left(*args), operator, right(*args))
+        return ('SET', path, value)
+
+
+@lru_cache(maxsize=None)
+def _compile_condition(expression: str):
+    parser = _Parser(expression)
+    condition = parser.condition()
+    if parser.peek() is not None:
+        raise ValueError(f'Unexpected {parser.peek()!r} in {expression!r}')
+    return condition
+
+
+@lru_cache(maxsize=None)
+def _compile_update(expression: str):
+    return _Parser(expression).update()
+
+
+def _scalar(value: dict):
+    if value is None:
+        return None
+    if 'N' in value:
+        return Decimal(value['N'])
+    if 'S' in value:
+        return value['S']
+    return json.dumps(value, sort_keys=True)
+
+
+def _compare(left: dict, operator: str, right: dict) -> bool:
+    if left is None or right is None or left.keys() != right.keys():
+        return operator == '<>' and left != right
+    left, right = _scalar(left), _scalar(right)
+    if operator == '=':
+        return left == right
+    if operator == '<>':
+        return left != right
+    if operator == '<':
+        return left < right
+    if operator == '<=':
+        return left <= right
+    if operator == '>':
+        return left > right
+    if operator == '>=':
+        return left >= right
+    raise ValueError(f'Unsupported operator {operator!r}')
+
+
+def _begins_with(value: dict, prefix: dict) -> bool:
+    return value is not None and 'S' in value and value['S'].startswith(prefix['S'])
+
+
+def _number(value) -> str:
+    return format(value.normalize(), 'f') if value == value.to_integral() else str(value)
+
+
+def _arithmetic(left: dict, operator: str, right: dict) -> dict:
+    if left is None or 'N' not in left or 'N' not in right:
+        raise ValueError('An operand in the update expression has an incorrect data type')
+    result = Decimal(left['N']) + Decimal(right['N']) if operator == '+' else Decimal(left['N']) - Decimal(right['N'])
+    return {'N': _number(result)}
+
+
+def _project(item: dict, projection: str, names: dict) -> dict:
+    if not projection:
+        return item
+    fields = [names.get(field.strip(), field.strip()) for field in projection.split(',')]
+    return {field: item[field] for field in fields if field in item}
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB
+# ---------------------------------------------------------------------------
+
+class Table:
+    """
+    Key schema of a fake table, with its global secondary indexes.
+
+    Args:
+        hash_key (str): The partition key attribute.
+        range_key (str, optional): The sort key attribute.
+        indexes (dict, optional): Index name to (hash_key, range_key or None), optionally
+            followed by the projection: 'ALL' (default), 'KEYS_ONLY', or the list of
+            non-key attributes included.
+    """
+
+    def __init__(self, hash_key: str, range_key: str = None, indexes: dict = None):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = {name: tuple(spec[:2]) for name, spec in (indexes or {}).items()}
+        self.projections = {name: spec[2] if len(spec) > 2 else 'ALL' for name, spec in (indexes or {}).items()}
+        self.items = {}
+        self.version = 0
+        self._order = None
+        self._partitions = {}
+        self._index_items = {name: {} for name in self.indexes}
+
+    def key(self, item: dict) -> tuple:
+        hash_value = item[self.hash_key]['S'] if 'S' in item[self.hash_key] else item[self.hash_key]['N']
+        if self.range_key is None:
+            return (hash_value,)
+        return (hash_value, _scalar(item[self.range_key]))
+
+    def key_attributes(self, item: dict) -> dict:
+        attributes = {self.hash_key: item[self.hash_key]}
+        if self.range_key is not None:
+            attributes[self.range_key] = item[self.range_key]
+        return attributes
+
+    def _index_key(self, name: str, item: dict):
+        # Like DynamoDB, an index only holds the items carrying all its key attributes.
+        hash_key, range_key = self.indexes[name]
+        if hash_key not in item or (range_key is not None and range_key not in item):
+            return None
+        return _scalar(item[hash_key])
+
+    def put(self, item: dict) -> None:
+        key = self.key(item)
+        previous = self.items.get(key)
+        self.items[key] = item
+        if previous is None:
+            self.version += 1
+            if self.range_key is not None:
+                self._partitions.setdefault(key[0], {})[key] = item
+        elif self.range_key is not None:
+            self._partitions[key[0]][key] = item
+        for name, partitions in self._index_items.items():
+            if previous is not None:
+                partitions.get(self._index_key(name, previous), {}).pop(key, None)
+            hash_value = self._index_key(name, item)
+            if hash_value is not None:
+                partitions.setdefault(hash_value, {})[key] = item
+
+    def delete(self, key: tuple) -> dict:
+        item = self.items.pop(key, None)
+        if item is not None:
+            self.version += 1
+            if self.range_key is not None:
+                self._partitions[key[0]].pop(key, None)
+            for name, partitions in self._index_items.items():
+                partitions.get(self._index_key(name, item), {}).pop(key, None)
+        return item
+
+    def order(self) -> tuple[list, dict]:
+        """
+        Returns the keys in scan order, and the position of each key.
+        """
+
+        if self._order is None or self._order[0] != self.version:
+            keys = list(self.items)
+            self._order = (self.version, keys, {key: position for position, key in enumerate(keys)})
+        return self._order[1], self._order[2]
+
+    def index_projection(self, index_name: str, item: dict) -> dict:
+        """
+        Returns the attributes of an item stored in an index: its keys, the index keys, and the included attributes.
+        """
+
+        projection = self.projections[index_name]
+        if projection == 'ALL':
+            return item
+        names = {self.hash_key, self.range_key, *self.indexes[index_name], *(() if projection == 'KEYS_ONLY' else projection)}
+        return {name: value for name, value in item.items() if name in names}
+
+    def partition(self, index_name: str, hash_value) -> tuple[list[dict], str]:
+        """
+        Returns the items of a partition of the table or of an index, and the sort key.
+        """
+
+        if index_name is None:
+            if self.range_key is None:
+                item = self.items.get((hash_value,))
+                return ([item] if item else []), None
+            return list(self._partitions.get(hash_value, {}).values()), self.range_key
+        hash_key, range_key = self.indexes[index_name]
+        return list(self._index_items[index_name].get(hash_value, {}).values()), range_key
+
+
+class FakeDynamoDB(FakeService):
+    """
+    In-memory DynamoDB client.
+
+    Supports the calls and expressions the app uses: GetItem, PutItem, UpdateItem
+    (SET, ADD, REMOVE, if_not_exists, arithmetic), DeleteItem, Scan (segments,
+    projection, pagination), Query (key conditions, global secondary indexes,
+    direction, pagination), BatchGetItem, BatchWriteItem and TransactWriteItems.
+
+    Args:
+        tables (dict): Table name to Table.
+        fault (Fault, optional): Latency and errors injected into every call.
+    """
+
+    service_name = 'dynamodb'
+
+    def __init__(self, tables: dict, fault: Fault = None):
+        super().__init__(fault)
+        self.tables = tables
+        self._lock = threading.RLock()
+
+    def _table(self, operation: str, table_name: str) -> Table:
+        table = self.tables.get(table_name)
+        if table is None:
+            raise _error(operation, 'ResourceNotFoundException', f'Requested resource not found: {table_name}')
+        return table
+
+    def load(self, table_name: str, items) -> None:
+        """
+        Stores items directly, without counting calls or injecting faults.
+
+        Args:
+            table_name (str): The table name.
+            items (Iterable[dict]): The DynamoDB items.
+        """
+
+        table = self.tables[table_name]
+        with self._lock:
+            for item in items:
+                table.put(item)
+
+    def _check(self, operation: str, table: Table, key: tuple, condition: str, names: dict, values: dict) -> None:
+        if condition and not _compile_condition(condition)(table.items.get(key, {}), names or {}, values or {}):
+            raise _error(operation, 'ConditionalCheckFailedException', 'The conditional request failed')
+
+    def _updated(self, operation: str, item: dict, expression: str, names: dict, values: dict) -> dict:
+        item = dict(item)
+        for action, path, value in _compile_update(expression):
+            name = path(names)
+            try:
+                if action == 'SET':
+                    item[name] = value(item, names, values)
+                elif action == 'REMOVE':
+                    item.pop(name, None)
+                elif name in item:
+                    item[name] = _arithmetic(item[name], '+', value(item, names, values))
+                else:
+                    item[name] = value(item, names, values)
+            except ValueError as e:
+                raise _error(operation, 'ValidationException', str(e))
+        return item
+
+    def get_item(self, TableName, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False):
+        self._call('GetItem')
+        table = self._table('GetItem', TableName)
+        item = table.items.get(table.key(Key))
+        return {'Item': _project(item, ProjectionExpression, ExpressionAttributeNames or {})} if item is not None else {}
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None):
+        self._call('PutItem')
+        table = self._table('PutItem', TableName)
+        with self._lock:
+            self._check('PutItem', table, table.key(Item), ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            table.put(Item)
+        return {}
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None, ReturnValues=None):
+        self._call('UpdateItem')
+        table = self._table('UpdateItem', TableName)
+        key = table.key(Key)
+        with self._lock:
+            self._check('UpdateItem', table, key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            previous = table.items.get(key)
+            item = self._updated('UpdateItem', previous or Key, UpdateExpression, ExpressionAttributeNames or {}, ExpressionAttributeValues or {})
+            table.put(item)
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': item}
+        if ReturnValues == 'ALL_OLD' and previous is not None:
+            return {'Attributes': previous}
+        return {}
+
+    def delete_item(self, TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None):
+        self._call('DeleteItem')
+        table = self._table('DeleteItem', TableName)
+        key = table.key(Key)
+        with self._lock:
+            self._check('DeleteItem', table, key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+            table.delete(key)
+        return {}
+
+    def scan(self, TableName, Segment=0, TotalSegments=1, Limit=None, ExclusiveStartKey=None, ProjectionExpression=None, ExpressionAttributeNames=None):
+        self._call('Scan')
+        table = self._table('Scan', TableName)
+        limit = Limit or 1000
+        with self._lock:
+            keys, positions = table.order()
+            start = positions[table.key(ExclusiveStartKey)] + 1 if ExclusiveStartKey else 0
+            # Segments are the positions congruent to Segment modulo TotalSegments.
+            start += (Segment - start) % TotalSegments
+            page = keys[start:start + limit * TotalSegments:TotalSegments]
+            items = [_project(table.items[key], ProjectionExpression, ExpressionAttributeNames or {}) for key in page]
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': len(items)}
+        if page and start + len(page) * TotalSegments < len(keys):
+            response['LastEvaluatedKey'] = table.key_attributes(table.items[page[-1]])
+        return response
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues, ExpressionAttributeNames=None, IndexName=None, ScanIndexForward=True, Limit=None, ExclusiveStartKey=None, ProjectionExpression=None):
+        self._call('Query')
+        table = self._table('Query', TableName)
+        names = ExpressionAttributeNames or {}
+        hash_key = table.hash_key if IndexName is None else table.indexes[IndexName][0]
+        # The partition is selected by the '<hash key> = :value' term of the key condition.
+        tokens = _tokenize(KeyConditionExpression)
+        position = next(index for index, token in enumerate(tokens) if token == hash_key or names.get(token) == hash_key)
+        hash_value = _scalar(ExpressionAttributeValues[tokens[position + 2]])
+        condition = _compile_condition(KeyConditionExpression)
+        with self._lock:
+            items, range_key = table.partition(IndexName, hash_value)
+            items = [item for item in items if condition(item, names, ExpressionAttributeValues)]
+        # Items are ordered by sort key, then by table key (the order DynamoDB gives ties is
+        # arbitrary but stable); a start key resumes after its position, even if it was deleted.
+        def order(item):
+            return (_scalar(item[range_key]) if range_key is not None else 0, table.key(item))
+        items.sort(key=order, reverse=not ScanIndexForward)
+        if ExclusiveStartKey:
+            start = order(ExclusiveStartKey)
+            items = [item for item in items if (order(item) > start if ScanIndexForward else order(item) < start)]
+        limit = Limit or len(items)
+        page = items[:limit]
+        if IndexName is not None:
+            page = [table.index_projection(IndexName, item) for item in page]
+        response = {'Items': [_project(item, ProjectionExpression, names) for item in page], 'Count': len(page)}
+        if len(items) > limit:
+            last = page[-1]
+            response['LastEvaluatedKey'] = {**table.key_attributes(last), **({} if IndexName is None else {
+                attribute: last[attribute] for attribute in table.indexes[IndexName] if attribute and attribute in last
+            })}
+        return response
+
+    def batch_get_item(self, RequestItems):
+        self._call('BatchGetItem')
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self._table('BatchGetItem', table_name)
+            names = request.get('ExpressionAttributeNames') or {}
+            found = (table.items.get(table.key(key)) for key in request['Keys'])
+            responses[table_name] = [_project(item, request.get('ProjectionExpression'), names) for item in found if item is not None]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def batch_write_item(self, RequestItems):
+        self._call('BatchWriteItem')
+        with self._lock:
+            for table_name, requests in RequestItems.items():
+                table = self._table('BatchWriteItem', table_name)
+                for request in requests:
+                    if 'PutRequest' in request:
+                        table.put(request['PutRequest']['Item'])
+                    else:
+                        table.delete(table.key(request['DeleteRequest']['Key']))
+        return {'UnprocessedItems': {}}
+
+    def transact_write_items(self, TransactItems, ClientRequestToken=None):
+        self._call('TransactWriteItems')
+        with self._lock:
+            reasons = []
+            writes = []
+            for entry in TransactItems:
+                [(operation, params)] = entry.items()
+                table = self._table('TransactWriteItems', params['TableName'])
+                key = table.key(params['Item'] if operation == 'Put' else params['Key'])
+                try:
+                    self._check('TransactWriteItems', table, key, params.get('ConditionExpression'), params.get('ExpressionAttributeNames'), params.get('ExpressionAttributeValues'))
+                    if operation == 'Update':
+                        item = self._updated('TransactWriteItems', table.items.get(key, params['Key']), params['UpdateExpression'], params.get('ExpressionAttributeNames') or {}, params.get('ExpressionAttributeValues') or {})
+                        writes.append((table.put, item))
+                    elif operation == 'Put':
+                        writes.append((table.put, params['Item']))
+                    elif operation == 'Delete':
+                        writes.append((table.delete, key))
+                    reasons.append({'Code': 'None'})
+                except ClientError as e:
+                    code = e.response['Error']['Code']
+                    reason = {'ConditionalCheckFailedException': 'ConditionalCheckFailed', 'ValidationException': 'ValidationError'}.get(code, code)
+                    reasons.append({'Code': reason, 'Message': e.response['Error']['Message']})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise _error('TransactWriteItems', 'TransactionCanceledException', 'Transaction cancelled', CancellationReasons=reasons)
+            for write, argument in writes:
+                write(argument)
+        return {}
+
+
+# ---------------------------------------------------------------------------
+# SES, Secrets Manager, Lambda, exchange rates
+# ---------------------------------------------------------------------------
+
+class FakeSES(FakeService):
+    """
+    SES client that records the messages instead of sending them.
+
+    Args:
+        fault (Fault, optional): Latency and errors injected into every call.
+        max_send_rate (float, optional): The MaxSendRate of the quota.
+        keep (bool, optional): Keep the sent requests in `sent` (off for long runs).
+    """
+
+    service_name = 'ses'
+
+    def __init__(self, fault: Fault = None, max_send_rate: float = 1000.0, keep: bool = False):
+        super().__init__(fault)
+        self.max_send_rate = max_send_rate
+        self.keep = keep
+        self.sent = []
+        self.messages = 0
+        self.templates = {}
+        self._lock = threading.Lock()
+
+    def _record(self, count: int, request: dict) -> None:
+        with self._lock:
+            self.messages += count
+            if self.keep:
+                self.sent.append(request)
+
+    def send_email(self, **request):
+        self._call('SendEmail')
+        self._record(1, request)
+        return {'MessageId': str(uuid.uuid4())}
+
+    def send_templated_email(self, **request):
+        self._call('SendTemplatedEmail')
+        if request['Template'] not in self.templates:
+            raise _error('SendTemplatedEmail', 'TemplateDoesNotExist', f"Template {request['Template']} does not exist.")
+        self._record(1, request)
+        return {'MessageId': str(uuid.uuid4())}
+
+    def send_bulk_templated_email(self, **request):
+        self._call('SendBulkTemplatedEmail')
+        if request['Template'] not in self.templates:
+            raise _error('SendBulkTemplatedEmail', 'TemplateDoesNotExist', f"Template {request['Template']} does not exist.")
+        self._record(len(request['Destinations']), request)
+        return {'Status': [{'Status': 'Success', 'MessageId': str(uuid.uuid4())} for _ in request['Destinations']]}
+
+    def get_send_quota(self):
+        self._call('GetSendQuota')
+        return {'Max24HourSend': 1e9, 'MaxSendRate': self.max_send_rate, 'SentLast24Hours': float(self.messages)}
+
+    def create_template(self, Template):
+        self._call('CreateTemplate')
+        if Template['TemplateName'] in self.templates:
+            raise _error('CreateTemplate', 'AlreadyExists', f"Template {Template['TemplateName']} already exists.")
+        self.templates[Template['TemplateName']] = Template
+        return {}
+
+    def update_template(self, Template):
+        self._call('UpdateTemplate')
+        if Template['TemplateName'] not in self.templates:
+            raise _error('UpdateTemplate', 'TemplateDoesNotExist', f"Template {Template['TemplateName']} does not exist.")
+        self.templates[Template['TemplateName']] = Template
+        return {}
+
+    def get_template(self, TemplateName):
+        self._call('GetTemplate')
+        if TemplateName not in self.templates:
+            raise _error('GetTemplate', 'TemplateDoesNotExist', f'Template {TemplateName} does not exist.')
+        return {'Template': self.templates[TemplateName]}
+
+
+class FakeSecretsManager(FakeService):
+    """
+    Secrets Manager client serving fixed secrets.
+
+    Args:
+        secrets (dict): Secret ID to the decoded secret.
+        fault (Fault, optional): Latency and errors injected into every call.
+    """
+
+    service_name = 'secretsmanager'
+
+    def __init__(self, secrets: dict, fault: Fault = None):
+        super().__init__(fault)
+        self.secrets = {}
+        for secret_id, value in secrets.items():
+            self.rotate(secret_id, value)
+
+    def rotate(self, secret_id: str, value: dict) -> str:
+        """
+        Stores a new current version of a secret.
+
+        Returns:
+            str: The new version ID.
+        """
+
+        version_id = str(uuid.uuid4())
+        self.secrets[secret_id] = (version_id, json.dumps(value))
+        return version_id
+
+    def _secret(self, operation: str, secret_id: str) -> tuple[str, str]:
+        if secret_id not in self.secrets:
+            raise _error(operation, 'ResourceNotFoundException', f'Secrets Manager can\'t find the specified secret: {secret_id}')
+        return self.secrets[secret_id]
+
+    def get_secret_value(self, SecretId, VersionId=None, VersionStage=None):
+        self._call('GetSecretValue')
+        version_id, secret_string = self._secret('GetSecretValue', SecretId)
+        return {'Name': SecretId, 'VersionId': version_id, 'SecretString': secret_string, 'VersionStages': ['AWSCURRENT']}
+
+    def describe_secret(self, SecretId):
+        self._call('DescribeSecret')
+        version_id, _ = self._secret('DescribeSecret', SecretId)
+        return {'Name': SecretId, 'VersionIdsToStages': {version_id: ['AWSCURRENT']}}
+
+
+class FakeLambda(FakeService):
+    """
+    Lambda client recording asynchronous invocations (e.g. the checkpoints of table-wide jobs).
+
+    Args:
+        fault (Fault, optional): Latency and errors injected into every call.
+    """
+
+    service_name = 'lambda'
+
+    def __init__(self, fault: Fault = None):
+        super().__init__(fault)
+        self.invocations = []
+
+    def invoke(self, FunctionName, Payload=b'', InvocationType='RequestResponse'):
+        self._call('Invoke')
+        self.invocations.append((FunctionName, json.loads(Payload or b'null')))
+        return {'StatusCode': 202 if InvocationType == 'Event' else 200}
+
+
+class FakeRateApi(FakeService):
+    """
+    Exchange-rate API with a fixed table, usable as the upstream of CachedRateProvider.
+
+    Implements `RateProvider.fetch_rates`: failures raise ValueError, as
+    ExchangeRateApiProvider does when the HTTP call fails.
+
+    Args:
+        rates (dict): Currency code to rate, quoted against `base`.
+        base (str, optional): The currency the table is quoted against.
+        fault (Fault, optional): Latency and errors injected into every call.
+    """
+
+    service_name = 'rates'
+
+    def __init__(self, rates: dict, base: str = 'EUR', fault: Fault = None):
+        super().__init__(fault)
+        self.rates = {**rates, base: 1.0}
+
+    def fetch_rates(self, base: str) -> dict:
+        try:
+            self._call('Fetch')
+        except ClientError as e:
+            raise ValueError(f'Unable to fetch exchange rates! {e}')
+        if base not in self.rates:
+            raise ValueError('Invalid currency!')
+        return {currency: rate / self.rates[base] for currency, rate in self.rates.items()}
+
+
+def total_calls(*fakes: FakeService) -> Counter:
+    """
+    Sums the call counters of several fakes.
+
+    Returns:
+        Counter: Calls per '<service>.<Operation>'.
+    """
+
+    return sum((fake.calls for fake in fakes), Counter())
+
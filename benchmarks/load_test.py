@@ -0,0 +1,457 @@
+"""
+Offline load test of the Lambda handler against in-process AWS fakes.
+
+Runs `lambda_handler` in this process (a warm container: caches persist between
+requests) with DynamoDB, SES, Secrets Manager, Lambda and the exchange-rate API
+replaced by the fakes of benchmarks/fakes.py, on synthetic tables. Each action
+runs as its own phase and is reported with its latency percentiles, failures and
+external calls per request:
+
+    python benchmarks/load_test.py --clients 100000 --latency dynamodb=4:2 --latency ses=25 \\
+        --errors dynamodb=0.001 --action CARD_RECHARGE=2000 --concurrency 8 --output baseline.json
+    python benchmarks/load_test.py ... --baseline baseline.json
+
+Latencies are '<service>=<ms>[:<jitter ms>]' and error rates '<service>=<share>',
+for the services dynamodb, ses, secretsmanager, lambda and rates. Runs with the
+same --seed and arguments replay the same requests.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'app'))
+
+from fakes import AsyncFake, Fault, FakeDynamoDB, FakeLambda, FakeRateApi, FakeSecretsManager, FakeSES, Table, total_calls  # noqa: E402
+
+
+TABLES = {
+    'DYNAMODB_TABLE_CLIENT_NAME': ('load-clients', Table('ClientID', indexes={
+        'Email-index': ('Email', None, 'KEYS_ONLY'),
+        'Country-LastReloadedAt-index': ('Country', 'LastReloadedAt', ['FirstName', 'LastName', 'Email']),
+        'DigestShard-index': ('DigestShard', None, ['FirstName', 'LastName', 'Email', 'Limit', 'Spend', 'DigestedAt']),
+    })),
+    'DYNAMODB_TABLE_HISTORY_NAME': ('load-reload-history', Table('ClientID', 'ReloadedAt', indexes={
+        'PaymentMethod-ReloadedAt-index': ('PaymentMethod', 'ReloadedAt'),
+        'FeedShard-ReloadedAt-index': ('FeedShard', 'ReloadedAt', ['Amount', 'PaymentMethod']),
+    })),
+    'DYNAMODB_TABLE_OUTBOX_NAME': ('load-outbox', Table('NotificationID')),
+    'DYNAMODB_TABLE_REQUEST_NAME': ('load-requests', Table('RequestID')),
+    'DYNAMODB_TABLE_AGGREGATE_NAME': ('load-aggregates', Table('Metric', 'Bucket')),
+}
+
+API_KEY = 'load-test-api-key'
+
+ENVIRONMENT = {
+    'AWS_REGION': 'eu-west-1',
+    'AWS_DEFAULT_REGION': 'eu-west-1',
+    'AWS_LAMBDA_FUNCTION_NAME': 'load-test',
+    'ADMIN_EMAILS': '["admin@example.com"]',
+    'COMMERCIAL_EMAILS': '[]',
+    'VERIFIED_EMAIL': 'no-reply@example.com',
+    'SECRET_CLIENT_NAME': 'load-test-secret',
+    **{setting: name for setting, (name, _) in TABLES.items()},
+}
+
+RATES = {'XAF': 655.957, 'USD': 1.08, 'GBP': 0.85}
+PAYMENT_METHODS = ['Orange money', 'MTN mobile money', 'Card', 'Bank transfer']
+COUNTRIES = ['Cameroon', 'Gabon', 'Chad', 'Congo', 'France']
+
+
+class LambdaContext:
+    """
+    Minimal Lambda context, with a 15 minute deadline starting at creation.
+    """
+
+    invoked_function_arn = 'arn:aws:lambda:eu-west-1:000000000000:function:load-test'
+
+    def __init__(self, timeout_ms: int = 900000):
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+def _reloaded_at(rng: random.Random) -> str:
+    return f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}.{rng.randint(0, 999999):06d}+00:00'
+
+
+# Digest watermark of the active synthetic clients: their reloads after it are digested.
+DIGESTED_AT = '2025-07-01T00:00:00.000000+00:00'
+
+
+def synthetic_clients(count: int, reloads: int, legacy_share: float, seed: int, active_share: float = 1.0):
+    """
+    Yields client items and their history items, shaped like the production tables.
+
+    Args:
+        count (int): Number of clients.
+        reloads (int): Reloads per client.
+        legacy_share (float): Share of clients whose reloads are still in the legacy
+            ReloadingHistory blob instead of the history table.
+        seed (int): Seed of the generated values.
+        active_share (float, optional): Share of the clients with history table reloads
+            that await the weekly digest.
+
+    Yields:
+        tuple[dict, list[dict]]: The client item and its history table items.
+    """
+
+    rng = random.Random(seed)
+    # Constant attribute values are shared between items: stored items are never mutated.
+    zero = {'N': '0'}
+    countries = [{'S': country} for country in COUNTRIES]
+    methods = [{'S': method} for method in PAYMENT_METHODS]
+    for index in range(count):
+        client_id = str(index)
+        client_key = {'S': client_id}
+        item = {
+            'ClientID': client_key,
+            'FirstName': {'S': f'First{index}'},
+            'LastName': {'S': f'Last{index}'},
+            'Country': rng.choice(countries),
+            'Email': {'S': f'client{index}@example.com'},
+            'Phone': {'S': f'+2376{index:08d}'},
+            'Spend': {'N': f'{rng.uniform(0, 200):.2f}'},
+            'Limit': {'N': f'{rng.uniform(200, 2000):.2f}'},
+            'CardLimitReached': zero,
+        }
+        history = []
+        if rng.random() < legacy_share:
+            item['ReloadingHistory'] = {'S': json.dumps([
+                {'clientID': client_id, 'Amount': round(rng.uniform(10, 500), 2), 'PaymentMethod': rng.choice(PAYMENT_METHODS), 'Date': f'{rng.randint(1, 28)}/{rng.randint(1, 12)}/2024'}
+                for _ in range(reloads)
+            ])}
+        else:
+            history = [{
+                'ClientID': client_key,
+                'ReloadedAt': {'S': _reloaded_at(rng)},
+                'Amount': {'N': f'{rng.uniform(10, 500):.2f}'},
+                'PaymentMethod': rng.choice(methods),
+            } for _ in range(reloads)]
+            if history:
+                item['LastReloadedAt'] = max((reload['ReloadedAt'] for reload in history), key=lambda value: value['S'])
+            if history and rng.random() < active_share:
+                item['DigestShard'] = {'S': str(index % 8)}
+                item['DigestedAt'] = {'S': DIGESTED_AT}
+        yield item, history
+
+
+def _api_event(action: str, data=None, idempotency_key: str = None) -> dict:
+    headers = {'x-api-key': API_KEY}
+    if idempotency_key:
+        headers['Idempotency-Key'] = idempotency_key
+    body = {'action': action}
+    if data is not None:
+        body['data'] = data
+    return {'body': json.dumps(body), 'headers': headers}
+
+
+class Workload:
+    """
+    Builds the events of the load test, deterministically from a seed.
+
+    Args:
+        clients (int): Number of clients in the synthetic table.
+        seed (int): Seed of the generated requests.
+    """
+
+    def __init__(self, clients: int, seed: int):
+        self.clients = clients
+        self.rng = random.Random(seed)
+        self.next_client_id = clients
+
+    def _client_id(self) -> str:
+        return str(self.rng.randrange(self.clients))
+
+    def _key(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128)))
+
+    def create_client(self) -> dict:
+        index, self.next_client_id = self.next_client_id, self.next_client_id + 1
+        return _api_event('CREATE_CLIENT', {
+            'ClientID': str(index),
+            'Limit': self.rng.randint(10, 500) * 100,
+            'Rate': '0.05',
+            'PaymentMethod': self.rng.choice(PAYMENT_METHODS),
+            'Currency': 'XAF',
+            'FirstName': f'First{index}',
+            'LastName': f'Last{index}',
+            'Email': f'client{index}@example.com',
+            'Country': self.rng.choice(COUNTRIES),
+            'Phone': f'+2376{index:08d}',
+        }, self._key())
+
+    def card_recharge(self) -> dict:
+        return _api_event('CARD_RECHARGE', {
+            'ClientID': self._client_id(),
+            'Limit': self.rng.randint(10, 500) * 100,
+            'Rate': '0.05',
+            'PaymentMethod': self.rng.choice(PAYMENT_METHODS),
+            'Currency': 'XAF',
+        }, self._key())
+
+    def bulk_card_recharge(self, rows: int = 25) -> dict:
+        return _api_event('BULK_CARD_RECHARGE', [{
+            'ClientID': self._client_id(),
+            'Limit': self.rng.randint(10, 500) * 100,
+            'Rate': '0.05',
+            'PaymentMethod': self.rng.choice(PAYMENT_METHODS),
+            'Currency': 'XAF',
+        } for _ in range(rows)], self._key())
+
+    def history_reload(self) -> dict:
+        return _api_event('HISTORY_RELOAD', {'ClientID': self._client_id(), 'Limit': 20})
+
+    def history_reload_all(self) -> dict:
+        return _api_event('HISTORY_RELOAD', {'Limit': 50})
+
+    def history_transaction(self) -> dict:
+        return {'action': 'HISTORY_TRANSACTION'}
+
+    def client_by_email(self) -> dict:
+        return _api_event('CLIENT_BY_EMAIL', {'Email': f'client{self._client_id()}@example.com'})
+
+    def clients_by_country(self) -> dict:
+        week = self.rng.randint(1, 51)
+        since = date(2025, 1, 1) + timedelta(weeks=week)
+        return _api_event('CLIENTS_BY_COUNTRY', {'Country': self.rng.choice(COUNTRIES), 'From': since.isoformat(), 'To': (since + timedelta(days=6)).isoformat(), 'Limit': 50})
+
+    def reloads_by_payment_method(self) -> dict:
+        return _api_event('RELOADS_BY_PAYMENT_METHOD', {'PaymentMethod': self.rng.choice(PAYMENT_METHODS), 'From': f'2025-{self.rng.randint(1, 12):02d}-01', 'Limit': 50})
+
+    def backfill_feed_shard(self) -> dict:
+        return {'action': 'BACKFILL_FEED_SHARD'}
+
+    def backfill_last_reload(self) -> dict:
+        return {'action': 'BACKFILL_LAST_RELOAD'}
+
+    def rebuild_report(self) -> dict:
+        return {'action': 'REBUILD_REPORT'}
+
+    def report_summary(self) -> dict:
+        month = self.rng.randint(1, 12)
+        return _api_event('REPORT_SUMMARY', {'From': f'2025-{month:02d}-01', 'To': f'2025-{month:02d}-28'})
+
+
+# Action name to (event builder, default number of requests).
+WORKLOADS = {
+    'CREATE_CLIENT': (Workload.create_client, 200),
+    'CARD_RECHARGE': (Workload.card_recharge, 500),
+    'BULK_CARD_RECHARGE': (Workload.bulk_card_recharge, 20),
+    # Synthetic reloads are loaded without FeedShard, as in production before the backfill.
+    'BACKFILL_FEED_SHARD': (Workload.backfill_feed_shard, 1),
+    'HISTORY_RELOAD': (Workload.history_reload, 500),
+    'HISTORY_RELOAD_ALL': (Workload.history_reload_all, 5),
+    'HISTORY_TRANSACTION': (Workload.history_transaction, 1),
+    'CLIENT_BY_EMAIL': (Workload.client_by_email, 500),
+    'CLIENTS_BY_COUNTRY': (Workload.clients_by_country, 200),
+    'RELOADS_BY_PAYMENT_METHOD': (Workload.reloads_by_payment_method, 200),
+    # Legacy clients are loaded without LastReloadedAt, as in production before the backfill.
+    'BACKFILL_LAST_RELOAD': (Workload.backfill_last_reload, 1),
+    # The synthetic tables are loaded without report counters: the rebuild fills them.
+    'REBUILD_REPORT': (Workload.rebuild_report, 1),
+    'REPORT_SUMMARY': (Workload.report_summary, 200),
+}
+
+
+def percentile(samples: list[float], share: float) -> float:
+    """
+    Returns the nearest-rank percentile of sorted samples.
+
+    Args:
+        samples (list[float]): The samples, sorted.
+        share (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The sample at that rank.
+    """
+
+    if not samples:
+        return float('nan')
+    return samples[min(len(samples) - 1, max(0, round(share * len(samples) + 0.5) - 1))]
+
+
+def _parse_faults(latencies: list[str], errors: list[str], seed: int) -> dict:
+    faults = {}
+    for spec in latencies:
+        service, _, value = spec.partition('=')
+        latency, _, jitter = value.partition(':')
+        faults.setdefault(service, {})['latency_ms'] = float(latency)
+        faults[service]['jitter_ms'] = float(jitter or 0)
+    for spec in errors:
+        service, _, value = spec.partition('=')
+        faults.setdefault(service, {})['error_rate'] = float(value)
+    return {service: Fault(seed=seed, **options) for service, options in faults.items()}
+
+
+def setup(args) -> dict:
+    """
+    Imports the app against the fakes and fills the synthetic tables.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        dict: The fakes by service name, and the handler under 'handler'.
+    """
+
+    os.environ.update(ENVIRONMENT)
+    os.environ['NOTIFICATION_MODE'] = args.notification_mode
+    os.environ['TELEMETRY_ENABLED'] = 'true' if args.telemetry else 'false'
+    os.environ['AIO_ENABLED'] = 'true' if args.aio else 'false'
+    os.environ.setdefault('SES_SEND_RATE', '100000')
+
+    faults = _parse_faults(args.latency, args.errors, args.seed)
+    fakes = {
+        'dynamodb': FakeDynamoDB({name: table for name, table in TABLES.values()}, faults.get('dynamodb')),
+        'ses': FakeSES(faults.get('ses')),
+        'secretsmanager': FakeSecretsManager({ENVIRONMENT['SECRET_CLIENT_NAME']: {'EAZYCARD_API_KEY': API_KEY}}, faults.get('secretsmanager')),
+        'lambda': FakeLambda(faults.get('lambda')),
+        'rates': FakeRateApi(RATES, fault=faults.get('rates')),
+    }
+
+    from services.aio import set_async_client
+    from services.aws import set_client
+    from services.rates import set_rate_provider
+    for service in ('dynamodb', 'ses', 'secretsmanager', 'lambda'):
+        set_client(service, fakes[service])
+    set_async_client('dynamodb', AsyncFake(fakes['dynamodb']))
+    set_rate_provider(fakes['rates'])
+
+    started_at = time.perf_counter()
+    clients_table, history_table = ENVIRONMENT['DYNAMODB_TABLE_CLIENT_NAME'], ENVIRONMENT['DYNAMODB_TABLE_HISTORY_NAME']
+    for item, history in synthetic_clients(args.clients, args.reloads, args.legacy_share, args.seed, args.active_share):
+        fakes['dynamodb'].load(clients_table, [item])
+        fakes['dynamodb'].load(history_table, history)
+    print(f"Synthetic tables: {args.clients} clients, {args.reloads} reloads each, {args.legacy_share:.0%} legacy, {args.active_share:.0%} awaiting the digest ({time.perf_counter() - started_at:.1f}s)")
+
+    import lambda_function
+    fakes['handler'] = lambda_function.lambda_handler
+    return fakes
+
+
+def run_phase(handler, events: list[dict], concurrency: int, fakes: list) -> dict:
+    """
+    Sends events to the handler and measures each request.
+
+    Args:
+        handler: The Lambda handler.
+        events (list[dict]): The events of the phase.
+        concurrency (int): Concurrent requests.
+        fakes (list[FakeService]): The fakes whose calls are counted.
+
+    Returns:
+        dict: Latency percentiles (ms), throughput, failures and calls per request.
+    """
+
+    def send(event):
+        started_at = time.perf_counter()
+        try:
+            response = handler(event, LambdaContext())
+            status = response.get('statusCode', 200) if isinstance(response, dict) else 200
+        except Exception as e:
+            status = type(e).__name__
+        return (time.perf_counter() - started_at) * 1000, status
+
+    calls_before = total_calls(*fakes)
+    started_at = time.perf_counter()
+    # The app logs with print(): keep its output out of the report.
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(send, events))
+        else:
+            results = [send(event) for event in events]
+    elapsed = time.perf_counter() - started_at
+    calls = total_calls(*fakes) - calls_before
+
+    latencies = sorted(latency for latency, _ in results)
+    statuses = Counter(str(status) for _, status in results)
+    return {
+        'requests': len(results),
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1],
+        'throughput': len(results) / elapsed,
+        'failures': sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500),
+        'statuses': dict(statuses),
+        'calls': {operation: count / len(results) for operation, count in sorted(calls.items())},
+    }
+
+
+def report(results: dict, baseline: dict = None) -> None:
+    print(f"\n{'action':<22}{'requests':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'req/s':>10}{'failed':>8}{'calls/req':>11}")
+    for action, result in results.items():
+        print(
+            f"{action:<22}{result['requests']:>9}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['p99']:>10.2f}"
+            f"{result['max']:>10.2f}{result['throughput']:>10.1f}{result['failures']:>8}{sum(result['calls'].values()):>11.2f}"
+        )
+        print(f"{'':<22}statuses {result['statuses']}")
+        print(f"{'':<22}{', '.join(f'{operation}={count:.3g}' for operation, count in result['calls'].items()) or 'no external call'}")
+        previous = (baseline or {}).get(action)
+        if previous:
+            print(f"{'':<22}vs baseline: " + ', '.join(
+                f"{metric} {result[metric] / previous[metric] - 1:+.1%}" for metric in ('p50', 'p95', 'p99') if previous[metric]
+            ) + f", calls/req {sum(result['calls'].values()) - sum(previous['calls'].values()):+.2f}")
+
+
+def _action(spec: str) -> tuple[str, int]:
+    action, _, count = spec.partition('=')
+    if action not in WORKLOADS:
+        raise argparse.ArgumentTypeError(f"unknown action {action!r} (choose from {', '.join(WORKLOADS)})")
+    return action, int(count) if count else WORKLOADS[action][1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=1000, help='clients in the synthetic table (1k to 1M; 1M takes about 4 GB)')
+    parser.add_argument('--reloads', type=int, default=5, help='reloads per client')
+    parser.add_argument('--active-share', type=float, default=0.2, help='share of clients with reloads since their last weekly digest')
+    parser.add_argument('--legacy-share', type=float, default=0.0, help='share of clients still storing their reloads in the ReloadingHistory blob')
+    parser.add_argument('--action', type=_action, action='append', metavar='ACTION[=N]', help='action to run, N requests (default: every action with its default count)')
+    parser.add_argument('--concurrency', type=int, default=1, help='concurrent requests in a phase')
+    parser.add_argument('--latency', action='append', default=[], metavar='SERVICE=MS[:JITTER]', help='latency injected into a service')
+    parser.add_argument('--errors', action='append', default=[], metavar='SERVICE=SHARE', help='share of failed calls of a service')
+    parser.add_argument('--notification-mode', choices=['sync', 'outbox'], default='sync', help='NOTIFICATION_MODE of the app')
+    parser.add_argument('--aio', action='store_true', help='run the fan-out of table-wide jobs on the asyncio path (AIO_ENABLED)')
+    parser.add_argument('--telemetry', action='store_true', help='keep the EMF telemetry of the handler on')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the tables, requests and injected faults')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with the results of a previous --output')
+    args = parser.parse_args()
+
+    fakes = setup(args)
+    services = [fakes[service] for service in ('dynamodb', 'ses', 'secretsmanager', 'lambda', 'rates')]
+    workload = Workload(args.clients, args.seed)
+    results = {}
+    for action, count in args.action or [(action, default) for action, (_, default) in WORKLOADS.items()]:
+        build = WORKLOADS[action][0]
+        events = [build(workload) for _ in range(count)]
+        results[action] = run_phase(fakes['handler'], events, args.concurrency, services)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import load_test  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def fakes():
+    """
+    Imports the app once against the fakes of the load test, in 'outbox' mode.
+
+    The settings are read at import, so every test shares this app and its tables:
+    tests use their own clients and idempotency keys.
+    """
+
+    args = argparse.Namespace(
+        clients=40, reloads=3, legacy_share=0.3, active_share=0.0, seed=1, latency=[], errors=[],
+        notification_mode='outbox', telemetry=False, aio=False,
+    )
+    return load_test.setup(args)
+
+
+@pytest.fixture
+def call(fakes):
+    """
+    Sends an API request to the handler and returns its status code and decoded body.
+    """
+
+    def send(action, data=None, idempotency_key=None):
+        response = fakes['handler'](load_test._api_event(action, data, idempotency_key), load_test.LambdaContext())
+        return response['statusCode'], json.loads(response['body'])
+    return send
+
+
+@pytest.fixture
+def fail(fakes, monkeypatch):
+    """
+    Makes an operation of the fake DynamoDB client raise the given error.
+    """
+
+    from services.aws import get_client
+
+    def inject(operation, error):
+        def raise_error(*args, **kwargs):
+            raise error
+        monkeypatch.setattr(fakes['dynamodb'], operation, raise_error)
+        # The guarded client caches the bound methods of the fake.
+        monkeypatch.delitem(vars(get_client('dynamodb')), operation, raising=False)
+    return inject
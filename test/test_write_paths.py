@@ -0,0 +1,180 @@
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import load_test
+from fakes import _error
+
+CLIENTS = load_test.ENVIRONMENT['DYNAMODB_TABLE_CLIENT_NAME']
+HISTORY = load_test.ENVIRONMENT['DYNAMODB_TABLE_HISTORY_NAME']
+OUTBOX = load_test.ENVIRONMENT['DYNAMODB_TABLE_OUTBOX_NAME']
+
+
+def _recharge(client_id, amount=100):
+    return {'ClientID': client_id, 'Limit': amount, 'Rate': 0, 'Currency': 'EUR', 'PaymentMethod': 'Card'}
+
+
+def _limit(fakes, client_id):
+    return float(fakes['dynamodb'].tables[CLIENTS].items[(client_id,)]['Limit']['N'])
+
+
+def _reloads(fakes, client_id):
+    return sum(1 for item in fakes['dynamodb'].tables[HISTORY].items.values() if item['ClientID']['S'] == client_id)
+
+
+def _cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+# Recharges
+
+def test_concurrent_recharges_all_apply(fakes, call):
+    limit, reloads = _limit(fakes, '1'), _reloads(fakes, '1')
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda index: call('CARD_RECHARGE', _recharge('1'), f'concurrent-{index}'), range(20)))
+
+    assert {status for status, _ in responses} == {200}
+    assert _limit(fakes, '1') == round(limit + 20 * 100, 2)
+    assert _reloads(fakes, '1') == reloads + 20
+
+
+def test_recharge_of_unknown_client_writes_nothing(fakes, call):
+    reloads = len(fakes['dynamodb'].tables[HISTORY].items)
+
+    status, _ = call('CARD_RECHARGE', _recharge('unknown'))
+
+    assert status == 404
+    assert ('unknown',) not in fakes['dynamodb'].tables[CLIENTS].items
+    assert len(fakes['dynamodb'].tables[HISTORY].items) == reloads
+
+
+def test_recharge_is_kept_when_its_reload_is_not_recorded(fakes, call, fail, capsys):
+    limit, reloads = _limit(fakes, '2'), _reloads(fakes, '2')
+    fail('transact_write_items', _error('TransactWriteItems', 'InternalServerError', 'Injected failure'))
+
+    status, body = call('CARD_RECHARGE', _recharge('2'))
+
+    assert status == 200
+    assert body['new_limit'] == round(limit + 100, 2)
+    assert _limit(fakes, '2') == round(limit + 100, 2)
+    assert _reloads(fakes, '2') == reloads
+    assert 'Error: recharge of client 2 applied but its reload was not recorded' in capsys.readouterr().out
+
+
+def test_bulk_recharge_applies_each_client_atomically(fakes, call):
+    clients = fakes['dynamodb'].tables[CLIENTS].items
+    # ADD fails on a Limit still stored as a string: the first transaction is cancelled as a whole.
+    clients[('3',)] = {**clients[('3',)], 'Limit': {'S': clients[('3',)]['Limit']['N']}}
+    limits = {client_id: float(clients[(client_id,)]['Limit'].get('N') or clients[(client_id,)]['Limit']['S']) for client_id in ('3', '4')}
+    reloads = {client_id: _reloads(fakes, client_id) for client_id in ('3', '4')}
+
+    status, body = call('BULK_CARD_RECHARGE', [_recharge('3', 10), _recharge('4', 20), _recharge('3', 30), _recharge('unknown', 40)])
+
+    assert status == 207
+    assert [result['status'] for result in body['results']] == ['OK', 'OK', 'OK', 'FAILED']
+    assert _limit(fakes, '3') == round(limits['3'] + 40, 2)
+    assert _limit(fakes, '4') == round(limits['4'] + 20, 2)
+    assert _reloads(fakes, '3') == reloads['3'] + 2
+    assert _reloads(fakes, '4') == reloads['4'] + 1
+
+
+# Idempotency
+
+def test_replayed_request_returns_the_stored_response(fakes, call):
+    limit = _limit(fakes, '5')
+
+    first = call('CARD_RECHARGE', _recharge('5'), 'replay')
+    second = call('CARD_RECHARGE', _recharge('5'), 'replay')
+
+    assert first == second
+    assert _limit(fakes, '5') == round(limit + 100, 2)
+
+
+def test_reused_key_with_another_payload_is_rejected(fakes, call):
+    call('CARD_RECHARGE', _recharge('6'), 'reused')
+    limit = _limit(fakes, '6')
+
+    status, _ = call('CARD_RECHARGE', _recharge('6', 50), 'reused')
+
+    assert status == 422
+    assert _limit(fakes, '6') == limit
+
+
+def test_request_whose_response_is_not_stored_is_not_executed_again(fakes, call, monkeypatch):
+    from services.idempotency import idempotency_store
+
+    def complete(*args):
+        raise _error('UpdateItem', 'InternalServerError', 'Injected failure')
+    monkeypatch.setattr(idempotency_store, 'complete', complete)
+    status, _ = call('CARD_RECHARGE', _recharge('7'), 'not-stored')
+    monkeypatch.undo()
+    limit = _limit(fakes, '7')
+
+    retried, _ = call('CARD_RECHARGE', _recharge('7'), 'not-stored')
+
+    assert status == 200
+    assert retried == 409
+    assert _limit(fakes, '7') == limit
+
+
+# Cursors
+
+def test_history_cursor_of_another_client_is_rejected(call):
+    _, page = call('HISTORY_RELOAD', {'ClientID': '8', 'Limit': 1})
+
+    status, _ = call('HISTORY_RELOAD', {'ClientID': '9', 'Limit': 1, 'Cursor': page['cursor']})
+
+    assert page['cursor']
+    assert status == 400
+
+
+def test_malformed_history_cursors_are_rejected(call):
+    for cursor in ['not a cursor', _cursor([1]), _cursor({'legacy': -1}), _cursor({'legacy': True}), _cursor({'key': {'ClientID': {'S': '8'}}})]:
+        assert call('HISTORY_RELOAD', {'ClientID': '8', 'Limit': 1, 'Cursor': cursor})[0] == 400
+        assert call('HISTORY_RELOAD', {'Limit': 1, 'Cursor': cursor})[0] == 400
+
+
+def test_lookup_cursor_of_another_query_is_rejected(call):
+    _, page = call('CLIENTS_BY_COUNTRY', {'Country': 'Gabon', 'Limit': 1})
+
+    assert page['cursor']
+    assert call('CLIENTS_BY_COUNTRY', {'Country': 'Chad', 'Cursor': page['cursor']})[0] == 400
+    assert call('RELOADS_BY_PAYMENT_METHOD', {'PaymentMethod': 'Card', 'Cursor': page['cursor']})[0] == 400
+    assert call('CLIENTS_BY_COUNTRY', {'Country': 'Gabon', 'Cursor': 'zz'})[0] == 400
+
+
+# Outbox
+
+def _notification(notification_id):
+    return {
+        'NotificationID': notification_id, 'Kind': 'CARD_RECHARGE', 'ClientID': '10', 'Email': 'client10@example.com',
+        'Context': {}, 'CreatedAt': '2025-01-01T00:00:00+00:00',
+    }
+
+
+def test_outbox_notification_is_claimed_once(fakes):
+    from services.outbox import DynamoDBOutbox
+    outbox = DynamoDBOutbox(OUTBOX)
+    outbox.write_many([_notification('claimed-once')])
+    items = fakes['dynamodb'].tables[OUTBOX].items
+
+    assert outbox.claim('claimed-once')
+    assert not outbox.claim('claimed-once')
+    outbox.release('claimed-once')
+    assert items[('claimed-once',)]['Status'] == {'S': 'PENDING'}
+    assert outbox.claim('claimed-once')
+    outbox.mark_sent('claimed-once')
+    assert items[('claimed-once',)]['Status'] == {'S': 'SENT'}
+    assert not outbox.claim('claimed-once')
+
+
+@pytest.mark.usefixtures('fakes')
+def test_expired_outbox_claim_is_taken_over():
+    from services.outbox import DynamoDBOutbox
+    outbox = DynamoDBOutbox(OUTBOX, claim_timeout=-1)
+    outbox.write_many([_notification('expired-claim')])
+
+    assert outbox.claim('expired-claim')
+    assert outbox.claim('expired-claim')